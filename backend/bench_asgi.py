@@ -0,0 +1,191 @@
+"""Load-test the async read endpoints under ASGI against the sync viewsets under WSGI.
+
+Usage: python bench_asgi.py [--clients 200] [--duration 20] [--workers 1] [--threads 8] [--no-cache]
+
+Starts `python manage.py serve_asgi` (uvicorn) and gunicorn (gthread) on
+the configured database, with the same number of worker processes, mints
+a JWT for the first active user and drives each server with `--clients`
+keep-alive connections for `--duration` seconds, for the list and detail
+URLs of branches, ATMs and WAN IPs:
+
+* WSGI: the sync viewsets (`/api/...`) under gunicorn
+* ASGI sync: the same viewsets under uvicorn, to separate the server's cost
+* ASGI async: the async views (`/api/async/...`) under uvicorn
+
+For each it prints throughput and p50 / p99 latency.
+
+`--no-cache` adds a unique query parameter to every request so each one
+misses the response cache and reads the database. Needs the servers from
+requirements.txt and an imported database (`import_cbe_data`).
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
+django.setup()
+
+from django.contrib.auth.models import User
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from cbe.models import Branch, ATM, WAN_IP
+
+HOST = '127.0.0.1'
+ASGI_PORT = 8101
+WSGI_PORT = 8102
+
+
+def request_paths():
+    """List pages and a handful of detail URLs, relative to /api/."""
+    paths = ['branches/', 'branches/?page_size=20', 'atms/', 'atms/?ordering=-atm_name', 'wan-ips/']
+    for prefix, model in (('branches', Branch), ('atms', ATM), ('wan-ips', WAN_IP)):
+        paths += [f'{prefix}/{pk}/' for pk in model.objects.values_list('pk', flat=True)[:5]]
+    return paths
+
+
+def start_servers(workers, threads):
+    backend = os.path.dirname(os.path.abspath(__file__))
+    asgi = subprocess.Popen(
+        [sys.executable, 'manage.py', 'serve_asgi', '--port', str(ASGI_PORT),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=backend,
+    )
+    wsgi = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', 'cbe_project.wsgi:application', '--bind', f'{HOST}:{WSGI_PORT}',
+         '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads),
+         '--log-level', 'warning'],
+        cwd=backend,
+    )
+    for port in (ASGI_PORT, WSGI_PORT):
+        wait_for_port(port)
+    return [asgi, wsgi]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection((HOST, port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    sys.exit(f'Nothing listening on port {port} after {timeout}s')
+
+
+async def read_response(reader):
+    """Status code and body length of one HTTP/1.1 response, and whether the server keeps the connection."""
+    status = int((await reader.readline()).split()[1])
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b''):
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        size = 0
+        while chunk := int((await reader.readline()).strip(), 16):
+            size += len(await reader.readexactly(chunk + 2)) - 2
+        await reader.readline()
+    else:
+        size = len(await reader.readexactly(int(headers.get('content-length', 0))))
+    return status, size, headers.get('connection', '').lower() != 'close'
+
+
+async def client(port, paths, headers, deadline, latencies, failures):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection(HOST, port)
+        path = next(paths)
+        start = time.perf_counter()
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: {HOST}\r\n{headers}\r\n'.encode())
+        try:
+            status, _, keep_alive = await read_response(reader)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            failures.append(path)
+            writer.close()
+            writer = None
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            failures.append(path)
+        if not keep_alive:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, prefix, paths, token, clients, duration, no_cache):
+    counter = itertools.count()
+
+    def cycle():
+        for path in itertools.cycle(paths):
+            url = f'{prefix}{path}'
+            if no_cache:
+                url += f'{"&" if "?" in url else "?"}_={next(counter)}'
+            yield url
+
+    urls = cycle()
+    headers = f'Authorization: Bearer {token}\r\nAccept: application/json\r\n'
+    latencies, failures = [], []
+    deadline = time.perf_counter() + duration
+    started = time.perf_counter()
+    await asyncio.gather(*(client(port, urls, headers, deadline, latencies, failures) for _ in range(clients)))
+    elapsed = time.perf_counter() - started
+    return latencies, failures, elapsed
+
+
+def report(name, latencies, failures, elapsed):
+    if not latencies:
+        print(f'{name:10} no responses ({len(failures)} failures)')
+        return
+    cuts = statistics.quantiles(latencies, n=100)
+    print(
+        f'{name:10} {len(latencies) / elapsed:8.1f} req/s   p50 {cuts[49] * 1000:7.1f} ms   '
+        f'p99 {cuts[98] * 1000:7.1f} ms   {len(latencies)} requests, {len(failures)} failures'
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--workers', type=int, default=1, help='Processes per server')
+    parser.add_argument('--threads', type=int, default=8, help='Threads per gunicorn worker')
+    parser.add_argument('--no-cache', action='store_true', help='Bypass the response cache')
+    args = parser.parse_args()
+
+    user = User.objects.filter(is_active=True).order_by('pk').first()
+    if user is None:
+        sys.exit('Create a user first (python manage.py createsuperuser)')
+    token = str(RefreshToken.for_user(user).access_token)
+    paths = request_paths()
+
+    servers = start_servers(args.workers, args.threads)
+    try:
+        print(f'{args.clients} clients, {args.duration:g}s each, {len(paths)} URLs, '
+              f'{args.workers} worker(s), response cache {"off" if args.no_cache else "on"}')
+        runs = (
+            ('WSGI', WSGI_PORT, '/api/'),
+            ('ASGI sync', ASGI_PORT, '/api/'),
+            ('ASGI async', ASGI_PORT, '/api/async/'),
+        )
+        for name, port, prefix in runs:
+            # a short pass first so every run starts with warm caches
+            asyncio.run(load(port, prefix, paths, token, 4, 1, args.no_cache))
+            report(name, *asyncio.run(load(port, prefix, paths, token, args.clients, args.duration, args.no_cache)))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Benchmark the vectorized CSV cleaning stage against the per-row path.
+
+Usage: python bench_csv_cleaning.py [rows]
+
+Builds a synthetic ATM-style frame (default 50,000 rows) that mixes the
+shapes found in the real files: plain TIDs, '12345.0' floats, scientific
+notation, null tokens, ' Branch' suffixes and multi-IP WAN cells. Both
+paths must produce identical output; the script exits non-zero otherwise.
+"""
+import os
+import random
+import sys
+import time
+
+import django
+import pandas as pd
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
+django.setup()
+
+from cbe.branch_resolver import clean_branch_name
+from cbe.csv_utils import (
+    clean_value, clean_column, normalize_tid, normalize_tid_column,
+    primary_ip, primary_ip_column, strip_branch_suffix,
+)
+
+
+def synthetic_frame(rows):
+    rnd = random.Random(42)
+    tids = ['AHW%05d', '%d.0', '1.%04dE+12', ' %d ', 'nan', '', '00%d']
+    branches = ['Adare Branch', 'Tesso', ' Hawassa Industrial park ', 'null', 'Dato Branch', 'None']
+    wans = ['10.138.%d.28', '10.1.1.%d/10.2.2.2', '10.1.1.%d (10.2.2.2)', '10.147.196.%d VLAN 3878', ' ']
+    data = {'TID': [], 'branch': [], 'wan': []}
+    for i in range(rows):
+        tid = rnd.choice(tids)
+        data['TID'].append(tid % i if '%' in tid else tid)
+        data['branch'].append(rnd.choice(branches))
+        wan = rnd.choice(wans)
+        data['wan'].append(wan % (i % 255) if '%' in wan else wan)
+    return pd.DataFrame(data, dtype=str)
+
+
+def per_row(df):
+    out = {'TID': [], 'branch': [], 'wan': []}
+    for _, row in df.iterrows():
+        out['TID'].append(clean_value(normalize_tid(clean_value(row['TID']))))
+        name = clean_value(row['branch'])
+        out['branch'].append(clean_branch_name(name) if name is not None else None)
+        out['wan'].append(primary_ip(clean_value(row['wan'])))
+    return out
+
+
+def vectorized(df):
+    return {
+        'TID': clean_column(normalize_tid_column(clean_column(df['TID']))).tolist(),
+        'branch': strip_branch_suffix(clean_column(df['branch'])).tolist(),
+        'wan': primary_ip_column(clean_column(df['wan'])).tolist(),
+    }
+
+
+def timed(func, df):
+    start = time.perf_counter()
+    result = func(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    df = synthetic_frame(rows)
+
+    slow, slow_secs = timed(per_row, df)
+    fast, fast_secs = timed(vectorized, df)
+
+    print(f'rows:        {rows:,}')
+    print(f'per-row:     {slow_secs:.3f}s ({rows / slow_secs:,.0f} rows/s)')
+    print(f'vectorized:  {fast_secs:.3f}s ({rows / fast_secs:,.0f} rows/s)')
+    print(f'speedup:     {slow_secs / fast_secs:.1f}x')
+
+    if slow != fast:
+        for col in slow:
+            for i, (a, b) in enumerate(zip(slow[col], fast[col])):
+                if a != b:
+                    print(f'MISMATCH {col} row {i}: {a!r} != {b!r}')
+                    break
+        sys.exit(1)
+    print('outputs identical')
+
+
+if __name__ == '__main__':
+    main()
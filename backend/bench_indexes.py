@@ -0,0 +1,115 @@
+"""Show the query-plan and timing change from the 0005 viewset indexes.
+
+Usage: python bench_indexes.py [atms]
+
+Creates a throwaway test database (the configured one is not touched),
+migrates it to 0004 (no viewset indexes), loads a synthetic inventory
+(default 100,000 ATMs over 5,000 branches), then runs the ATM / branch
+list filters, the off-WAN ip_address lookup and an UPPER() lookup before
+and after migrating to 0005. For each query it prints the plan and the
+median time of a few runs. icontains searches cannot use a b-tree index
+(leading wildcard) and are listed to show they are unchanged.
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
+django.setup()
+
+from django.core.management import call_command
+from django.db import connection
+from django.db.models.functions import Upper
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from cbe.models import Branch, ATM
+
+BEFORE = ('cbe', '0004_import_row_hashes')
+AFTER = ('cbe', '0005_viewset_indexes')
+RUNS = 5
+
+
+def load(atms):
+    rnd = random.Random(7)
+    branches = [
+        Branch(name=f'Branch {i:05d}', connection_type=rnd.choice(['FIBER'] * 8 + ['VSAT', 'ADSL']),
+               service_number=f'{rnd.randrange(10**11, 10**12)}')
+        for i in range(max(1, atms // 20))
+    ]
+    Branch.objects.bulk_create(branches, batch_size=2000)
+    statuses = ['DEPLOYED'] * 90 + ['NOT_DEPLOYED'] * 8 + ['IN_MAINTENANCE'] * 2
+    locations = ['Financial_Institution'] * 60 + ['Office_Building'] * 25 + ['Hotel'] * 10 + ['Hospital'] * 5
+    brands = ['NCR'] * 80 + ['Diebold'] * 15 + ['Wincor'] * 5
+    ATM.objects.bulk_create([
+        ATM(tid=f'AHW{i:07d}', atm_name=f'ATM {rnd.randrange(atms):07d}', branch=rnd.choice(branches),
+            ip_address=f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}',
+            deployment_status=rnd.choice(statuses), location_type=rnd.choice(locations),
+            atm_brand=rnd.choice(brands))
+        for i in range(atms)
+    ], batch_size=5000)
+
+
+def queries():
+    ips = [f'10.0.{i}.{i}' for i in range(50)]
+    return [
+        ('ATM status filter, tid order', lambda: ATM.objects.filter(deployment_status='IN_MAINTENANCE').order_by('tid')[:100]),
+        ('ATM location filter, tid order', lambda: ATM.objects.filter(location_type='Hospital').order_by('tid')[:100]),
+        ('ATM brand filter, tid order', lambda: ATM.objects.filter(atm_brand='Wincor').order_by('tid')[:100]),
+        ('ATM by ip_address (off-WAN)', lambda: ATM.objects.filter(ip_address__in=ips)),
+        ('ATM ordered by atm_name', lambda: ATM.objects.order_by('atm_name')[:100]),
+        ('ATM UPPER(tid) = ...', lambda: ATM.objects.alias(u=Upper('tid')).filter(u='AHW0054321')),
+        ('Branch connection filter, name order', lambda: Branch.objects.filter(connection_type='VSAT').order_by('name')[:100]),
+        ('Branch by service_number', lambda: Branch.objects.filter(service_number='123456789012')),
+        ('ATM atm_name icontains (unchanged)', lambda: ATM.objects.filter(atm_name__icontains='0042')[:100]),
+    ]
+
+
+def measure(label):
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    results = {}
+    print(f'\n=== {label} ===')
+    for name, build in queries():
+        plan = build().explain()
+        times = []
+        for _ in range(RUNS):
+            start = time.perf_counter()
+            list(build())
+            times.append(time.perf_counter() - start)
+        results[name] = statistics.median(times)
+        print(f'{name}: {results[name] * 1000:.2f} ms')
+        for line in plan.splitlines():
+            print(f'    {line}')
+    return results
+
+
+def main():
+    atms = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        call_command('migrate', *BEFORE, verbosity=0)
+        start = time.perf_counter()
+        load(atms)
+        print(f'loaded {ATM.objects.count():,} ATMs / {Branch.objects.count():,} branches '
+              f'in {time.perf_counter() - start:.1f}s on {connection.vendor}')
+
+        before = measure('before (0004)')
+        call_command('migrate', *AFTER, verbosity=0)
+        after = measure('after (0005)')
+
+        print('\n=== summary (median ms) ===')
+        for name in before:
+            speedup = before[name] / after[name] if after[name] else float('inf')
+            print(f'{name:40s} {before[name] * 1000:9.2f} -> {after[name] * 1000:9.2f}  ({speedup:.1f}x)')
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,51 +1,114 @@
 from django.contrib import admin
-from .models import Region, District, Branch, ContactPerson, ATM
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP
+from .pagination import EstimatedCountPaginator
+
+
+def related_count(model, field):
+    """Per-row count of `model` rows whose `field` points at the outer row, as a subquery."""
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by().values(field).annotate(count=Count('pk')).values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class DistrictListFilter(admin.RelatedFieldListFilter):
+    """District filter whose choices are read with their regions (District.__str__ shows the region)."""
+
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        districts = field.related_model._default_manager.select_related('region').order_by(*ordering)
+        return [(district.pk, str(district)) for district in districts]
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings for tables that grow to 100k+ rows."""
+    paginator = EstimatedCountPaginator
+    # skip the second COUNT(*) over the whole table on filtered changelists
+    show_full_result_count = False
+
 
 @admin.register(Region)
 class RegionAdmin(admin.ModelAdmin):
     list_display = ['name', 'code', 'district_count']
     search_fields = ['name', 'code']
-    
+    ordering = ['name']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(district_total=Count('districts'))
+
+    @admin.display(description='Districts', ordering='district_total')
     def district_count(self, obj):
-        return obj.districts.count()
-    district_count.short_description = 'Districts'
+        return obj.district_total
 
 @admin.register(District)
 class DistrictAdmin(admin.ModelAdmin):
     list_display = ['name', 'region', 'branch_count']
     list_filter = ['region']
+    list_select_related = ['region']
     search_fields = ['name', 'region__name']
-    
+    ordering = ['name']
+    autocomplete_fields = ['region']
+
+    def get_queryset(self, request):
+        # select_related also serves the autocomplete widgets, which print District.__str__
+        return (
+            super().get_queryset(request).select_related('region')
+            .annotate(branch_total=Count('branch'))
+        )
+
+    @admin.display(description='Branches', ordering='branch_total')
     def branch_count(self, obj):
-        return obj.branch_set.count()
-    branch_count.short_description = 'Branches'
+        return obj.branch_total
 
 @admin.register(Branch)
-class BranchAdmin(admin.ModelAdmin):
+class BranchAdmin(LargeTableAdmin):
     list_display = ['name', 'district', 'connection_type', 'service_number', 'wan_address', 'contact_count', 'atm_count']
-    list_filter = ['connection_type', 'district', 'district__region']
+    list_filter = ['connection_type', ('district', DistrictListFilter), 'district__region']
+    list_select_related = ['district__region']
     search_fields = ['name', 'service_number', 'wan_address']
     readonly_fields = ['created_at', 'updated_at']
-    
+    autocomplete_fields = ['district']
+
+    def get_queryset(self, request):
+        # subqueries rather than two joined Counts, which would multiply contacts by ATMs
+        return super().get_queryset(request).annotate(
+            contact_total=related_count(ContactPerson, 'branch'),
+            atm_total=related_count(ATM, 'branch'),
+        )
+
+    @admin.display(description='Contacts', ordering='contact_total')
     def contact_count(self, obj):
-        return obj.contacts.count()
-    contact_count.short_description = 'Contacts'
-    
+        return obj.contact_total
+
+    @admin.display(description='ATMs', ordering='atm_total')
     def atm_count(self, obj):
-        return obj.atms.count()
-    atm_count.short_description = 'ATMs'
+        return obj.atm_total
 
 @admin.register(ContactPerson)
-class ContactPersonAdmin(admin.ModelAdmin):
+class ContactPersonAdmin(LargeTableAdmin):
     list_display = ['full_name', 'branch', 'role', 'phone_number', 'email']
     list_filter = ['role', 'branch', 'branch__district__region']
+    list_select_related = ['branch']
     search_fields = ['full_name', 'phone_number', 'branch__name']
-    raw_id_fields = ['branch']
+    autocomplete_fields = ['branch']
 
 @admin.register(ATM)
-class ATMAdmin(admin.ModelAdmin):
+class ATMAdmin(LargeTableAdmin):
     list_display = ['tid', 'atm_name', 'branch', 'deployment_status', 'ip_address', 'location_type']
     list_filter = ['deployment_status', 'branch', 'branch__district__region']
+    list_select_related = ['branch']
     search_fields = ['tid', 'atm_name', 'ip_address']
     readonly_fields = ['created_at', 'updated_at']
-    raw_id_fields = ['branch']
\ No newline at end of file
+    autocomplete_fields = ['branch']
+
+@admin.register(WAN_IP)
+class WANIPAdmin(LargeTableAdmin):
+    list_display = ['ip_address', 'branch', 'subnet_mask', 'gateway', 'description']
+    list_filter = ['branch__connection_type', 'branch__district__region']
+    list_select_related = ['branch']
+    search_fields = ['ip_address', 'gateway', 'branch__name']
+    readonly_fields = ['created_at', 'updated_at']
+    autocomplete_fields = ['branch']
@@ -0,0 +1,110 @@
+"""Async list/detail endpoints for branches, ATMs and WAN IPs under `/api/async/`.
+
+Under WSGI, and for the sync DRF viewsets under ASGI, every request holds
+a worker thread while it waits on the database, so the dashboard's
+parallel fetches queue behind each other. These views serve the same
+responses as the viewsets they wrap (filters, `?search=`, `?ordering=`,
+`?fields=` / `?expand=`, keyset pages, and ETags and the response cache
+for the viewsets that have them) but read the rows with `acount()` /
+`aiterator()`, so an ASGI server (`python manage.py serve_asgi`) keeps
+serving other requests meanwhile.
+
+The short sync steps (authentication, the cache lookup, building the
+filtered queryset) run through `sync_to_async`; serializing needs no
+queries because the viewsets' querysets already `select_related` /
+`prefetch_related` what the serializers read.
+"""
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.urls import path
+from django.utils.decorators import classonlymethod
+from django.views import View
+from rest_framework import status
+from rest_framework.response import Response
+
+from .response_cache import CachedResponseMixin
+
+
+class AsyncReadView(View):
+    """
+    `GET` for one viewset's `list` or `retrieve` action, answered
+    asynchronously. `viewset` supplies the queryset, filters, serializers,
+    pagination and caching; writes stay on the viewset's own URLs.
+    """
+    viewset = None
+    action = 'list'
+
+    @classonlymethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset(
+            action=self.action, action_map={'get': self.action}, args=args, kwargs=kwargs, format_kwarg=None,
+        )
+        request = viewset.initialize_request(request, *args, **kwargs)
+        viewset.request = request
+        viewset.headers = viewset.default_response_headers
+        try:
+            response = await self.respond(viewset, request)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+        # rendered by Django's handler, in a thread like any other sync render
+        return viewset.finalize_response(request, response, *args, **kwargs)
+
+    async def respond(self, viewset, request):
+        etag, versions, entry, queryset = await sync_to_async(self.prepare)(viewset, request)
+        if entry is None:
+            response = await self.read(viewset, request, queryset)
+            if etag is None or response.status_code != status.HTTP_200_OK:
+                return response
+            entry = await sync_to_async(viewset.cache_store)(request, etag, versions, response.data)
+        return viewset.entry_response(request, etag, entry)
+
+    def prepare(self, viewset, request):
+        """Authenticate and check permissions, then look the response up in the cache, if any."""
+        viewset.initial(request)
+        etag = versions = entry = None
+        if isinstance(viewset, CachedResponseMixin):
+            etag, versions, entry = viewset.cache_lookup(request)
+        queryset = None
+        if entry is None:
+            # filtering only builds the query; it runs in read()
+            queryset = viewset.filter_queryset(viewset.get_queryset())
+        return etag, versions, entry, queryset
+
+    async def read(self, viewset, request, queryset):
+        if self.action == 'retrieve':
+            return Response(viewset.get_serializer(await self.get_object(viewset, queryset)).data)
+        page = await viewset.paginator.apaginate_queryset(queryset, request, view=viewset)
+        if page is None:
+            rows = [obj async for obj in queryset.aiterator(chunk_size=2000)]
+            return Response(viewset.get_serializer(rows, many=True).data)
+        return viewset.paginator.get_paginated_response(viewset.get_serializer(page, many=True).data)
+
+    async def get_object(self, viewset, queryset):
+        """`viewset.get_object()` without the sync query; object permissions are checked the same way."""
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        try:
+            queryset = queryset.filter(**{viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]})
+            # aiterator() rather than aget() so prefetch_related applies
+            found = [obj async for obj in queryset[:2].aiterator(chunk_size=2)]
+        except (TypeError, ValueError, ValidationError):
+            raise Http404
+        if len(found) != 1:
+            raise Http404(f'No {queryset.model._meta.object_name} matches the given query.')
+        await sync_to_async(viewset.check_object_permissions)(viewset.request, found[0])
+        return found[0]
+
+
+def read_urls(prefix, viewset, basename):
+    """The list and detail URLs of `viewset` under `prefix`, named `async-<basename>-list/-detail`."""
+    return [
+        path(f'{prefix}/', AsyncReadView.as_view(viewset=viewset, action='list'), name=f'async-{basename}-list'),
+        path(f'{prefix}/<str:pk>/', AsyncReadView.as_view(viewset=viewset, action='retrieve'),
+             name=f'async-{basename}-detail'),
+    ]
+
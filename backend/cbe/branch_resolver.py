@@ -0,0 +1,114 @@
+"""In-memory branch name lookup shared by the importers.
+
+`find_branch_by_name` used to try up to five queries per row (exact,
+iexact, icontains, first-word icontains and a MultipleObjectsReturned
+retry). `BranchResolver` loads every branch once and answers the same
+cascade from dictionaries and a sorted suffix list, so a lookup costs
+O(1) for exact / case-insensitive hits and O(log n) for substring hits.
+"""
+from bisect import bisect_left, bisect_right
+
+from .models import Branch
+
+
+def clean_branch_name(name):
+    """Strip the ' Branch' suffix the source files append to names."""
+    return str(name).replace(' Branch', '').strip()
+
+
+class BranchResolver:
+    """Resolve free-text branch names to `Branch` instances without queries.
+
+    Matching precedence mirrors the old query cascade:
+
+    1. exact name
+    2. case-insensitive exact name, if exactly one branch has it
+    3. case-insensitive substring of a name, first by name
+    4. case-insensitive substring on the first word only, first by name
+    """
+
+    def __init__(self, branches=()):
+        self._exact = {}
+        self._folded = {}
+        self._suffixes = None
+        self._cache = {}
+        for branch in branches:
+            self.add(branch)
+
+    @classmethod
+    def load(cls, queryset=None):
+        """Build a resolver from every branch (or the given queryset) in one query."""
+        if queryset is None:
+            queryset = Branch.objects.select_related('district')
+        return cls(queryset.order_by('name'))
+
+    def __len__(self):
+        return len(self._exact)
+
+    def add(self, branch):
+        """Register a branch created after loading, e.g. by an importer."""
+        self._exact[branch.name] = branch
+        folded = branch.name.casefold()
+        matches = self._folded.setdefault(folded, [])
+        matches.append(branch)
+        matches.sort(key=lambda b: b.name)
+        if self._suffixes is not None:
+            suffixes, owners = self._suffixes
+            for i in range(len(folded)):
+                pos = bisect_right(suffixes, folded[i:])
+                suffixes.insert(pos, folded[i:])
+                owners.insert(pos, branch)
+        # cached answers may now be stale
+        self._cache.clear()
+
+    def exact(self, name):
+        """Exact name match only, like `Branch.objects.filter(name=name).first()`."""
+        return self._exact.get(name)
+
+    def resolve(self, name):
+        """Find a branch with the flexible matching cascade, or None."""
+        if not name:
+            return None
+        if name in self._cache:
+            return self._cache[name]
+
+        clean_name = clean_branch_name(name)
+        branch = self._exact.get(clean_name)
+        if branch is None and clean_name:
+            folded = clean_name.casefold()
+            matches = self._folded.get(folded, [])
+            if len(matches) == 1:
+                branch = matches[0]
+            else:
+                # several case-insensitive hits fell back to icontains before
+                branch = self._first_containing(folded)
+                if branch is None:
+                    words = folded.split()
+                    if words:
+                        branch = self._first_containing(words[0])
+
+        self._cache[name] = branch
+        return branch
+
+    def _first_containing(self, needle):
+        """Return the first branch (by name) whose folded name contains `needle`."""
+        if self._suffixes is None:
+            self._build_suffixes()
+        suffixes, owners = self._suffixes
+        lo = bisect_left(suffixes, needle)
+        hi = bisect_right(suffixes, needle + '\U0010ffff', lo)
+        if lo == hi:
+            return None
+        return min((owners[i] for i in range(lo, hi)), key=lambda b: b.name)
+
+    def _build_suffixes(self):
+        pairs = sorted(
+            (
+                (folded[i:], branch)
+                for folded, matches in self._folded.items()
+                for branch in matches
+                for i in range(len(folded))
+            ),
+            key=lambda pair: pair[0],
+        )
+        self._suffixes = ([s for s, _ in pairs], [b for _, b in pairs])
@@ -0,0 +1,222 @@
+"""List-mode bulk endpoints (`/api/atms/bulk/`, `/api/branches/bulk/`).
+
+One request carries many items. They are validated with the viewset's
+serializer in a single pass, using lookups prefetched up front instead of
+the per-item queries DRF would run (unique key probe, related object
+fetch). Everything is then written with `bulk_create` / `bulk_update` in
+one transaction. New items are upserted on the bulk key, so an item another
+request created since the lookup is updated rather than failing the batch.
+"""
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.response import Response
+from rest_framework.serializers import as_serializer_error
+from rest_framework.validators import UniqueValidator
+
+from .bulk_import import BulkImporter, ImportStats
+from .ip_index import refresh_ips
+from .search import dependents, refresh_entries, suspend_indexing
+from .versions import batch_versions
+
+
+class _PrefetchedQueryset:
+    """Stands in for a related field's queryset: `.get(pk=...)` from a dict."""
+
+    def __init__(self, model, objects):
+        self.model = model
+        self.objects = objects
+
+    def get(self, pk):
+        try:
+            return self.objects[str(pk)]
+        except KeyError:
+            raise self.model.DoesNotExist from None
+
+    def all(self):
+        return self
+
+
+class BulkMixin:
+    """
+    Adds a `bulk` action keyed on `bulk_key` (a unique model field):
+
+    * `POST`   `[{...}, ...]` creates items, or fully updates the ones whose key exists
+    * `PATCH`  `[{"<key>": ..., "changes": {...}}, ...]` partially updates existing items
+    * `DELETE` `["<key>", ...]` deletes items
+
+    Invalid items are reported as `{"index", "<key>", "errors"}`. By default
+    nothing is written when any item is invalid (400); with `?atomic=false`
+    the valid items are written and the errors still returned.
+    """
+    bulk_key = None
+    bulk_max_items = 5000
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk', pagination_class=None)
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'detail': 'Expected a list of items.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > self.bulk_max_items:
+            return Response(
+                {'detail': f'At most {self.bulk_max_items} items per request.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        atomic = request.query_params.get('atomic', '').lower() not in ('0', 'false', 'no')
+
+        if request.method == 'DELETE':
+            return self.bulk_delete(items)
+
+        model = self.get_queryset().model
+        key = self.bulk_key
+        partial = request.method == 'PATCH'
+        errors = []
+        to_create, to_update, update_fields = [], [], set()
+
+        keys = []
+        for item in items:
+            if not isinstance(item, dict) or item.get(key) in (None, ''):
+                keys.append(None)
+            else:
+                keys.append(str(item[key]))
+        existing = {
+            str(getattr(obj, key)): obj
+            for obj in model.objects.filter(**{f'{key}__in': [k for k in keys if k is not None]})
+        }
+        validator = self.bulk_serializer(partial, self.bulk_lookups(items, partial))
+
+        seen = set()
+        for index, (item, item_key) in enumerate(zip(items, keys)):
+            if item_key is None:
+                errors.append(self.bulk_error(index, None, {key: ['This field is required.']}))
+                continue
+            if item_key in seen:
+                errors.append(self.bulk_error(index, item_key, {key: ['Duplicate item in this request.']}))
+                continue
+            seen.add(item_key)
+
+            instance = existing.get(item_key)
+            if partial:
+                changes = item.get('changes')
+                if instance is None:
+                    errors.append(self.bulk_error(index, item_key, {key: ['Not found.']}))
+                    continue
+                if not isinstance(changes, dict):
+                    errors.append(self.bulk_error(index, item_key, {'changes': ['Expected an object.']}))
+                    continue
+                if key in changes and str(changes[key]) != item_key:
+                    errors.append(self.bulk_error(index, item_key, {key: ['Cannot be changed in bulk.']}))
+                    continue
+                data = changes
+            else:
+                data = item
+
+            validator.instance = instance
+            try:
+                validated = validator.run_validation(data)
+            except ValidationError as exc:
+                errors.append(self.bulk_error(index, item_key, as_serializer_error(exc)))
+                continue
+            if instance is None:
+                to_create.append(model(**validated))
+            else:
+                for field, value in validated.items():
+                    setattr(instance, field, value)
+                update_fields.update(validated)
+                to_update.append(instance)
+
+        if errors and atomic:
+            return Response({'created': [], 'updated': [], 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = BulkImporter()
+        stats = ImportStats(f'bulk {model._meta.model_name}')
+        try:
+            with transaction.atomic():
+                # keys stored since the lookup above, by a concurrent request
+                raced = {str(k) for k in importer.existing_keys(model, [key], to_create)} if to_create else set()
+                importer.upsert(model, to_create, [key], stats)
+                importer.update(model, to_update, sorted(update_fields), stats)
+        except IntegrityError:
+            return Response({
+                'detail': 'The items conflict with a concurrent change; nothing was written.',
+                'created': [], 'updated': [], 'errors': errors,
+            }, status=status.HTTP_409_CONFLICT)
+        if to_create or to_update:
+            pks = [obj.pk for obj in to_create + to_update]
+            refresh_entries(model, pks)
+            refresh_ips(model, pks)
+        created_keys = [str(getattr(obj, key)) for obj in to_create]
+        return Response({
+            'created': [k for k in created_keys if k not in raced],
+            'updated': [str(getattr(obj, key)) for obj in to_update] + [k for k in created_keys if k in raced],
+            'errors': errors,
+        }, status=status.HTTP_400_BAD_REQUEST if errors and not (to_create or to_update) else status.HTTP_200_OK)
+
+    def bulk_delete(self, keys):
+        key = self.bulk_key
+        if not all(isinstance(k, (str, int)) for k in keys):
+            return Response({'detail': f'Expected a list of {key} values.'}, status=status.HTTP_400_BAD_REQUEST)
+        keys = [str(k) for k in keys]
+        model = self.get_queryset().model
+        queryset = model.objects.filter(**{f'{key}__in': keys})
+        with transaction.atomic(), suspend_indexing(), batch_versions():
+            rows = list(queryset.values_list('pk', key))
+            pks = [pk for pk, _ in rows]
+            stale = dependents(model, pks)
+            queryset.delete()
+            refresh_entries(model, pks, stale)
+            refresh_ips(model, pks, stale)
+        found = [str(k) for _, k in rows]
+        positions = {}
+        for index, k in enumerate(keys):
+            positions.setdefault(k, index)
+        missing = sorted(set(keys) - set(found))
+        return Response({
+            'deleted': found,
+            'errors': [self.bulk_error(positions[k], k, {key: ['Not found.']}) for k in missing],
+        })
+
+    def bulk_error(self, index, item_key, errors):
+        return {'index': index, self.bulk_key: item_key, 'errors': errors}
+
+    def bulk_lookups(self, items, partial):
+        """Prefetch every writable related field's targets named by `items`, one query per field."""
+        lookups = {}
+        for name, field in self.get_serializer().fields.items():
+            if not isinstance(field, PrimaryKeyRelatedField) or field.read_only:
+                continue
+            wanted = set()
+            for item in items:
+                data = item.get('changes') if partial and isinstance(item, dict) else item
+                if isinstance(data, dict) and data.get(name) not in (None, ''):
+                    wanted.add(str(data[name]))
+            queryset = field.get_queryset()
+            pk_field = queryset.model._meta.pk
+            valid = []
+            for value in wanted:
+                try:
+                    valid.append(pk_field.to_python(value))
+                except (TypeError, ValueError, DjangoValidationError):
+                    # reported by the serializer as a missing object
+                    continue
+            objects = {str(obj.pk): obj for obj in queryset.filter(pk__in=valid)} if valid else {}
+            lookups[name] = _PrefetchedQueryset(queryset.model, objects)
+        return lookups
+
+    def bulk_serializer(self, partial, lookups):
+        """One serializer to validate every item with (building one per item dominates the cost).
+
+        Its per-item queries are swapped for the prefetched `lookups`, and the
+        key's UniqueValidator is dropped: uniqueness is checked against the
+        whole request instead. Set `.instance` before each `run_validation`.
+        """
+        serializer = self.get_serializer(partial=partial)
+        for name, lookup in lookups.items():
+            serializer.fields[name].queryset = lookup
+        key_field = serializer.fields.get(self.bulk_key)
+        if key_field is not None:
+            key_field.validators = [v for v in key_field.validators if not isinstance(v, UniqueValidator)]
+        return serializer
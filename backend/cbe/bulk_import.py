@@ -0,0 +1,256 @@
+"""Set-based write helpers for the CSV importers.
+
+Importers build unsaved model instances in memory, validate them here and
+then hand them to `BulkImporter.upsert` / `BulkImporter.update`, which write
+them with `bulk_create` / `bulk_update` in batches instead of one query per
+row. Every stage is timed so the command can report rows/sec. Those writes
+send no signals, so each one moves the model's data version itself (see
+`cbe.versions`).
+"""
+import time
+from contextlib import contextmanager
+
+from django.core.exceptions import ValidationError
+
+from .versions import bump_versions
+
+DEFAULT_BATCH_SIZE = 1000
+# distinct value combinations per batch worth writing as separate UPDATEs
+MAX_UPDATE_GROUPS = 20
+
+
+class ImportStats:
+    """Counters and timing for one import stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.created = 0
+        self.updated = 0
+        self.skipped = 0
+        self.unchanged = 0
+        self.deleted = 0
+        self.replayed = 0  # rows of chunks committed before a --resume
+        self.errors = []
+        self.seconds = 0.0
+
+    @property
+    def rows_per_sec(self):
+        if not self.seconds:
+            return float(self.rows)
+        return self.rows / self.seconds
+
+    def error(self, label, message):
+        self.errors.append(f'{label}: {message}')
+
+    def summary(self):
+        delta = ''.join(
+            f', {count} {label}'
+            for count, label in (
+                (self.unchanged, 'unchanged'), (self.deleted, 'deleted'), (self.replayed, 'already committed'),
+            ) if count
+        )
+        return (
+            f'{self.name}: {self.rows} rows, {self.created} created, '
+            f'{self.updated} updated{delta}, {self.skipped} skipped, {len(self.errors)} invalid '
+            f'in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/s)'
+        )
+
+
+def choice_lookup(field):
+    """Map lowercased choice keys and labels to the key ('fiber' -> 'FIBER')."""
+    lookup = {}
+    for key, label in field.flatchoices:
+        lookup.setdefault(str(label).lower(), key)
+        lookup[str(key).lower()] = key
+    return lookup
+
+
+def canonical_choice(field, value, lookup=None):
+    """Map `value` onto the field's choice key ignoring case ('Fiber' -> 'FIBER').
+
+    Values that match no choice are returned unchanged; the database does not
+    enforce choices and the source files contain plenty of free text.
+    """
+    if value is None or not field.choices:
+        return value
+    if lookup is None:
+        lookup = choice_lookup(field)
+    return lookup.get(str(value).lower(), value)
+
+
+class BulkImporter:
+    """Validate model instances in memory and write them in batches."""
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE):
+        self.batch_size = batch_size
+        self.stages = []
+        self._plans = {}
+
+    @contextmanager
+    def stage(self, name):
+        stats = ImportStats(name)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            stats.seconds = time.perf_counter() - start
+            self.stages.append(stats)
+
+    def validate(self, instance, stats, label):
+        """Check the constraints the database enforces without touching it.
+
+        Checks null/blank/max_length on every local field (running the
+        field's full validators for non-text fields) and canonicalizes
+        choice values in place. Relations are skipped since validating them
+        costs a query per row. Returns False and records the error on
+        `stats` when the instance must not be written.
+        """
+        for field, lookup, max_length, plain in self._field_plan(type(instance)):
+            value = getattr(instance, field.attname)
+            if lookup is not None and value is not None:
+                value = lookup.get(str(value).lower(), value)
+                setattr(instance, field.attname, value)
+            if value is None:
+                if field.null:
+                    continue
+                stats.error(label, f'{field.name} is required')
+                return False
+            if value == '' and not field.blank:
+                stats.error(label, f'{field.name} is required')
+                return False
+            if plain:
+                if max_length is not None and len(str(value)) > max_length:
+                    stats.error(label, f'{field.name} is longer than {max_length} characters')
+                    return False
+                continue
+            try:
+                field.run_validators(field.to_python(value))
+            except ValidationError as e:
+                stats.error(label, '; '.join(e.messages))
+                return False
+        return True
+
+    def _field_plan(self, model):
+        """Per-model list of (field, choice lookup, max_length, is plain CharField), built once."""
+        plan = self._plans.get(model)
+        if plan is None:
+            plan = []
+            for field in model._meta.concrete_fields:
+                if field.primary_key or field.is_relation or getattr(field, 'auto_now', False) \
+                        or getattr(field, 'auto_now_add', False):
+                    continue
+                # choices are deliberately not enforced, see canonical_choice()
+                lookup = choice_lookup(field) if field.choices else None
+                plain = field.get_internal_type() == 'CharField'
+                plan.append((field, lookup, field.max_length, plain))
+            self._plans[model] = plan
+        return plan
+
+    def existing_keys(self, model, unique_fields, instances):
+        """Return which of `instances`' unique keys are already stored.
+
+        Only the keys of the given instances are looked up, so the cost is
+        bounded by the batch, not by the size of the table.
+        """
+        attnames = [model._meta.get_field(name).attname for name in unique_fields]
+        wanted = {self.instance_key(instance, unique_fields) for instance in instances}
+        first = list({key[0] for key in wanted}) if len(attnames) > 1 else list(wanted)
+        found = set()
+        for start in range(0, len(first), self.batch_size):
+            rows = model.objects.filter(**{f'{attnames[0]}__in': first[start:start + self.batch_size]})
+            if len(attnames) == 1:
+                found.update(rows.values_list(attnames[0], flat=True))
+            else:
+                found.update(key for key in rows.values_list(*attnames) if key in wanted)
+        return found
+
+    def instance_key(self, instance, unique_fields):
+        values = tuple(getattr(instance, instance._meta.get_field(name).attname) for name in unique_fields)
+        return values[0] if len(values) == 1 else values
+
+    def upsert(self, model, instances, unique_fields, stats, update_fields=None):
+        """Insert `instances`, updating rows that clash on `unique_fields`.
+
+        `update_fields` defaults to every concrete non-key field except the
+        primary key and `auto_now_add` columns.
+        """
+        if not instances:
+            return
+        if update_fields is None:
+            update_fields = [
+                f.name for f in model._meta.concrete_fields
+                if not f.primary_key and f.name not in unique_fields
+                and not getattr(f, 'auto_now_add', False)
+            ]
+        existing = self.existing_keys(model, unique_fields, instances)
+        for instance in instances:
+            if self.instance_key(instance, unique_fields) in existing:
+                stats.updated += 1
+            else:
+                stats.created += 1
+
+        model.objects.bulk_create(
+            instances,
+            batch_size=self.batch_size,
+            update_conflicts=bool(update_fields),
+            ignore_conflicts=not update_fields,
+            unique_fields=unique_fields if update_fields else None,
+            update_fields=update_fields or None,
+        )
+        bump_versions(model)
+
+    def create(self, model, instances, stats):
+        """Plain batched insert for rows known to be new."""
+        if not instances:
+            return
+        model.objects.bulk_create(instances, batch_size=self.batch_size)
+        bump_versions(model)
+        stats.created += len(instances)
+
+    def update(self, model, instances, fields, stats):
+        """Batched UPDATE of `fields` on already-saved instances.
+
+        When the rows share only a few distinct value combinations (e.g. one
+        status set on thousands of ATMs) each combination is written with a
+        single `UPDATE ... WHERE pk IN (...)`, which is far cheaper than the
+        per-row CASE expressions `bulk_update` builds.
+        """
+        if not instances:
+            return
+        fields = list(fields)
+        if any(f.name == 'updated_at' for f in model._meta.concrete_fields) and 'updated_at' not in fields:
+            # one timestamp for the whole call, so equal rows stay groupable
+            stamp = model._meta.get_field('updated_at').pre_save(instances[0], False)
+            for instance in instances:
+                instance.updated_at = stamp
+            fields.append('updated_at')
+        groups = self._value_groups(model, instances, fields)
+        if groups is not None:
+            for values, pks in groups.items():
+                for start in range(0, len(pks), self.batch_size):
+                    model.objects.filter(pk__in=pks[start:start + self.batch_size]).update(**dict(values))
+        else:
+            model.objects.bulk_update(instances, fields, batch_size=self.batch_size)
+        bump_versions(model)
+        stats.updated += len(instances)
+
+    def _value_groups(self, model, instances, fields):
+        """{((attname, value), ...): [pk, ...]}, or None when there are too many distinct rows."""
+        attnames = [model._meta.get_field(name).attname for name in fields]
+        limit = max(1, len(instances) // self.batch_size) * MAX_UPDATE_GROUPS
+        groups = {}
+        try:
+            for instance in instances:
+                values = tuple((attname, getattr(instance, attname)) for attname in attnames)
+                groups.setdefault(values, []).append(instance.pk)
+                if len(groups) > limit:
+                    return None
+        except TypeError:
+            # unhashable values
+            return None
+        return groups
+
+    def key_map(self, model, field, value_field='pk'):
+        """Return a dict of `field` -> `value_field` for every stored row."""
+        return dict(model.objects.values_list(field, value_field))
@@ -0,0 +1,68 @@
+"""CSV column names of the inventory sheets.
+
+Shared by `import_cbe_data`, which reads each model field from the first
+candidate column a file has, and `cbe.export`, which writes the first
+candidate as the header so an exported CSV imports back as is.
+"""
+
+# model field -> candidate CSV column names, first match wins
+BRANCH_COLUMNS = {
+    'connection_type': ('Connection Type', 'connection_type'),
+    'service_number': ('Service No.', 'service_no', 'service_number'),
+    'wan_address': ('WAN Address', 'wan_address', 'wan_ip', 'wan ip'),
+    'default_gateway': ('Default Gateway', 'wan_default_gateway', 'default_gateway'),
+    'lan_address': ('LAN Address', 'lan_address', 'lan ip'),
+    # not in the source sheet; read back from /api/export/branches/
+    'host_name': ('Host Name', 'host_name'),
+    'vsat_ip': ('VSAT IP', 'vsat_ip'),
+    **{f'tunnel_{i}': (f'Tunnel {i}', f'tunnel_{i}') for i in range(7)},
+}
+
+BRANCH_OSPF_COLUMNS = {
+    'connection_type': ('Connection Type', 'connection_type'),
+    'service_number': ('Service No.', 'service_no', 'service_number'),
+    'host_name': ('Host Name', 'host_name'),
+    'wan_address': ('WAN IP', 'wan_ip', 'wan_address'),
+    'lan_address': ('LAN IP', 'lan ip', 'lan_address'),
+    'default_gateway': ('WAN Default Gateway', 'wan_default_gateway', 'default_gateway'),
+}
+
+CONTACT_COLUMNS = {
+    'role': ('Role', 'role'),
+    'phone_number': ('Phone Number', 'phone_number'),
+    'email': ('Email', 'email'),
+    'department': ('Department', 'department'),
+    'alternative_phone': ('Alternative Phone', 'alternative_phone'),
+}
+
+ATM_COLUMNS = {
+    'ip_address': ('ip_address', 'ip address', 'ip'),
+    'port': ('port',),
+    'location_type': ('location_type',),
+    'atm_brand': ('atm_brand', 'brand'),
+    'dispenser_type': ('dispenser_type',),
+    'atm_type': ('atm_type',),
+    'serial_number': ('serial_number',),
+    'tag_no': ('tag_no',),
+    'deployment_status': ('deployment_status',),
+    'placement_type': ('placement_type',),
+    'service_number': ('service_number', 'service_no'),
+    'connection_type': ('connection_type',),
+    'reserve_casset_availability': ('reserve_casset_availability',),
+    'reserve_casset_quantity': ('reserve_casset_quantity',),
+}
+
+OFF_WAN_BRANCH_COLUMNS = {
+    'connection_type': ('Connection Type', 'connection_type'),
+    'service_number': ('Service No.', 'service_no', 'service_number'),
+    'wan_address': ('WAN IP', 'wan_ip', 'wan_address'),
+    'lan_address': ('LAN Address (Router IP)', 'lan_address', 'lan ip', 'lan_address_router_ip'),
+    # LoopBack (Router-id) may be a gateway
+    'default_gateway': ('LoopBack (Router-id)', 'loopback', 'router-id', 'default_gateway'),
+}
+
+OFF_WAN_TUNNEL_COLUMNS = [
+    'tunnel ip dr-er116', 'tunnel ip dr-er126', 'tunnel ip dc-er316', 'tunnel ip dc-er416',
+    'tunnel ip dr-er11', 'tunnel ip dr-er12', 'tunnel ip dc-er21', 'tunnel ip dc-er22',
+]
+
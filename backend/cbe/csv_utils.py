@@ -1,33 +1,115 @@
+import codecs
+import gzip
 import re
+import time
+from decimal import Decimal
 import pandas as pd
 import json
 import os
 from datetime import datetime
 
+from django.conf import settings
 
-def read_csv_safe(file_path: str):
-    """Read CSV trying multiple encodings without normalizing column names.
 
-    Returns a DataFrame with original column names or None on failure.
+# Tried in order on a byte sample; latin-1 decodes anything so it goes last.
+CSV_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def detect_encoding(file_path: str, sample_size: int = 1024 * 1024):
+    """Guess a file's encoding from its first `sample_size` bytes.
+
+    A UTF-8 byte order mark gives 'utf-8-sig'. Otherwise the first entry of
+    CSV_ENCODINGS that decodes the sample wins. A multibyte character cut in
+    half by the end of the sample is not counted as a decode failure.
     """
-    encodings_to_try = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252', 'windows-1252']
-    last_exception = None
+    with open(file_path, 'rb') as fh:
+        sample = fh.read(sample_size)
+    if sample.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
 
-    for enc in encodings_to_try:
+    final = len(sample) < sample_size
+    for enc in CSV_ENCODINGS:
         try:
-            df = pd.read_csv(file_path, encoding=enc)
-            # Keep original column names
-            return df
-        except Exception as e:
-            last_exception = e
+            codecs.getincrementaldecoder(enc)().decode(sample, final=final)
+            return enc
+        except UnicodeDecodeError:
             continue
+    return CSV_ENCODINGS[-1]
 
-    # Final attempt with errors='replace'
-    try:
-        df = pd.read_csv(file_path, encoding='utf-8', errors='replace')
-        return df
-    except Exception as e:
-        raise last_exception or e
+
+def iter_csv_batches(file_path: str, batch_size: int = DEFAULT_CHUNK_SIZE, encoding: str = None, **kwargs):
+    """Yield a CSV file as DataFrames of at most `batch_size` rows.
+
+    The encoding is detected once from a byte sample instead of re-parsing
+    the file per candidate encoding. Bytes that still do not decode (e.g. a
+    stray cp1252 byte deep inside a mostly UTF-8 file) are replaced with
+    U+FFFD rather than aborting the import. Extra keyword arguments such as
+    `dtype` or `usecols` are passed to `pandas.read_csv`, so every batch has
+    the same column types. Memory use is bounded by the batch size.
+    """
+    encoding = encoding or detect_encoding(file_path)
+    with pd.read_csv(
+        file_path,
+        encoding=encoding,
+        encoding_errors='replace',
+        chunksize=batch_size,
+        **kwargs
+    ) as reader:
+        for chunk in reader:
+            yield chunk
+
+
+def read_csv_safe(file_path: str, **kwargs):
+    """Read a whole CSV without normalizing column names.
+
+    Uses the same single-pass encoding detection as `iter_csv_batches`.
+    Prefer `iter_csv_batches` for large files.
+    """
+    return pd.read_csv(
+        file_path,
+        encoding=detect_encoding(file_path),
+        encoding_errors='replace',
+        **kwargs
+    )
+
+
+def _column_key(name):
+    """Normalize a column name for loose matching ('Branch Name' == 'branch_name')."""
+    return re.sub(r'[\s_]+', '_', str(name).strip().lower())
+
+
+def find_column(columns, *candidates):
+    """Return the first column from `columns` matching one of `candidates`.
+
+    Exact names win; otherwise names are compared case-insensitively with
+    spaces and underscores treated alike. Returns None when nothing matches.
+    """
+    columns = list(columns)
+    for name in candidates:
+        if name in columns:
+            return name
+    normalized = {_column_key(col): col for col in columns}
+    for name in candidates:
+        col = normalized.get(_column_key(name))
+        if col is not None:
+            return col
+    return None
+
+
+def get_row_value(row, *candidates):
+    """Return the value of the first candidate column present in `row`.
+
+    Works with a pandas Series or a plain dict. Missing columns and NaN
+    values yield None.
+    """
+    col = find_column(row.keys(), *candidates)
+    if col is None:
+        return None
+    value = row[col]
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return None
+    return value
 
 
 def map_row_to_model(row, model_class, column_mapping):
@@ -51,6 +133,69 @@ def map_row_to_model(row, model_class, column_mapping):
     return model_data
 
 
+# Cell values treated as empty by clean_value / clean_column
+NULL_TOKENS = ['', 'null', 'None', ' ', 'nan', 'NaT']
+
+_INTEGER_FLOAT_RE = re.compile(r'^-?\d+\.0+$')
+
+
+def clean_value(value):
+    """Return a stripped string, or None for NaN and the NULL_TOKENS."""
+    if pd.isna(value) or value in NULL_TOKENS:
+        return None
+    return str(value).strip()
+
+
+def clean_column(series):
+    """Vectorized `clean_value` over a whole column.
+
+    Returns an object Series holding stripped strings and None, element for
+    element equal to calling `clean_value` on each cell.
+    """
+    null = series.isna() | series.isin(NULL_TOKENS)
+    cleaned = series.astype(str).str.strip().astype(object)
+    cleaned[null] = None
+    return cleaned
+
+
+def clean_frame(df, columns=None):
+    """Apply `clean_column` to `columns` (default: all) of a DataFrame copy."""
+    df = df.copy()
+    for col in (df.columns if columns is None else columns):
+        df[col] = clean_column(df[col])
+    return df
+
+
+def strip_branch_suffix(series):
+    """Vectorized `branch_resolver.clean_branch_name` for an already cleaned column."""
+    null = series.isna()
+    names = series.astype(str).str.replace(' Branch', '', regex=False).str.strip().astype(object)
+    names[null] = None
+    return names
+
+
+def primary_ip(value):
+    """First address of a multi-IP cell such as '10.1.1.1/10.2.2.2' or '10.1.1.1 (10.2.2.2)'."""
+    if value is None:
+        return None
+    return str(value).replace('(', '/').replace(')', '').split('/')[0].strip()
+
+
+def primary_ip_column(series):
+    """Vectorized `primary_ip` for an already cleaned column."""
+    null = series.isna()
+    ips = (
+        series.astype(str)
+        .str.replace('(', '/', regex=False)
+        .str.replace(')', '', regex=False)
+        .str.split('/').str[0]
+        .str.strip()
+        .astype(object)
+    )
+    ips[null] = None
+    return ips
+
+
 def normalize_tid(value):
     """Normalize TID values read from CSVs.
 
@@ -69,13 +214,12 @@ def normalize_tid(value):
     s = s.replace(',', '').strip('"').strip("'")
 
     # If it's an integer-like float (e.g., '12345.0'), remove the decimal part
-    if re.match(r'^-?\d+\.0+$', s):
+    if _INTEGER_FLOAT_RE.match(s):
         return s.split('.')[0]
 
     # Try to parse scientific notation or large floats to integer string
     try:
         # Use Decimal for safer large number handling
-        from decimal import Decimal
         d = Decimal(s)
         # If it's whole number, return as integer string
         if d == d.to_integral_value():
@@ -89,28 +233,74 @@ def normalize_tid(value):
         return s
 
 
+def normalize_tid_column(series):
+    """Vectorized `normalize_tid` with identical output.
+
+    The common shapes are handled with column-wide string operations:
+    '12345.0' style floats, plain integers (which Decimal strips of leading
+    zeros) and ids starting with a letter, which Decimal rejects. Anything
+    else, e.g. scientific notation, falls back to `normalize_tid` per cell.
+    """
+    missing = series.isna()
+    text = series.astype(str).str.strip()
+    valid = ~missing & (text != '')
+    s = text.str.replace(',', '', regex=False).str.strip('"').str.strip("'")
+
+    int_float = valid & s.str.match(_INTEGER_FLOAT_RE.pattern)
+    digits = s.str.lstrip('-').str.lstrip('0').replace('', '0')
+    # Decimal.quantize() gives up beyond 28 digits; leave those to the scalar path
+    integer = valid & ~int_float & s.str.fullmatch(r'-?[0-9]+') & (digits.str.len() <= 28)
+    # a leading letter cannot start a Decimal (Inf, NaN and sNaN aside)
+    word = valid & ~int_float & ~integer & s.str.match(r'[A-HJ-MO-RT-Za-hj-mo-rt-z]')
+    dotted = s.str.contains('.', regex=False) & s.str.rstrip('0').str.endswith('.')
+    other = (valid | missing) & ~int_float & ~integer & ~word
+
+    result = pd.Series([None] * len(series), index=series.index, dtype=object)
+    result[int_float] = s[int_float].str.split('.').str[0]
+    result[integer] = s[integer].str.startswith('-').map({True: '-', False: ''}) + digits[integer]
+    result[word] = s[word].where(~dotted[word], s[word].str.split('.').str[0])
+    result[other] = [normalize_tid(value) for value in series[other]]
+    return result
+
+
+def audit_dir():
+    """Where the audit trail is written: `settings.IMPORT_AUDIT_DIR`, `data/imported/` by default."""
+    return str(getattr(settings, 'IMPORT_AUDIT_DIR', os.path.join(settings.BASE_DIR, 'data', 'imported')))
+
+
+def audit_file_key(source_file: str):
+    """Sanitized audit file name stem for a source CSV path."""
+    key = os.path.basename(source_file)
+    return re.sub(r'[^0-9a-zA-Z._-]+', '_', key)
+
+
+def audit_entry(source_file: str, row: dict, model: str = None, model_pk: str = None):
+    return {
+        'timestamp': datetime.utcnow().isoformat() + 'Z',
+        'source_file': source_file,
+        'model': model,
+        'model_pk': str(model_pk) if model_pk is not None else None,
+        'row': row
+    }
+
+
 def persist_import_row(source_file: str, row: dict, model: str = None, model_pk: str = None):
-    """Persist the original CSV row into a JSONL file under `data/imported/`.
+    """Persist the original CSV row into a JSONL file under `audit_dir()`.
 
     Each line will be a JSON object containing: timestamp, source_file, model, model_pk, row
     This avoids changing DB schema while keeping every column from the CSV.
+    Opens the file once per call; importers writing many rows should use
+    `ImportAuditLog` instead.
     """
     try:
-        base_dir = os.path.join('data', 'imported')
+        base_dir = audit_dir()
         os.makedirs(base_dir, exist_ok=True)
 
         # sanitize source filename to key
-        key = os.path.basename(source_file)
-        key = re.sub(r'[^0-9a-zA-Z._-]+', '_', key)
+        key = audit_file_key(source_file)
         file_path = os.path.join(base_dir, f"{key}.jsonl")
 
-        entry = {
-            'timestamp': datetime.utcnow().isoformat() + 'Z',
-            'source_file': source_file,
-            'model': model,
-            'model_pk': str(model_pk) if model_pk is not None else None,
-            'row': row
-        }
+        entry = audit_entry(source_file, row, model=model, model_pk=model_pk)
 
         with open(file_path, 'a', encoding='utf-8') as fh:
             fh.write(json.dumps(entry, ensure_ascii=False) + '\n')
@@ -118,3 +308,125 @@ def persist_import_row(source_file: str, row: dict, model: str = None, model_pk:
         return file_path
     except Exception:
         return None
+
+
+class ImportAuditLog:
+    """Buffered writer for the `data/imported/*.jsonl` audit trail.
+
+    Keeps one open handle per source file and writes serialized rows in
+    blocks, flushing when `max_buffer` lines are pending or `flush_interval`
+    seconds have passed since the last flush. With `compress='gzip'` the
+    files are `.jsonl.gz` (appending adds a gzip member, which readers
+    handle transparently). When `max_bytes` is set, a file that grows past
+    it is rotated to `<name>.jsonl.<UTC timestamp>[.gz]` and a fresh one is
+    started.
+
+    Unlike `persist_import_row`, failures are counted rather than silently
+    lost: `dropped` counts rows that could not be serialized, `failed` rows
+    lost to I/O errors, and `errors` keeps the messages. Use it as a context
+    manager so pending rows are flushed and handles closed::
+
+        with ImportAuditLog() as audit:
+            audit.write('data/csv/atm_all.csv', row, model='ATM', model_pk=atm.pk)
+    """
+
+    COMPRESSORS = {None: '', 'gzip': '.gz'}
+
+    def __init__(self, base_dir: str = None, max_buffer: int = 1000, flush_interval: float = 5.0,
+                 compress: str = None, max_bytes: int = None):
+        if compress not in self.COMPRESSORS:
+            raise ValueError(f'Unsupported audit compression: {compress!r}')
+        self.base_dir = base_dir or audit_dir()
+        self.max_buffer = max_buffer
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.max_bytes = max_bytes
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.errors = []
+        self._handles = {}
+        self._buffers = {}
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    def path_for(self, source_file: str):
+        suffix = self.COMPRESSORS[self.compress]
+        return os.path.join(self.base_dir, f'{audit_file_key(source_file)}.jsonl{suffix}')
+
+    def write(self, source_file: str, row: dict, model: str = None, model_pk: str = None):
+        """Queue one audit line; returns the target path, or None if the row was dropped."""
+        try:
+            line = json.dumps(audit_entry(source_file, row, model=model, model_pk=model_pk),
+                              ensure_ascii=False, default=str) + '\n'
+        except (TypeError, ValueError) as e:
+            self.dropped += 1
+            self.errors.append(f'{source_file}: could not serialize row: {e}')
+            return None
+
+        path = self.path_for(source_file)
+        self._buffers.setdefault(path, []).append(line)
+        self._pending += 1
+        if self._pending >= self.max_buffer or time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return path
+
+    def flush(self):
+        """Write every buffered line to its file."""
+        for path, lines in self._buffers.items():
+            if not lines:
+                continue
+            try:
+                handle = self._handle(path)
+                handle.write(''.join(lines))
+                handle.flush()
+                self.written += len(lines)
+                if self.max_bytes and os.path.getsize(path) >= self.max_bytes:
+                    self._rotate(path)
+            except OSError as e:
+                self.failed += len(lines)
+                self.errors.append(f'{path}: {e}')
+            lines.clear()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+        for path in list(self._handles):
+            self._close_handle(path)
+
+    def summary(self):
+        return f'{self.written} audit rows written, {self.dropped} dropped, {self.failed} failed'
+
+    def _handle(self, path):
+        handle = self._handles.get(path)
+        if handle is None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            if self.compress == 'gzip':
+                handle = gzip.open(path, 'at', encoding='utf-8')
+            else:
+                handle = open(path, 'a', encoding='utf-8', buffering=1024 * 1024)
+            self._handles[path] = handle
+        return handle
+
+    def _close_handle(self, path):
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            try:
+                handle.close()
+            except OSError as e:
+                self.errors.append(f'{path}: {e}')
+
+    def _rotate(self, path):
+        self._close_handle(path)
+        stamp = datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')
+        suffix = self.COMPRESSORS[self.compress]
+        stem = path[:len(path) - len(suffix)]
+        os.replace(path, f'{stem}.{stamp}{suffix}')
@@ -0,0 +1,21 @@
+"""SQLite connection setup for running imports and API reads side by side.
+
+In SQLite's default rollback-journal mode a writer locks readers out, so
+while `import_cbe_data` holds its write transaction every API request
+waits and then fails with "database is locked". `configure_sqlite`
+applies `settings.SQLITE_PRAGMAS` to each new connection: WAL journaling
+(readers see the last commit while a write is in progress), a
+`busy_timeout` for writers queueing behind the import, `synchronous =
+NORMAL` (safe under WAL, one fsync per checkpoint instead of per commit)
+and memory-mapped reads.
+"""
+from django.conf import settings
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """connection_created receiver; a no-op on other databases."""
+    if connection.vendor != 'sqlite':
+        return
+    # on the raw connection, so they are not logged or counted as request queries
+    for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+        connection.connection.execute(f'PRAGMA {name} = {value}')
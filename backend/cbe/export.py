@@ -0,0 +1,110 @@
+"""Streaming CSV / NDJSON export of the inventory (`/api/export/<kind>/`).
+
+Rows are read with `values_list().iterator(chunk_size=...)` and written
+straight into a `StreamingHttpResponse`, so memory stays flat however
+large the table is and no serializer runs. Column headers are the ones
+`import_cbe_data` looks for first (`cbe.columns`), so an exported CSV
+imports back as is.
+"""
+import csv
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.decorators import action
+from rest_framework.renderers import BaseRenderer
+
+from .columns import BRANCH_COLUMNS, CONTACT_COLUMNS, ATM_COLUMNS
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _importer_columns(mapping):
+    """(header, field) pairs using the first CSV name the importer accepts."""
+    return [(candidates[0], field) for field, candidates in mapping.items()]
+
+
+# (CSV header, values_list path) per export
+ATM_EXPORT_COLUMNS = [
+    ('TID', 'tid'), ('atm_name', 'atm_name'), ('branch', 'branch__name'),
+] + _importer_columns(ATM_COLUMNS)
+
+# 'District' is informational: the importer files every branch under Hawassa
+BRANCH_EXPORT_COLUMNS = [('Branch Name', 'name')] + _importer_columns(BRANCH_COLUMNS) + [
+    ('District', 'district__name'),
+]
+
+CONTACT_EXPORT_COLUMNS = [
+    ('Contact Person', 'full_name'), ('Branch Name', 'branch__name'),
+] + _importer_columns(CONTACT_COLUMNS)
+
+WAN_IP_EXPORT_COLUMNS = [
+    ('branch', 'branch__name'), ('ip_address', 'ip_address'), ('subnet_mask', 'subnet_mask'),
+    ('gateway', 'gateway'), ('description', 'description'),
+]
+
+
+class _StreamRenderer(BaseRenderer):
+    """Only used for content negotiation and error bodies; exports stream themselves."""
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+class CSVRenderer(_StreamRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(_StreamRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to the caller."""
+    def write(self, value):
+        return value
+
+
+def iter_csv(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(_Echo())
+    yield writer.writerow([header for header, _ in columns])
+    rows = queryset.values_list(*[path for _, path in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield writer.writerow(['' if value is None else value for value in row])
+
+
+def iter_ndjson(queryset, columns, chunk_size=EXPORT_CHUNK_SIZE):
+    headers = [header for header, _ in columns]
+    rows = queryset.values_list(*[path for _, path in columns]).iterator(chunk_size=chunk_size)
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), default=str, ensure_ascii=False) + '\n'
+
+
+class ExportMixin:
+    """
+    Adds a streaming `export` action to a viewset, honouring its filters,
+    search and ordering. `?format=csv` (default) or `?format=ndjson`.
+    """
+    export_columns = []
+    export_name = None
+
+    @classmethod
+    def export_view(cls):
+        """The export action as a standalone view, for routes outside the router."""
+        return cls.as_view({'get': 'export'}, detail=False, **cls.export.kwargs)
+
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer], pagination_class=None)
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None)
+        fmt = request.accepted_renderer.format
+        stream = iter_ndjson if fmt == 'ndjson' else iter_csv
+        response = StreamingHttpResponse(
+            stream(queryset, self.export_columns),
+            content_type=f'{request.accepted_renderer.media_type}; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{self.export_name}.{fmt}"'
+        return response
@@ -0,0 +1,90 @@
+"""Chunk checkpoints that let `import_cbe_data --resume` continue a crashed run.
+
+The importer commits every CSV chunk (`--batch-size` rows) in its own
+transaction, so readers are never locked out for a whole run and a bad
+chunk only rolls back itself. In the same transaction it advances the
+stage's `ImportCheckpoint`: the file, the SHA-1 of its content, and the
+rows and chunks committed so far. A completed run deletes its
+checkpoints.
+
+On `--resume` the chunks a checkpoint covers are still read and replayed
+in memory, so the importer's dedupe sets and incremental hashes come out
+as in an uninterrupted run, but nothing is written for them again. A
+source file that changed since the crash cannot be resumed.
+"""
+import hashlib
+import os
+
+from django.core.management.base import CommandError
+from django.db import transaction
+
+from .models import ImportCheckpoint
+
+RUN = 'run'
+# run options a resumed run must reuse for its chunks to line up
+RESUMED_OPTIONS = ('batch_size', 'incremental', 'only')
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        while block := f.read(block_size):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ImportCheckpoints:
+    """The checkpoints of the current run; `enabled=False` (dry runs) keeps none."""
+
+    def __init__(self, options, resume=False, enabled=True):
+        self.enabled = enabled
+        self.resumed = False
+        self.options = {name: options[name] for name in RESUMED_OPTIONS}
+        if not enabled:
+            return
+        run = ImportCheckpoint.objects.filter(stage=RUN).first()
+        if resume:
+            if run is None:
+                raise CommandError('No interrupted import to resume')
+            self.options = {name: run.options[name] for name in RESUMED_OPTIONS}
+            self.resumed = True
+            return
+        with transaction.atomic():
+            ImportCheckpoint.objects.all().delete()
+            ImportCheckpoint.objects.create(stage=RUN, options=self.options)
+
+    def completed(self, stage):
+        """Whether `stage` (a stage without chunks, e.g. 'clean') was committed by the resumed run."""
+        return self.resumed and ImportCheckpoint.objects.filter(stage=stage, completed=True).exists()
+
+    def complete(self, stage):
+        """Mark `stage` done; call inside the transaction that did its work."""
+        if self.enabled:
+            ImportCheckpoint.objects.update_or_create(stage=stage, defaults={'completed': True})
+
+    def start(self, stage, path):
+        """The checkpoint of a chunked stage, checking that its file did not change since the crash."""
+        if not self.enabled:
+            return ImportCheckpoint(stage=stage, file=path)
+        digest = file_hash(path) if os.path.exists(path) else ''
+        checkpoint, created = ImportCheckpoint.objects.get_or_create(
+            stage=stage, defaults={'file': path, 'file_hash': digest},
+        )
+        if not created and checkpoint.chunks and checkpoint.file_hash != digest:
+            raise CommandError(
+                f'{path} changed since the interrupted import; run it again without --resume'
+            )
+        return checkpoint
+
+    def advance(self, checkpoint, rows):
+        """Record one more committed chunk of `rows` source rows; call inside its transaction."""
+        checkpoint.rows += rows
+        checkpoint.chunks += 1
+        if self.enabled:
+            checkpoint.save(update_fields=['rows', 'chunks', 'updated_at'])
+
+    def finish(self):
+        """The run is complete: nothing is left to resume."""
+        if self.enabled:
+            ImportCheckpoint.objects.all().delete()
+
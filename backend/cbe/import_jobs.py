@@ -0,0 +1,233 @@
+"""Background imports of CSVs uploaded to `/api/imports/`.
+
+`submit()` stores the upload under `settings.IMPORT_UPLOAD_DIR`, queues an
+`ImportJob` row and returns it, so the request answers with the job's id
+at once instead of holding the connection for the whole import. The table
+is the queue; no broker is involved. A worker claims the oldest queued job
+and runs `import_cbe_data --incremental --only <source> --source
+<source>=<upload>`, saving the stage, rows read and invalid rows on the job
+as chunks commit, for clients to poll. Only that source is rewritten (plus
+the off-WAN merge into branches and ATMs, see `selected_stages`), so the
+other tables keep whatever earlier uploads put there.
+
+Jobs run one at a time, since every import rewrites the same tables. The
+worker is a thread of the web process, started when a job is queued
+(`IMPORT_JOBS_IN_PROCESS`, on by default), and/or the
+`python manage.py run_import_jobs` command. While a job runs, a heartbeat
+thread touches its `updated_at` every tenth of `IMPORT_JOB_TIMEOUT`, also
+through steps that report no progress (the final reindex, say), so a job
+whose heartbeat is older than `IMPORT_JOB_TIMEOUT` seconds really lost its
+worker. It is marked failed, and only then may the next job start. An
+upload is deleted as soon as its job succeeds or fails; to retry a failed
+job, upload the file again.
+"""
+import io
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.utils import timezone
+
+from .models import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# the in-process worker thread, and whether a job was queued since it last looked
+_worker = None
+_pending = False
+_worker_lock = threading.Lock()
+
+
+def upload_dir():
+    return getattr(settings, 'IMPORT_UPLOAD_DIR', os.path.join(settings.BASE_DIR, 'data', 'uploads'))
+
+
+def submit(upload, source, incremental=True, created_by=None):
+    """Store `upload` (an UploadedFile) and queue its import as `source`; returns the job."""
+    job = ImportJob(source=source, filename=upload.name, incremental=incremental, created_by=created_by)
+    os.makedirs(upload_dir(), exist_ok=True)
+    job.path = os.path.join(upload_dir(), f'{job.pk}.csv')
+    with open(job.path, 'wb') as f:
+        for chunk in upload.chunks():
+            f.write(chunk)
+    job.save()
+    if getattr(settings, 'IMPORT_JOBS_IN_PROCESS', True):
+        transaction.on_commit(start_worker)
+    return job
+
+
+class JobProgress:
+    """`import_cbe_data` progress callback saving a job's counters, at most every `interval` seconds."""
+
+    def __init__(self, job, interval=1.0):
+        self.job = job
+        self.interval = interval
+        self.stages = []
+        self.saved = 0.0
+
+    def __call__(self, stats):
+        if not any(stage is stats for stage in self.stages):
+            self.stages.append(stats)
+        self.job.stage = stats.name
+        self.job.rows_done = sum(stage.rows for stage in self.stages)
+        self.job.errors = sum(len(stage.errors) for stage in self.stages)
+        if time.monotonic() - self.saved >= self.interval:
+            self.save()
+
+    def save(self):
+        self.saved = time.monotonic()
+        # update() rather than save(): the worker never overwrites the status it was given
+        ImportJob.objects.filter(pk=self.job.pk).update(
+            stage=self.job.stage, rows_done=self.job.rows_done, errors=self.job.errors, updated_at=timezone.now(),
+        )
+
+
+class Heartbeat:
+    """Context manager touching a running job's `updated_at` from a thread every `interval` seconds."""
+
+    def __init__(self, job, interval):
+        self.job = job
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.beat, name=f'cbe-import-heartbeat-{job.pk}', daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def beat(self):
+        try:
+            while not self.stopped.wait(self.interval):
+                try:
+                    ImportJob.objects.filter(pk=self.job.pk, status='running').update(updated_at=timezone.now())
+                except DatabaseError:
+                    # e.g. SQLite busy past its timeout while a chunk commits; the next beat retries
+                    logger.warning('Could not record the heartbeat of import job %s', self.job.pk, exc_info=True)
+        finally:
+            connection.close()
+
+
+def remove_upload(job):
+    """Delete a finished job's stored upload."""
+    try:
+        os.remove(job.path)
+    except FileNotFoundError:
+        pass
+    except OSError:
+        logger.exception('Could not remove the upload of import job %s', job.pk)
+
+
+def fail_stale():
+    """Fail running jobs whose worker stopped sending heartbeats, deleting their uploads."""
+    cutoff = timezone.now() - timedelta(seconds=getattr(settings, 'IMPORT_JOB_TIMEOUT', 900))
+    stale = ImportJob.objects.filter(status='running', updated_at__lt=cutoff)
+    pks = list(stale.values_list('pk', flat=True))
+    # the UPDATE re-checks the heartbeat, so a job that just sent one stays running
+    failed = stale.filter(pk__in=pks).update(
+        status='failed', error='The worker stopped before the import finished', finished_at=timezone.now(),
+    )
+    for job in ImportJob.objects.filter(pk__in=pks, status='failed'):
+        remove_upload(job)
+    return failed
+
+
+def claim():
+    """Mark the oldest queued job running and return it; None if none is queued or one is running."""
+    with transaction.atomic():
+        # locking the active rows serializes workers where the database has row locks;
+        # SQLite's IMMEDIATE transactions take the write lock up front anyway
+        active = list(
+            ImportJob.objects.select_for_update().filter(status__in=['queued', 'running']).order_by('created_at')
+        )
+        if not active or any(job.status == 'running' for job in active):
+            return None
+        job = active[0]
+        job.status = 'running'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at', 'updated_at'])
+        return job
+
+
+def run(job):
+    """Import a claimed job's upload and record how it went."""
+    output = io.StringIO()
+    progress = JobProgress(job)
+    try:
+        with Heartbeat(job, getattr(settings, 'IMPORT_JOB_TIMEOUT', 900) / 10):
+            call_command(
+                'import_cbe_data', incremental=job.incremental, only=[job.source],
+                sources=[f'{job.source}={job.path}'], progress=progress, stdout=output, stderr=output, no_color=True,
+            )
+    except CommandError as exc:
+        # a bad upload or options, reported on the job
+        logger.warning('Import job %s failed: %s', job.pk, exc)
+        job.status = 'failed'
+        job.error = str(exc)
+    except Exception as exc:
+        logger.exception('Import job %s failed', job.pk)
+        job.status = 'failed'
+        job.error = str(exc) or type(exc).__name__
+    else:
+        job.status = 'succeeded'
+    finally:
+        remove_upload(job)
+    job.log = output.getvalue()
+    job.finished_at = timezone.now()
+    job.save()
+    return job
+
+
+def work(poll=2.0, stop_when_idle=False, report=None):
+    """Run queued jobs one by one, calling `report(job)` after each; see the module docstring."""
+    while True:
+        close_old_connections()
+        fail_stale()
+        job = claim()
+        if job is not None:
+            run(job)
+            if report is not None:
+                report(job)
+            continue
+        if stop_when_idle:
+            return
+        time.sleep(poll)
+
+
+def start_worker():
+    """Start the in-process worker thread unless it is running; it stops once the queue is empty."""
+    global _worker, _pending
+    with _worker_lock:
+        _pending = True
+        if _worker is None:
+            _worker = threading.Thread(target=_drain, name='cbe-import-worker', daemon=True)
+            _worker.start()
+
+
+def _drain():
+    global _worker, _pending
+    try:
+        while True:
+            with _worker_lock:
+                _pending = False
+            work(stop_when_idle=True)
+            with _worker_lock:
+                # a job queued while work() returned is picked up by another pass
+                if not _pending:
+                    _worker = None
+                    return
+    except Exception:
+        logger.exception('Import worker stopped')
+        with _worker_lock:
+            _worker = None
+    finally:
+        connection.close()
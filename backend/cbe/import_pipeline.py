@@ -0,0 +1,70 @@
+"""Parse stage of the CBE import, runnable in worker processes.
+
+Reading and cleaning a CSV is pure pandas work that does not touch the
+database, so `import_cbe_data --parallel` hands every source file to a
+process pool up front and only applies the database writes in the main
+process, in dependency order (regions/districts, branches, then contacts,
+ATMs and the off-WAN merge). Nothing here imports Django models, so
+workers start cheaply under both fork and spawn.
+"""
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import pandas as pd
+
+from .csv_utils import (
+    iter_csv_batches, find_column, clean_column, clean_frame,
+    normalize_tid_column, strip_branch_suffix,
+)
+
+# columns prepare_batch() adds to the cleaned frame
+BRANCH_NAME = '_branch_name'
+TID = '_tid'
+SERVICE_TID = '_service_tid'
+
+
+def _source_column(chunk, *candidates):
+    col = find_column(chunk.columns, *candidates)
+    if col is None:
+        return pd.Series([None] * len(chunk), index=chunk.index, dtype=object)
+    return chunk[col]
+
+
+def prepare_batch(kind, chunk):
+    """Clean a raw text chunk and add the derived columns its writer needs.
+
+    Returns (cleaned DataFrame, raw row dicts); the raw rows are kept for
+    the audit log.
+    """
+    raw_rows = chunk.to_dict('records')
+    df = clean_frame(chunk)
+    if kind == 'branches':
+        df[BRANCH_NAME] = strip_branch_suffix(_source_column(df, 'Branch Name', 'branch_name', 'branch'))
+    elif kind == 'atms':
+        df[TID] = clean_column(normalize_tid_column(_source_column(df, 'TID', 'tid')))
+    elif kind == 'atms_off_wan':
+        df[SERVICE_TID] = clean_column(normalize_tid_column(_source_column(df, 'Service No.', 'service_no')))
+    return df, raw_rows
+
+
+def iter_prepared(kind, file_path, batch_size):
+    """Stream prepared batches of one file, reading it as text."""
+    for chunk in iter_csv_batches(file_path, batch_size=batch_size, dtype=str):
+        yield prepare_batch(kind, chunk)
+
+
+def parse_file(kind, file_path, batch_size):
+    """Worker entry point: every prepared batch of one file."""
+    return list(iter_prepared(kind, file_path, batch_size))
+
+
+@contextmanager
+def parse_in_background(files, batch_size, max_workers=None):
+    """Start parsing `files` ({path: kind}) in a process pool.
+
+    Yields {path: Future}; each future resolves to `parse_file`'s list of
+    batches, so the caller can start writing the first file while the
+    others are still being parsed. The pool is shut down on exit.
+    """
+    with ProcessPoolExecutor(max_workers=max_workers or len(files)) as pool:
+        yield {path: pool.submit(parse_file, kind, path, batch_size) for path, kind in files.items()}
@@ -0,0 +1,175 @@
+"""IP address conflict report behind `check_ip_conflicts` and `/api/ip-conflicts/`.
+
+Every IPv4 value in the fields listed in `cbe.ip_index.IP_SPECS` is loaded
+with one query per model, then checked in one sort-based pass:
+
+* duplicates: the same address on more than one device (a branch's own
+  WAN IP rows count as the branch)
+* overlaps: a subnet that overlaps an address or subnet of another site
+* gateway mismatches: a gateway outside its WAN address's subnet, or equal to it
+
+Sorting dominates, so the whole report is O(n log n) plus the conflicts found
+(see `find_overlaps` for how the sweep keeps to that).
+"""
+import ipaddress
+from collections import namedtuple
+from itertools import groupby
+
+from django.apps import apps
+from django.conf import settings
+
+from .ip_index import IP_SPECS, parse_interfaces
+
+# (gateway field, address field) checked against each other per kind
+GATEWAY_FIELDS = {
+    'branch': ('default_gateway', 'wan_address'),
+    'wan_ip': ('gateway', 'ip_address'),
+}
+
+Address = namedtuple('Address', [
+    'start', 'end', 'prefix_length', 'kind', 'id', 'name', 'site', 'field', 'value',
+])
+
+
+def gateway_prefix():
+    """Prefix assumed for a WAN address written without one (settings.IP_GATEWAY_PREFIX)."""
+    return getattr(settings, 'IP_GATEWAY_PREFIX', 29)
+
+
+def _mask_prefix(mask):
+    """Prefix length of a subnet mask written as '255.255.255.248', '/29' or '29', else None."""
+    if not mask:
+        return None
+    try:
+        return ipaddress.IPv4Network(f'0.0.0.0/{str(mask).strip().lstrip("/")}').prefixlen
+    except ValueError:
+        return None
+
+
+def load_addresses():
+    """Every parsed address, plus the (gateway, WAN address) pairs to check, in one query per model."""
+    addresses = []
+    pairs = []
+    for kind, spec in IP_SPECS.items():
+        model = apps.get_model('cbe', spec.model)
+        site_path = 'pk' if kind == 'branch' else 'branch'
+        extra = ('subnet_mask',) if kind == 'wan_ip' else ()
+        rows = model.objects.values_list('pk', spec.label, site_path, *spec.fields, *extra)
+        for pk, name, site, *values in rows.iterator(chunk_size=2000):
+            pk = str(pk)
+            # ATMs without a branch are their own site
+            site = f'branch:{site}' if site is not None else f'{kind}:{pk}'
+            first = {}
+            for field, value in zip(spec.fields, values):
+                for interface in parse_interfaces(value):
+                    first.setdefault(field, (interface, value))
+                    network = interface.network
+                    addresses.append(Address(
+                        int(network.network_address), int(network.broadcast_address), network.prefixlen,
+                        kind, pk, name, site, field, value,
+                    ))
+            if kind in GATEWAY_FIELDS:
+                gateway_field, address_field = GATEWAY_FIELDS[kind]
+                if gateway_field in first and address_field in first:
+                    prefix = _mask_prefix(values[-1]) if extra else None
+                    pairs.append((kind, pk, name, first[gateway_field], first[address_field], prefix))
+    return addresses, pairs
+
+
+def _device(address):
+    # WAN_IP rows describe their branch's link, so they clash with other devices only
+    if address.kind == 'wan_ip':
+        return address.site
+    return f'{address.kind}:{address.id}'
+
+
+def _describe(address):
+    return {
+        'type': address.kind, 'id': address.id, 'name': address.name,
+        'field': address.field, 'value': address.value,
+    }
+
+
+def find_duplicates(addresses):
+    """Identical addresses or subnets claimed by more than one device; gateways may be shared."""
+    claims = sorted(
+        (a for a in addresses if a.field not in {gw for gw, _ in GATEWAY_FIELDS.values()}),
+        key=lambda a: (a.start, a.end),
+    )
+    duplicates = []
+    for (start, end), group in groupby(claims, key=lambda a: (a.start, a.end)):
+        group = list(group)
+        if len({_device(a) for a in group}) > 1:
+            network = ipaddress.IPv4Network((start, group[0].prefix_length))
+            duplicates.append({
+                'address': str(network.network_address) if start == end else str(network),
+                'claims': [_describe(a) for a in group],
+            })
+    return duplicates
+
+
+def find_overlaps(addresses):
+    """Subnets overlapping an address or subnet of another site, by a sweep over start addresses.
+
+    CIDR blocks are nested or disjoint, so the subnets open at any address
+    form a chain ordered by end address, innermost (first to expire) on
+    top of a stack. The stack holds runs of consecutive subnets of one
+    site: runs alternate sites, so skipping the address's own runs costs
+    at most one step per run reported, and every subnet compared is a
+    conflict.
+    """
+    ordered = sorted(addresses, key=lambda a: (a.start, -a.end))
+    runs = []  # [site, subnets], outermost first
+    overlaps = []
+    for address in ordered:
+        while runs and runs[-1][1][-1].end < address.start:
+            runs[-1][1].pop()
+            if not runs[-1][1]:
+                runs.pop()
+        for site, subnets in runs:
+            if site == address.site:
+                continue
+            for subnet in subnets:
+                overlaps.append({
+                    'subnet': str(ipaddress.IPv4Network((subnet.start, subnet.prefix_length))),
+                    'owner': _describe(subnet),
+                    'overlapping': _describe(address),
+                })
+        if address.prefix_length < 32:
+            if runs and runs[-1][0] == address.site:
+                runs[-1][1].append(address)
+            else:
+                runs.append([address.site, [address]])
+    return overlaps
+
+
+def find_gateway_mismatches(pairs, default_prefix=None):
+    """Gateways outside their WAN address's subnet (`default_prefix` when none is written)."""
+    default_prefix = default_prefix or gateway_prefix()
+    mismatches = []
+    for kind, pk, name, (gateway, gateway_value), (address, address_value), mask_prefix in pairs:
+        prefix = mask_prefix or (address.network.prefixlen if address.network.prefixlen < 32 else default_prefix)
+        subnet = ipaddress.IPv4Network((address.ip, prefix), strict=False)
+        if gateway.ip in subnet and gateway.ip != address.ip:
+            continue
+        mismatches.append({
+            'type': kind, 'id': pk, 'name': name,
+            'gateway': gateway_value, 'address': address_value, 'subnet': str(subnet),
+            'reason': 'same as address' if gateway.ip == address.ip else 'outside subnet',
+        })
+    return mismatches
+
+
+def find_conflicts(default_prefix=None):
+    """The full report: summary counts plus each conflict list, JSON-serializable."""
+    addresses, pairs = load_addresses()
+    report = {
+        'duplicates': find_duplicates(addresses),
+        'overlaps': find_overlaps(addresses),
+        'gateway_mismatches': find_gateway_mismatches(pairs, default_prefix),
+    }
+    report['summary'] = {
+        'addresses': len(addresses),
+        **{name: len(found) for name, found in report.items()},
+    }
+    return report
@@ -0,0 +1,189 @@
+"""Integer-encoded IPv4 ranges behind `/api/ip-lookup/`.
+
+Branch addresses and tunnels, ATM IPs and WAN IPs are free-text columns,
+so "what lives in 10.20.0.0/16" used to mean a substring scan or a full
+export. Every IPv4 address or network written in those fields is parsed
+once into an `IPRange` row holding its first and last address as
+integers, so a lookup is a range seek on the `(start, end)` index.
+
+Rows are kept current by the receivers in `cbe.signals`; bulk writers
+call `reindex_ips()` / `rebuild_ip_index()` themselves, like the search
+index (see `cbe.search`).
+"""
+import ipaddress
+import re
+from collections import namedtuple
+
+from django.apps import apps as global_apps
+from django.db import connections, router
+
+from .models import IPRange
+from .search import indexing_suspended, stored_id
+
+DEFAULT_LIMIT = 1000
+MAX_LIMIT = 5000
+REINDEX_BATCH_SIZE = 500
+
+IPSpec = namedtuple('IPSpec', ['model', 'label', 'fields'])
+
+# IP-bearing fields per kind; `label` names the object in lookup results
+IP_SPECS = {
+    'branch': IPSpec('Branch', 'name', (
+        'wan_address', 'lan_address', 'default_gateway', 'vsat_ip',
+        'tunnel_0', 'tunnel_1', 'tunnel_2', 'tunnel_3', 'tunnel_4', 'tunnel_5', 'tunnel_6',
+    )),
+    'atm': IPSpec('ATM', 'tid', ('ip_address',)),
+    'wan_ip': IPSpec('WAN_IP', 'branch__name', ('ip_address', 'gateway')),
+}
+MODEL_KINDS = {spec.model: kind for kind, spec in IP_SPECS.items()}
+# what identifies a stored range when diffing against freshly parsed ones
+RANGE_FIELDS = ('object_id', 'field', 'value', 'start', 'end', 'prefix_length')
+
+# a dotted quad with an optional /prefix; '10.1.1.1/10.2.2.2' is two addresses, not a /10
+_IPV4 = re.compile(r'(?<![\d.])(\d{1,3}(?:\.\d{1,3}){3})(?:/(\d{1,2})(?![\d.]))?(?![\d.])')
+
+
+def parse_interfaces(value):
+    """Every IPv4 address written in `value` with its prefix ('10.1.2.5/30'); a bare address is a /32."""
+    if not value:
+        return []
+    interfaces = []
+    for address, prefix in _IPV4.findall(str(value)):
+        try:
+            interfaces.append(ipaddress.IPv4Interface(f'{address}/{prefix or 32}'))
+        except ValueError:
+            continue
+    return interfaces
+
+
+def parse_networks(value):
+    """The network of each address in `value`: '10.1.2.5/30' is 10.1.2.4/30."""
+    return [interface.network for interface in parse_interfaces(value)]
+
+
+def parse_query(ip=None, cidr=None):
+    """The network a lookup asks for, from `?ip=` or `?cidr=`; ValueError if malformed."""
+    if ip:
+        return ipaddress.IPv4Network(f'{ipaddress.IPv4Address(ip.strip())}/32')
+    if cidr:
+        return ipaddress.IPv4Network(cidr.strip(), strict=False)
+    raise ValueError('Give ?ip=<address> or ?cidr=<network>.')
+
+
+def _model(name, apps=None):
+    return (apps or global_apps).get_model('cbe', name)
+
+
+def build_ranges(kind, queryset, range_model=IPRange):
+    """Unsaved `IPRange` rows for every object in `queryset`, read with one query."""
+    spec = IP_SPECS[kind]
+    connection = connections[queryset.db]
+    pk_field = queryset.model._meta.pk
+    ranges = []
+    for pk, *values in queryset.values_list('pk', *spec.fields):
+        object_id = None
+        for field, value in zip(spec.fields, values):
+            for network in parse_networks(value):
+                if object_id is None:
+                    object_id = stored_id(pk_field, pk, connection)
+                ranges.append(range_model(
+                    kind=kind, object_id=object_id, field=field, value=str(value)[:100],
+                    start=int(network.network_address), end=int(network.broadcast_address),
+                    prefix_length=network.prefixlen,
+                ))
+    return ranges
+
+
+def reindex_ips(model, pks, batch_size=REINDEX_BATCH_SIZE):
+    """Bring the ranges of `model` objects `pks` up to date; pks that no longer exist lose theirs.
+
+    Ranges are compared with the stored ones, so an object whose IP
+    fields did not change costs one read and no writes.
+    """
+    kind = MODEL_KINDS.get(model.__name__)
+    if kind is None:
+        return
+    connection = connections[router.db_for_write(IPRange)]
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        chunk = pks[start:start + batch_size]
+        ids = [stored_id(model._meta.pk, pk, connection) for pk in chunk]
+        stored = {}
+        for pk, *row in IPRange.objects.filter(kind=kind, object_id__in=ids).values_list('pk', *RANGE_FIELDS):
+            stored.setdefault(tuple(row), []).append(pk)
+        added = []
+        for ip_range in build_ranges(kind, model.objects.filter(pk__in=chunk)):
+            key = tuple(getattr(ip_range, field) for field in RANGE_FIELDS)
+            if stored.get(key):
+                stored[key].pop()
+            else:
+                added.append(ip_range)
+        removed = [pk for pks_left in stored.values() for pk in pks_left]
+        if removed:
+            IPRange.objects.filter(pk__in=removed).delete()
+        IPRange.objects.bulk_create(added)
+
+
+def refresh_ips(model, pks, stale=None):
+    """`reindex_ips` for `pks`, plus the `{kind: pks}` in `stale` (e.g. WAN IPs cascaded by a delete)."""
+    reindex_ips(model, pks)
+    for kind, related in (stale or {}).items():
+        if kind in IP_SPECS:
+            reindex_ips(_model(IP_SPECS[kind].model), related)
+
+
+def rebuild_ip_index(kinds=None, apps=None):
+    """Recreate every range of `kinds` (all by default); `apps` is for data migrations."""
+    range_model = _model('IPRange', apps)
+    for kind in kinds or IP_SPECS:
+        model = _model(IP_SPECS[kind].model, apps)
+        range_model.objects.filter(kind=kind).delete()
+        range_model.objects.bulk_create(
+            build_ranges(kind, model.objects.all(), range_model), batch_size=REINDEX_BATCH_SIZE,
+        )
+
+
+def update_ip_ranges(sender, instance, **kwargs):
+    """post_save / post_delete receiver for the models in `IP_SPECS`."""
+    if not indexing_suspended():
+        reindex_ips(sender, [instance.pk])
+
+
+def lookup(network, limit=DEFAULT_LIMIT):
+    """Ranges overlapping `network`: the addresses inside it and the subnets containing it.
+
+    `start` is bounded below by the widest stored subnet, so the query is a
+    seek on the `(start, end)` index rather than a scan of every row below
+    the network.
+    """
+    low, high = int(network.network_address), int(network.broadcast_address)
+    widest = IPRange.objects.order_by('prefix_length').values_list('prefix_length', flat=True).first()
+    if widest is None:
+        return []
+    span = 2 ** (32 - widest) - 1
+    rows = list(
+        IPRange.objects.filter(start__gte=low - span, start__lte=high, end__gte=low)
+        .order_by('start', 'end', 'kind', 'field')
+        .values_list('kind', 'object_id', 'field', 'value', 'start', 'prefix_length')[:limit]
+    )
+    labels = {}
+    for kind in {row[0] for row in rows}:
+        spec = IP_SPECS[kind]
+        model = _model(spec.model)
+        pk_field = model._meta.pk
+        pks = {pk_field.to_python(object_id) for row_kind, object_id, *_ in rows if row_kind == kind}
+        labels[kind] = {
+            pk: label for pk, label in model.objects.filter(pk__in=pks).values_list('pk', spec.label)
+        }
+    results = []
+    for kind, object_id, field, value, start, prefix_length in rows:
+        pk = _model(IP_SPECS[kind].model)._meta.pk.to_python(object_id)
+        results.append({
+            'type': kind,
+            'id': pk,
+            'name': labels[kind].get(pk),
+            'field': field,
+            'value': value,
+            'network': f'{ipaddress.IPv4Address(start)}/{prefix_length}',
+        })
+    return results
@@ -0,0 +1,59 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from cbe.ip_conflicts import find_conflicts, gateway_prefix
+
+
+class Command(BaseCommand):
+    help = 'Report duplicate addresses, overlapping subnets and gateway mismatches across all IP fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print the full report as JSON (for monitoring)',
+        )
+        parser.add_argument(
+            '--gateway-prefix', type=int, default=None,
+            help=f'Subnet assumed for WAN addresses written without one (default /{gateway_prefix()})',
+        )
+        parser.add_argument(
+            '--fail-on-conflicts', action='store_true',
+            help='Exit with an error status when anything is reported',
+        )
+
+    def handle(self, *args, **options):
+        report = find_conflicts(options['gateway_prefix'])
+        summary = report['summary']
+        found = summary['duplicates'] + summary['overlaps'] + summary['gateway_mismatches']
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2, default=str))
+        else:
+            self.report(report)
+
+        if found and options['fail_on_conflicts']:
+            raise CommandError(f'{found} IP conflicts found')
+
+    def report(self, report, limit=20):
+        summary = report['summary']
+        self.stdout.write(
+            f"Checked {summary['addresses']} addresses: {summary['duplicates']} duplicates, "
+            f"{summary['overlaps']} overlaps, {summary['gateway_mismatches']} gateway mismatches"
+        )
+        for duplicate in report['duplicates'][:limit]:
+            claims = ', '.join(f"{c['type']} {c['name']} ({c['field']})" for c in duplicate['claims'])
+            self.stdout.write(self.style.WARNING(f"  duplicate {duplicate['address']}: {claims}"))
+        for overlap in report['overlaps'][:limit]:
+            owner, other = overlap['owner'], overlap['overlapping']
+            self.stdout.write(self.style.WARNING(
+                f"  overlap {overlap['subnet']} ({owner['type']} {owner['name']} {owner['field']}) "
+                f"with {other['value']} ({other['type']} {other['name']} {other['field']})"
+            ))
+        for mismatch in report['gateway_mismatches'][:limit]:
+            self.stdout.write(self.style.WARNING(
+                f"  gateway {mismatch['gateway']} of {mismatch['type']} {mismatch['name']}: "
+                f"{mismatch['reason']} {mismatch['subnet']}"
+            ))
+        for name in ('duplicates', 'overlaps', 'gateway_mismatches'):
+            if len(report[name]) > limit:
+                self.stdout.write(f'  ... and {len(report[name]) - limit} more {name.replace("_", " ")}')
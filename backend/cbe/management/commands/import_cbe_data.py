@@ -1,54 +1,370 @@
-import pandas as pd
-from django.core.management.base import BaseCommand
+import os
+import uuid
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
-from django.db.models import Q
-from cbe.models import Region, District, Branch, ContactPerson, ATM
-from cbe.csv_utils import read_csv_safe, get_row_value, normalize_tid
-from cbe.csv_utils import persist_import_row
+from cbe.models import Region, District, Branch, ContactPerson, ATM, ImportRowHash
+from cbe.csv_utils import find_column, iter_csv_batches
+from cbe.csv_utils import ImportAuditLog
+from cbe.columns import (
+    BRANCH_COLUMNS, BRANCH_OSPF_COLUMNS, CONTACT_COLUMNS, ATM_COLUMNS,
+    OFF_WAN_BRANCH_COLUMNS, OFF_WAN_TUNNEL_COLUMNS,
+)
+from cbe.import_pipeline import iter_prepared, parse_in_background, BRANCH_NAME, TID, SERVICE_TID
+from cbe.bulk_import import BulkImporter, DEFAULT_BATCH_SIZE
+from cbe.branch_resolver import BranchResolver
+from cbe.import_checkpoint import ImportCheckpoints
+from cbe.import_delta import RowDelta
+from cbe.ip_index import rebuild_ip_index, refresh_ips
+from cbe.search import dependents, rebuild_index, refresh_entries, suspend_indexing
+from cbe.versions import batch_versions
+
+BRANCH_FILE = 'data/csv/Hawassa District WAN Address.csv'
+BRANCH_OSPF_FILE = 'data/csv/WAN-IP and TUNNEL-on-OSPF.csv'
+CONTACT_FILE = 'data/csv/contact_person.csv'
+ATM_FILE = 'data/csv/atm_all.csv'
+ATM_OFF_WAN_FILE = 'data/csv/ATMs - Off - WAN - IP.csv'
+
+# source file -> parse kind, see cbe.import_pipeline.prepare_batch
+IMPORT_FILES = {
+    BRANCH_FILE: 'branches',
+    BRANCH_OSPF_FILE: 'branches',
+    CONTACT_FILE: 'contacts',
+    ATM_FILE: 'atms',
+    ATM_OFF_WAN_FILE: 'atms_off_wan',
+}
+
+# --source names of the files, for importing an uploaded copy instead (cbe.import_jobs)
+SOURCES = {
+    'branches': BRANCH_FILE,
+    'ospf_branches': BRANCH_OSPF_FILE,
+    'contacts': CONTACT_FILE,
+    'atms': ATM_FILE,
+    'atms_off_wan': ATM_OFF_WAN_FILE,
+}
+# the column each source's rows are keyed on; a --source file without it is refused
+SOURCE_KEYS = {
+    'branches': ('Branch Name', 'branch_name', 'branch'),
+    'ospf_branches': ('Branch Name', 'branch_name', 'branch'),
+    'contacts': ('Contact Person', 'contact_person', 'contact_person_name'),
+    'atms': ('TID', 'tid'),
+    'atms_off_wan': ('Site Name', 'site_name', 'site'),
+}
+
 
 class Command(BaseCommand):
     help = 'Import CBE data with duplicate removal'
+    # progress: callable given each stage's ImportStats after every chunk (cbe.import_jobs)
+    stealth_options = ('progress',)
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per CSV read chunk and bulk INSERT/UPDATE (default {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--audit-compress', choices=['gzip'], default=None,
+            help='Compress the data/imported/*.jsonl audit trail',
+        )
+        parser.add_argument(
+            '--parallel', action='store_true',
+            help='Parse all CSV files up front in a process pool, then write them in dependency order',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes for --parallel (default: one per file)',
+        )
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='Keep existing data and only write rows whose content hash changed since the last run',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the incremental diff (inserted/changed/removed rows) without writing anything',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Continue an interrupted import after its last committed chunk',
+        )
+        parser.add_argument(
+            '--source', action='append', default=[], metavar='NAME=PATH', dest='sources',
+            help=f'Read one source from PATH instead of its usual file; NAME is one of {", ".join(SOURCES)}',
+        )
+        parser.add_argument(
+            '--only', action='append', default=[], choices=list(SOURCES), metavar='NAME',
+            help='Import only this source (repeatable) and the merges that depend on it; needs --incremental',
+        )
 
     def handle(self, *args, **options):
         self.stdout.write('Starting CBE data import with duplicate removal...')
-        
-        with transaction.atomic():
+        self.dry_run = options['dry_run']
+        self.paths = self.source_paths(options['sources'])
+        self.progress = options.get('progress')
+        if options['resume'] and self.dry_run:
+            raise CommandError('--resume cannot be combined with --dry-run')
+        if options['only'] and not (options['incremental'] or self.dry_run or options['resume']):
+            raise CommandError('--only needs --incremental: a full import clears every table')
+        # every chunk commits on its own and is checkpointed, except in dry runs
+        self.checkpoints = ImportCheckpoints(
+            {
+                'batch_size': options['batch_size'], 'incremental': options['incremental'] or self.dry_run,
+                'only': sorted(set(options['only'])),
+            },
+            resume=options['resume'], enabled=not self.dry_run,
+        )
+        # a resumed run reuses the interrupted run's settings so its chunks line up
+        self.batch_size = self.checkpoints.options['batch_size']
+        self.incremental = self.checkpoints.options['incremental']
+        self.stages = self.selected_stages(self.checkpoints.options['only'])
+        if self.checkpoints.resumed:
+            mode = 'incremental' if self.incremental else 'full'
+            self.stdout.write(f'Resuming the interrupted {mode} import (batch size {self.batch_size})')
+        self.importer = BulkImporter(batch_size=self.batch_size)
+        self.branches = BranchResolver()
+        self.parsed = {}
+        # per-source row hashes, and what this run rewrote so dependent rows are reapplied
+        self.deltas = {}
+        self.rewritten_branches = set()
+        self.rewritten_ips = set()
+        self.off_wan_branches = set()
+        self.unreadable = set()
+        # an incremental run reindexes only the rows it wrote or deleted; a full or
+        # resumed run (whose earlier chunks were not tracked) rebuilds the indexes
+        self.refresh_only = self.incremental and not self.checkpoints.resumed and not self.dry_run
+        self.touched = {Branch: set(), ContactPerson: set(), ATM: set()}
+        # {model: {kind: pks}} of rows quoting rows deleted this run, read before the delete
+        self.stale = {}
+
+        with ExitStack() as stack:
+            files = {
+                self.paths.get(path, path): kind for path, kind in IMPORT_FILES.items()
+                if kind in self.stages and os.path.exists(self.paths.get(path, path))
+            }
+            if options['parallel'] and files:
+                self.stdout.write(f'Parsing {len(files)} files in parallel...')
+                self.parsed = stack.enter_context(
+                    parse_in_background(files, self.batch_size, max_workers=options['workers'])
+                )
+            self.audit = stack.enter_context(ImportAuditLog(compress=options['audit_compress']))
+            # one rebuild of each index below instead of a reindex per deleted row
+            stack.enter_context(suspend_indexing())
+            if self.dry_run:
+                # the chunk transactions below become savepoints, all rolled back at the end
+                stack.enter_context(transaction.atomic())
             # Setup regions and districts first
-            self.setup_regions()
-            
-            # Clean existing data to start fresh
-            self.clean_existing_data()
-            
-            # Import data
-            self.import_branches()
-            self.import_contacts()
+            with transaction.atomic():
+                self.setup_regions()
+
+            # Clean existing data to start fresh, once per run
+            if not self.checkpoints.completed('clean'):
+                with transaction.atomic(), batch_versions():
+                    self.clean_existing_data()
+                    self.checkpoints.complete('clean')
+
+            # Import data, one transaction per chunk
+            if 'branches' in self.stages:
+                self.import_branches()
+            else:
+                self.branches = BranchResolver.load()
+            if 'contacts' in self.stages:
+                self.import_contacts()
             # Import ATMs from main ATM file
-            self.import_atms()
+            if 'atms' in self.stages:
+                self.import_atms()
             # Merge/Import ATMs - Off - WAN - IP data (updates branches and ATM IPs)
-            self.import_atms_off_wan()
-        
+            if 'atms_off_wan' in self.stages:
+                self.import_atms_off_wan()
+            with transaction.atomic(), batch_versions():
+                # Drop rows that disappeared from the source files
+                self.remove_missing_rows()
+                for delta in self.deltas.values():
+                    delta.save(self.batch_size)
+                if self.refresh_only:
+                    self.refresh_indexes()
+                elif not self.dry_run:
+                    rebuild_index()
+                    rebuild_ip_index()
+                if not self.dry_run:
+                    self.checkpoints.finish()
+
+            if self.dry_run:
+                transaction.set_rollback(True)
+
+        self.report()
+        if self.dry_run:
+            self.report_diff()
+            self.stdout.write(self.style.SUCCESS('Dry run: nothing was written'))
+            return
         self.stdout.write(
             self.style.SUCCESS('Successfully imported CBE data with no duplicates!')
         )
 
+    def selected_stages(self, only):
+        """The import stages (`IMPORT_FILES` kinds) to run for `--only` sources; all of them without.
+
+        Both branch files make up one stage, since the first file wins for
+        a branch in both. The off-WAN merge is reapplied whenever branches
+        or ATMs are imported, as it merges into them. Skipped stages keep
+        their rows and row hashes as they are.
+        """
+        if not only:
+            return set(IMPORT_FILES.values())
+        stages = {IMPORT_FILES[SOURCES[name]] for name in only}
+        if stages & {'branches', 'atms'}:
+            stages.add('atms_off_wan')
+        return stages
+
+    def source_paths(self, sources):
+        """Map the default path of each source to the file read for it.
+
+        That is the file of the same name in `settings.IMPORT_DATA_DIR`, so
+        the result does not depend on the working directory (the in-process
+        import job worker runs in the web server's), or PATH for `--source
+        NAME=PATH`. Each `--source` file must have rows and its source's key
+        column before anything is written: an empty or unrelated file would
+        otherwise remove every row of that source.
+        """
+        data_dir = getattr(settings, 'IMPORT_DATA_DIR', os.path.join(settings.BASE_DIR, 'data', 'csv'))
+        paths = {path: os.path.join(data_dir, os.path.basename(path)) for path in IMPORT_FILES}
+        for source in sources:
+            name, _, path = source.partition('=')
+            if name not in SOURCES or not path:
+                raise CommandError(f'--source expects NAME=PATH with NAME one of {", ".join(SOURCES)}: {source}')
+            try:
+                first = next(iter_csv_batches(path, batch_size=1, dtype=str), None)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'--source {name}: could not read {path}: {e}')
+            if first is None or first.empty:
+                raise CommandError(f'--source {name}: {path} has no rows')
+            if find_column(first.columns, *SOURCE_KEYS[name]) is None:
+                raise CommandError(f'--source {name}: {path} has no {SOURCE_KEYS[name][0]!r} column')
+            paths[SOURCES[name]] = path
+        return paths
+
+    def report(self):
+        """Print per-stage counters and throughput."""
+        self.stdout.write('Import summary:')
+        for stats in self.importer.stages:
+            style = self.style.WARNING if stats.errors else self.style.SUCCESS
+            self.stdout.write(style(f'  {stats.summary()}'))
+            for message in stats.errors[:5]:
+                self.stdout.write(f'    {message}')
+            if len(stats.errors) > 5:
+                self.stdout.write(f'    ... and {len(stats.errors) - 5} more')
+        style = self.style.WARNING if self.audit.dropped or self.audit.failed else self.style.SUCCESS
+        self.stdout.write(style(f'  audit log: {self.audit.summary()}'))
+        for message in self.audit.errors[:5]:
+            self.stdout.write(f'    {message}')
+
+    def report_diff(self, limit=20):
+        """Print the keys an incremental run would insert, change and remove."""
+        self.stdout.write('Diff:')
+        for delta in self.deltas.values():
+            self.stdout.write(f'  {delta.summary()}')
+            for label, keys in (('+', delta.inserted), ('~', delta.changed), ('-', delta.removed)):
+                for key in keys[:limit]:
+                    self.stdout.write(f'    {label} {key}')
+                if len(keys) > limit:
+                    self.stdout.write(f'    {label} ... and {len(keys) - limit} more')
+
     def clean_existing_data(self):
         """Remove existing data to prevent duplicates"""
+        if self.incremental:
+            self.stdout.write('Incremental import: keeping existing data')
+            return
         self.stdout.write('Cleaning existing data...')
         Branch.objects.all().delete()
         ContactPerson.objects.all().delete()
         ATM.objects.all().delete()
+        # every row is new again, so the next incremental run diffs against this one
+        ImportRowHash.objects.all().delete()
         self.stdout.write('Existing data cleared')
 
+    def touch(self, model, pks):
+        """Note `pks` of `model` as written or deleted, for `refresh_indexes`."""
+        if self.refresh_only:
+            self.touched[model].update(pks)
+
+    def refresh_indexes(self):
+        """Reindex the rows this incremental run wrote or deleted; unchanged rows cost no writes.
+
+        Their search entries are rewritten, their IP ranges only where the
+        IP columns changed (see `reindex_ips`). Upserts keep each row's key,
+        so rows quoting a written row (an ATM quoting its branch's name) are
+        still right; only the rows quoting deleted ones, collected before
+        the delete, need refreshing.
+        """
+        for model, pks in self.touched.items():
+            refresh_entries(model, pks, stale=self.stale.get(model, {}))
+            # only rows whose IP columns changed get new ranges
+            refresh_ips(model, pks, stale=self.stale.get(model, {}))
+
+    def delta(self, source):
+        """The `RowDelta` for one source, loaded on first use."""
+        if source not in self.deltas:
+            self.deltas[source] = RowDelta(source)
+        return self.deltas[source]
+
+    def remove_missing_rows(self):
+        """Delete rows whose key was imported last time but is gone from the files.
+
+        A source whose file could not be read is left alone, so a missing
+        file never empties the table. Branches still named by the off-WAN
+        file are kept since that file merges into them.
+        """
+        sources = (
+            ('contact', (CONTACT_FILE,)), ('atm', (ATM_FILE,)), ('branch', (BRANCH_FILE, BRANCH_OSPF_FILE)),
+        )
+        with self.importer.stage('removed rows') as stats:
+            for source, file_paths in sources:
+                delta = self.deltas.get(source)
+                if delta is None or not delta.removed:
+                    continue
+                if self.unreadable.intersection(file_paths):
+                    self.stdout.write(self.style.WARNING(
+                        f'Not removing {len(delta.removed)} {source} rows: a source file could not be read'
+                    ))
+                    # keep the old hashes so the rows are still tracked next run
+                    delta.current.update({key: delta.previous[key] for key in delta.removed})
+                    continue
+                for start in range(0, len(delta.removed), self.batch_size):
+                    keys = delta.removed[start:start + self.batch_size]
+                    if source == 'atm':
+                        atms = ATM.objects.filter(tid__in=keys)
+                        self.touch(ATM, atms.values_list('pk', flat=True))
+                        stats.deleted += atms.delete()[1].get('cbe.ATM', 0)
+                    elif source == 'branch':
+                        names = [name for name in keys if name not in self.off_wan_branches]
+                        branches = Branch.objects.filter(name__in=names)
+                        if self.refresh_only:
+                            pks = list(branches.values_list('pk', flat=True))
+                            self.touch(Branch, pks)
+                            # their contacts and WAN IPs cascade, their ATMs lose the branch name
+                            for kind, related in dependents(Branch, pks).items():
+                                self.stale.setdefault(Branch, {}).setdefault(kind, []).extend(related)
+                        stats.deleted += branches.delete()[1].get('cbe.Branch', 0)
+                    else:
+                        by_branch = {}
+                        for key in keys:
+                            branch_name, full_name = key.split('|', 1)
+                            by_branch.setdefault(branch_name, []).append(full_name)
+                        for branch_name, full_names in by_branch.items():
+                            contacts = ContactPerson.objects.filter(branch__name=branch_name, full_name__in=full_names)
+                            self.touch(ContactPerson, contacts.values_list('pk', flat=True))
+                            stats.deleted += contacts.delete()[1].get('cbe.ContactPerson', 0)
+
     def setup_regions(self):
         """Setup South Region and districts"""
         self.stdout.write('Setting up regional structure...')
-        
+
         # Create South Region
         south_region, created = Region.objects.get_or_create(
             name='South Region',
             defaults={'code': 'SOUTH'}
         )
-        
+
         # Create districts
         districts = ['Hawassa', 'Shashemene', 'Dilla']
         for district_name in districts:
@@ -58,372 +374,337 @@ class Command(BaseCommand):
             )
             if created:
                 self.stdout.write(f'Created district: {district_name}')
-        
+
         self.stdout.write('Regional structure setup completed')
 
-    def clean_value(self, value):
-        """Clean CSV values"""
-        if pd.isna(value) or value in ['', 'null', 'None', ' ', 'nan']:
-            return None
-        return str(value).strip()
-    
-
-    def find_branch_by_name(self, branch_name):
-        """Find a branch by name with flexible matching"""
-        if not branch_name:
-            return None
-            
-        # Clean branch name
-        clean_name = branch_name.replace(' Branch', '').strip()
-        
-        # Try exact match first
+    def read_batches(self, file_path, label):
+        """Yield (cleaned DataFrame, raw row dicts) batches of a CSV; nothing if it cannot be read.
+
+        Every column is read as text so batches agree on types and numeric
+        ids are not turned into floats, then cleaned column-wide. The raw
+        rows are kept for the audit log. With --parallel the batches were
+        already parsed by a worker; otherwise the file is streamed here.
+        `file_path` is the default path, read from its `--source` if given.
+        """
+        path = self.paths.get(file_path, file_path)
         try:
-            return Branch.objects.get(name=clean_name)
-        except Branch.DoesNotExist:
-            # Try case-insensitive exact match
-            try:
-                return Branch.objects.get(name__iexact=clean_name)
-            except Branch.DoesNotExist:
-                # Try contains match
-                branches = Branch.objects.filter(name__icontains=clean_name)
-                if branches.exists():
-                    return branches.first()
-                # Try partial match with first word
-                first_word = clean_name.split()[0] if clean_name.split() else ''
-                if first_word:
-                    branches = Branch.objects.filter(name__icontains=first_word)
-                    if branches.exists():
-                        return branches.first()
-        except Branch.MultipleObjectsReturned:
-            # If multiple matches, return the first one
-            return Branch.objects.filter(name__icontains=clean_name).first()
-        
-        return None
+            if path in self.parsed:
+                yield from self.parsed[path].result()
+            else:
+                yield from iter_prepared(IMPORT_FILES[file_path], path, self.batch_size)
+        except (OSError, ValueError) as e:
+            self.unreadable.add(file_path)
+            self.stdout.write(self.style.ERROR(f'Could not read {label} file: {e}'))
+
+    def checkpoint(self, file_path, label):
+        """The checkpoint of the stage reading `file_path` (or its `--source`)."""
+        return self.checkpoints.start(label, self.paths.get(file_path, file_path))
+
+    def read_chunks(self, file_path, label, checkpoint, stats):
+        """`read_batches`, marking the chunks `checkpoint` says a resumed run already committed.
+
+        Yields (cleaned DataFrame, raw row dicts, replay). `replay` is True
+        for chunks the resumed run already committed: the caller updates
+        its in-memory state from them but writes nothing. The caller writes
+        every other chunk in its own `transaction.atomic()` block and
+        advances `checkpoint` inside it, so the two commit together and a
+        failing chunk rolls back alone. After each chunk the `progress`
+        callback, if any, gets the stage's stats.
+        """
+        for index, (chunk, raw_rows) in enumerate(self.read_batches(file_path, label)):
+            yield chunk, raw_rows, index < checkpoint.chunks
+            if self.progress is not None:
+                self.progress(stats)
+
+    def resolve_columns(self, columns, mapping):
+        """Resolve a field -> candidates mapping against a file's real column names once."""
+        return {field: find_column(columns, *candidates) for field, candidates in mapping.items()}
+
+    def row_values(self, row, resolved):
+        """Pull the cleaned values for every resolved field out of a row dict."""
+        return {field: row[col] if col is not None else None for field, col in resolved.items()}
+
+    def column_value(self, row, col):
+        return row[col] if col is not None else None
 
     def import_branches(self):
         """Import branches with duplicate prevention"""
         self.stdout.write('Importing branches (preventing duplicates)...')
-        
-        try:
-            # Get Hawassa district
-            hawassa_district = District.objects.get(name='Hawassa')
-            
-            # Track processed branches to avoid duplicates
-            processed_branches = set()
-            count = 0
-            
-            # Import from main branch file
-            try:
-                df = read_csv_safe('data/csv/Hawassa District WAN Address.csv')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Could not read branches file: {e}'))
-                df = None
-
-            if df is not None:
-                for _, row in df.iterrows():
-                    branch_name = self.clean_value(get_row_value(row, 'Branch Name', 'branch_name', 'branch'))
-                    if branch_name and branch_name not in processed_branches:
-                        # Clean branch name
-                        clean_branch_name = branch_name.replace(' Branch', '').strip()
-
-                        branch, created = Branch.objects.get_or_create(
-                            name=clean_branch_name,
-                            defaults={
-                                'district': hawassa_district,
-                                'connection_type': self.clean_value(get_row_value(row, 'Connection Type', 'connection_type')),
-                                'service_number': self.clean_value(get_row_value(row, 'Service No.', 'service_no', 'service_number')),
-                                'account_number': self.clean_value(get_row_value(row, 'Account No', 'account_no')),
-                                'wan_address': self.clean_value(get_row_value(row, 'WAN Address', 'wan_address', 'wan_ip', 'wan ip')),
-                                'default_gateway': self.clean_value(get_row_value(row, 'Default Gateway', 'wan_default_gateway', 'default_gateway')),
-                                'lan_address': self.clean_value(get_row_value(row, 'LAN Address', 'lan_address', 'lan ip')),
-                            }
-                        )
-                        processed_branches.add(branch_name)
-                        # persist original row for auditing / full column preservation
-                        try:
-                            persist_import_row('data/csv/Hawassa District WAN Address.csv', row.to_dict(), model='Branch', model_pk=branch.pk)
-                        except Exception:
-                            pass
-                        count += 1
-                        if count <= 10:
-                            action = 'Created' if created else 'Updated'
-                            self.stdout.write(f'  {action} branch: {clean_branch_name}')
-            
-            # Import from second branch file (avoiding duplicates)
-            self.stdout.write('Processing second branches file...')
-            try:
-                df2 = read_csv_safe('data/csv/WAN-IP and TUNNEL-on-OSPF.csv')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Could not read second branches file: {e}'))
-                df2 = None
-            if df2 is not None:
-                count2 = 0
-                for _, row in df2.iterrows():
-                    branch_name = self.clean_value(get_row_value(row, 'Branch Name', 'branch_name', 'branch'))
-                    if branch_name and branch_name not in processed_branches:
-                        clean_branch_name = branch_name.replace(' Branch', '').strip()
-                        
-                        branch, created = Branch.objects.get_or_create(
-                            name=clean_branch_name,
-                            defaults={
-                                'district': hawassa_district,
-                                'connection_type': self.clean_value(get_row_value(row, 'Connection Type', 'connection_type')),
-                                'service_number': self.clean_value(get_row_value(row, 'Service No.', 'service_no', 'service_number')),
-                                'host_name': self.clean_value(get_row_value(row, 'Host Name', 'host_name')),
-                                'wan_address': self.clean_value(get_row_value(row, 'WAN IP', 'wan_ip', 'wan_address')),
-                                'lan_address': self.clean_value(get_row_value(row, 'LAN IP', 'lan ip', 'lan_address')),
-                                'default_gateway': self.clean_value(get_row_value(row, 'WAN Default Gateway', 'wan_default_gateway', 'default_gateway')),
-                            }
-                        )
-                        processed_branches.add(branch_name)
-                        try:
-                            persist_import_row('data/csv/WAN-IP and TUNNEL-on-OSPF.csv', row.to_dict(), model='Branch', model_pk=branch.pk)
-                        except Exception:
-                            pass
-                        count2 += 1
-                        if created:
-                            self.stdout.write(f'  Created from second file: {clean_branch_name}')
-            
-            self.stdout.write(f'Imported {count + count2} unique branches')
-            
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error importing branches: {e}'))
+
+        hawassa_district = District.objects.get(name='Hawassa')
+        # clean names already imported; the first file wins
+        seen = set()
+
+        for file_path, mapping, label in (
+            (BRANCH_FILE, BRANCH_COLUMNS, 'branches'),
+            (BRANCH_OSPF_FILE, BRANCH_OSPF_COLUMNS, 'second branches'),
+        ):
+            with self.importer.stage(f'branches ({label} file)') as stats:
+                checkpoint = self.checkpoint(file_path, label)
+                for chunk, raw_rows, replay in self.read_chunks(file_path, label, checkpoint, stats):
+                    resolved = self.resolve_columns(chunk.columns, mapping)
+                    names = chunk.pop(BRANCH_NAME)
+                    batch = []
+
+                    for clean_name, row, raw in zip(names, chunk.to_dict('records'), raw_rows):
+                        stats.rows += 1
+                        if not clean_name:
+                            stats.skipped += 1
+                            continue
+                        if clean_name in seen:
+                            stats.skipped += 1
+                            continue
+
+                        branch = Branch(name=clean_name, district=hawassa_district, **self.row_values(row, resolved))
+                        if not self.importer.validate(branch, stats, f'row {stats.rows + 1}'):
+                            continue
+                        seen.add(clean_name)
+                        if not self.delta('branch').track(clean_name, branch):
+                            stats.unchanged += 1
+                            continue
+                        self.rewritten_branches.add(clean_name)
+                        batch.append((branch, raw))
+
+                    if replay:
+                        stats.replayed += len(raw_rows)
+                        continue
+                    with transaction.atomic():
+                        self.importer.upsert(Branch, [branch for branch, _ in batch], ['name'], stats)
+                        pks = dict(Branch.objects.filter(name__in=[b.name for b, _ in batch]).values_list('name', 'pk'))
+                        self.touch(Branch, pks.values())
+                        for branch, row in batch:
+                            # persist original row for auditing / full column preservation
+                            if not self.dry_run:
+                                self.audit.write(file_path, row, model='Branch', model_pk=pks.get(branch.name))
+                        self.checkpoints.advance(checkpoint, len(raw_rows))
+
+        # one query loads every branch for the contact / ATM name lookups
+        self.branches = BranchResolver.load()
+        self.stdout.write(f'Imported {len(seen)} unique branches')
 
     def import_contacts(self):
         """Import contact persons with duplicate prevention"""
         self.stdout.write('Importing contact persons (preventing duplicates)...')
-        
-        try:
-            try:
-                df = read_csv_safe('data/csv/contact_person.csv')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Could not read contacts file: {e}'))
-                df = None
-            if df is None:
-                self.stdout.write(self.style.ERROR('Could not read contacts file'))
-                return
-                
-            # Remove empty rows (normalized column names)
-            if 'contact_person' in df.columns:
-                df = df[df['contact_person'].notna() & (df['contact_person'] != '')]
-            elif 'contact_person_name' in df.columns:
-                df = df[df['contact_person_name'].notna() & (df['contact_person_name'] != '')]
-            
-            # Track processed contacts to avoid duplicates
-            processed_contacts = set()
-            count = 0
-            
-            for _, row in df.iterrows():
-                branch_name = self.clean_value(get_row_value(row, 'Branch Name', 'branch_name', 'branch'))
-                contact_name = self.clean_value(get_row_value(row, 'Contact Person', 'contact_person', 'contact_person_name'))
-                
-                if branch_name and contact_name:
-                    # Create unique key for contact
-                    contact_key = f"{branch_name}_{contact_name}"
-                    
-                    if contact_key not in processed_contacts:
-                        # Find branch using the helper function
-                        branch = self.find_branch_by_name(branch_name)
-                        
-                        if branch:
-                            # Use get_or_create to prevent duplicates
-                            contact, created = ContactPerson.objects.get_or_create(
-                                branch=branch,
-                                full_name=contact_name,
-                                defaults={
-                                    'role': self.clean_value(get_row_value(row, 'Role', 'role')),
-                                    'phone_number': self.clean_value(get_row_value(row, 'Phone Number', 'phone_number')),
-                                    'email': self.clean_value(get_row_value(row, 'Email', 'email')),
-                                    'department': self.clean_value(get_row_value(row, 'Department', 'department')),
-                                }
-                            )
-                            processed_contacts.add(contact_key)
-                            count += 1
-                            if count <= 10:
-                                self.stdout.write(f'  Added contact: {contact_name} for {branch.name}')
-                            try:
-                                persist_import_row('data/csv/contact_person.csv', row.to_dict(), model='ContactPerson', model_pk=contact.pk)
-                            except Exception:
-                                pass
-                        else:
-                            if count <= 5:
-                                self.stdout.write(f'  Branch not found: {branch_name}')
-            
-            self.stdout.write(f'Imported {count} unique contact persons')
-            
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error importing contacts: {e}'))
+
+        seen = set()
+        with self.importer.stage('contacts') as stats:
+            checkpoint = self.checkpoint(CONTACT_FILE, 'contacts')
+            for chunk, raw_rows, replay in self.read_chunks(CONTACT_FILE, 'contacts', checkpoint, stats):
+                branch_col = find_column(chunk.columns, 'Branch Name', 'branch_name', 'branch')
+                name_col = find_column(chunk.columns, 'Contact Person', 'contact_person', 'contact_person_name')
+                resolved = self.resolve_columns(chunk.columns, CONTACT_COLUMNS)
+                batch = []
+
+                for row, raw in zip(chunk.to_dict('records'), raw_rows):
+                    stats.rows += 1
+                    branch_name = self.column_value(row, branch_col)
+                    contact_name = self.column_value(row, name_col)
+                    if not (branch_name and contact_name):
+                        stats.skipped += 1
+                        continue
+
+                    branch = self.branches.resolve(branch_name)
+                    if branch is None:
+                        stats.error(f'row {stats.rows + 1}', f'branch not found: {branch_name}')
+                        continue
+                    # One contact per (branch, name), matching the model's unique_together
+                    key = (branch.pk, contact_name)
+                    if key in seen:
+                        stats.skipped += 1
+                        continue
+
+                    contact = ContactPerson(branch=branch, full_name=contact_name, **self.row_values(row, resolved))
+                    if not self.importer.validate(contact, stats, f'row {stats.rows + 1}'):
+                        continue
+                    seen.add(key)
+                    if not self.delta('contact').track(f'{branch.name}|{contact_name}', contact):
+                        stats.unchanged += 1
+                        continue
+                    batch.append((contact, raw))
+
+                if replay:
+                    stats.replayed += len(raw_rows)
+                    continue
+                with transaction.atomic():
+                    self.importer.upsert(ContactPerson, [c for c, _ in batch], ['branch', 'full_name'], stats)
+                    if self.refresh_only and batch:
+                        # a superset at worst (names crossed with branches), which only costs a reindex
+                        self.touch(ContactPerson, ContactPerson.objects.filter(
+                            branch__in={c.branch_id for c, _ in batch}, full_name__in={c.full_name for c, _ in batch},
+                        ).values_list('pk', flat=True))
+                    for contact, row in batch:
+                        if not self.dry_run:
+                            self.audit.write(CONTACT_FILE, row, model='ContactPerson')
+                    self.checkpoints.advance(checkpoint, len(raw_rows))
+
+        self.stdout.write(f'Imported {len(seen)} unique contact persons')
 
     def import_atms(self):
         """Import ATMs with duplicate prevention using TID"""
         self.stdout.write('Importing ATMs (preventing duplicates by TID)...')
-        
-        try:
-            try:
-                df = read_csv_safe('data/csv/atm_all.csv')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Could not read ATMs file: {e}'))
-                df = None
-            if df is None:
-                self.stdout.write(self.style.ERROR('Could not read ATMs file'))
-                return
-                
-            count = 0
-            for _, row in df.iterrows():
-                raw_tid = get_row_value(row, 'TID', 'tid')
-                tid = self.clean_value(normalize_tid(raw_tid))
-                if tid:
-                    # Find branch using the helper function
-                    branch = None
-                    branch_name = self.clean_value(get_row_value(row, 'branch', 'branch_name'))
-                    if branch_name:
-                        branch = self.find_branch_by_name(branch_name)
-                    
-                    atm_name = self.clean_value(get_row_value(row, 'atm_name', 'atm name', 'atm')) or f'ATM {tid}'
-                    
-                    # Use get_or_create with TID (which is unique)
-                    atm, created = ATM.objects.get_or_create(
+
+        seen = set()
+        with self.importer.stage('atms') as stats:
+            checkpoint = self.checkpoint(ATM_FILE, 'ATMs')
+            for chunk, raw_rows, replay in self.read_chunks(ATM_FILE, 'ATMs', checkpoint, stats):
+                branch_col = find_column(chunk.columns, 'branch', 'branch_name')
+                name_col = find_column(chunk.columns, 'atm_name', 'atm name', 'atm')
+                resolved = self.resolve_columns(chunk.columns, ATM_COLUMNS)
+                tids = chunk.pop(TID)
+                batch = []
+
+                for tid, row, raw in zip(tids, chunk.to_dict('records'), raw_rows):
+                    stats.rows += 1
+                    if not tid or tid in seen:
+                        stats.skipped += 1
+                        continue
+
+                    values = self.row_values(row, resolved)
+                    values['atm_brand'] = values['atm_brand'] or 'NCR'
+                    values['deployment_status'] = values['deployment_status'] or 'DEPLOYED'
+                    atm = ATM(
                         tid=tid,
-                        defaults={
-                            'branch': branch,
-                            'atm_name': atm_name,
-                            'ip_address': self.clean_value(get_row_value(row, 'ip_address', 'ip address', 'ip')),
-                            'port': self.clean_value(get_row_value(row, 'port')),
-                            'location_type': self.clean_value(get_row_value(row, 'location_type')),
-                            'atm_brand': self.clean_value(get_row_value(row, 'atm_brand', 'brand')) or 'NCR',
-                            'dispenser_type': self.clean_value(get_row_value(row, 'dispenser_type')),
-                            'atm_type': self.clean_value(get_row_value(row, 'atm_type')),
-                            'serial_number': self.clean_value(get_row_value(row, 'serial_number')),
-                            'tag_no': self.clean_value(get_row_value(row, 'tag_no')),
-                            'deployment_status': self.clean_value(get_row_value(row, 'deployment_status')) or 'DEPLOYED',
-                            'placement_type': self.clean_value(get_row_value(row, 'placement_type')),
-                            'service_number': self.clean_value(get_row_value(row, 'service_number', 'service_no')),
-                            'connection_type': self.clean_value(get_row_value(row, 'connection_type')),
-                            'reserve_casset_availability': self.clean_value(get_row_value(row, 'reserve_casset_availability')),
-                            'reserve_casset_quantity': self.clean_value(get_row_value(row, 'reserve_casset_quantity')),
-                        }
+                        branch=self.branches.resolve(self.column_value(row, branch_col)),
+                        atm_name=self.column_value(row, name_col) or f'ATM {tid}',
+                        **values
                     )
-                    count += 1
-                    if count <= 10:
-                        action = 'Created' if created else 'Updated'
-                        self.stdout.write(f'  {action} ATM: {tid}')
-                    try:
-                        persist_import_row('data/csv/atm_all.csv', row.to_dict(), model='ATM', model_pk=atm.pk)
-                    except Exception:
-                        pass
-            
-            self.stdout.write(f'Imported {count} unique ATMs')
-            
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error importing ATMs: {e}'))
+                    if not self.importer.validate(atm, stats, f'row {stats.rows + 1} (TID {tid})'):
+                        continue
+                    seen.add(tid)
+                    if not self.delta('atm').track(tid, atm):
+                        stats.unchanged += 1
+                        continue
+                    self.rewritten_ips.add(atm.ip_address)
+                    batch.append((atm, raw))
+
+                if replay:
+                    stats.replayed += len(raw_rows)
+                    continue
+                with transaction.atomic():
+                    self.importer.upsert(ATM, [atm for atm, _ in batch], ['tid'], stats)
+                    pks = dict(ATM.objects.filter(tid__in=[atm.tid for atm, _ in batch]).values_list('tid', 'pk'))
+                    self.touch(ATM, pks.values())
+                    for atm, row in batch:
+                        if not self.dry_run:
+                            self.audit.write(ATM_FILE, row, model='ATM', model_pk=pks.get(atm.tid))
+                    self.checkpoints.advance(checkpoint, len(raw_rows))
+
+        self.stdout.write(f'Imported {len(seen)} unique ATMs')
 
     def import_atms_off_wan(self):
         """Import/merge data from 'ATMs - Off - WAN - IP.csv' into branches and update ATM IPs."""
         self.stdout.write("Importing ATMs - Off - WAN - IP (merging into branches)...")
 
-        try:
-            try:
-                df = read_csv_safe('data/csv/ATMs - Off - WAN - IP.csv')
-            except Exception as e:
-                self.stdout.write(self.style.ERROR(f'Could not read ATMs-off-wan file: {e}'))
-                return
-
-            if df is None:
-                self.stdout.write(self.style.ERROR('No data in ATMs-off-wan file'))
-                return
-
-            count = 0
-            for _, row in df.iterrows():
-                site = self.clean_value(get_row_value(row, 'Site Name', 'site_name', 'site'))
-                if not site:
+        hawassa = District.objects.filter(name='Hawassa').first()
+        taken_tids = set(ATM.objects.values_list('tid', flat=True))
+        branch_fields = list(OFF_WAN_BRANCH_COLUMNS) + [f'tunnel_{i}' for i in range(7)]
+        merged = 0
+
+        with self.importer.stage('atms off-wan (merge)') as stats:
+            checkpoint = self.checkpoint(ATM_OFF_WAN_FILE, 'ATMs-off-wan')
+            for chunk, raw_rows, replay in self.read_chunks(ATM_OFF_WAN_FILE, 'ATMs-off-wan', checkpoint, stats):
+                columns = chunk.columns
+                site_col = find_column(columns, 'Site Name', 'site_name', 'site')
+                atm_ip_col = find_column(columns, 'ATM IP', 'atm_ip', 'atm ip')
+                sn_col = find_column(columns, 'SN', 'sn')
+                resolved = self.resolve_columns(columns, OFF_WAN_BRANCH_COLUMNS)
+                tunnel_cols = [c for c in (find_column(columns, name) for name in OFF_WAN_TUNNEL_COLUMNS) if c]
+                if not tunnel_cols:
+                    # if no preferred matches, try any column containing 'tunnel'
+                    tunnel_cols = [c for c in columns if 'tunnel' in c.lower()]
+
+                records = chunk.to_dict('records')
+                total = len(records)
+                records = [row for row in records if self.column_value(row, site_col)]
+                stats.rows += total
+                stats.skipped += total - len(records)
+
+                # Later rows of a site overwrite earlier ones, so a site is reapplied as a whole
+                # when any of its rows changed or the branch / ATM rows it merges into were rewritten
+                reapply = set()
+                for row in records:
+                    site = self.column_value(row, site_col)
+                    atm_ip = self.column_value(row, atm_ip_col)
+                    branch = self.branches.resolve(site)
+                    self.off_wan_branches.add(branch.name if branch is not None else site)
+                    key = f'{site}|{self.column_value(row, sn_col)}|{atm_ip}'
+                    if self.delta('off_wan').track(key, row) or branch is None \
+                            or branch.name in self.rewritten_branches or atm_ip in self.rewritten_ips:
+                        reapply.add(site)
+                kept = [row for row in records if self.column_value(row, site_col) in reapply]
+                stats.unchanged += len(records) - len(kept)
+                records = kept
+                merged += len(records)
+                if replay:
+                    stats.replayed += len(raw_rows)
                     continue
 
-                # attempt to find or create branch
-                branch = self.find_branch_by_name(site)
-                if branch is None:
-                    # fallback: create under Hawassa if district exists
-                    try:
-                        hawassa = District.objects.get(name='Hawassa')
-                    except District.DoesNotExist:
-                        hawassa = None
-
-                    branch, created = Branch.objects.get_or_create(
-                        name=site,
-                        defaults={'district': hawassa}
-                    )
-                    if created:
-                        self.stdout.write(f'  Created branch for site: {site}')
-
-                # update branch fields
-                branch.connection_type = self.clean_value(get_row_value(row, 'Connection Type', 'connection_type')) or branch.connection_type
-                branch.service_number = self.clean_value(get_row_value(row, 'Service No.', 'service_no', 'service_number')) or branch.service_number
-                branch.account_number = self.clean_value(get_row_value(row, 'Account Number', 'account_number')) or branch.account_number
-                branch.wan_address = self.clean_value(get_row_value(row, 'WAN IP', 'wan_ip', 'wan_address')) or branch.wan_address
-                branch.lan_address = self.clean_value(get_row_value(row, 'LAN Address (Router IP)', 'lan_address', 'lan ip', 'lan_address_router_ip')) or branch.lan_address
-                # LoopBack (Router-id) may be a gateway
-                branch.default_gateway = self.clean_value(get_row_value(row, 'LoopBack (Router-id)', 'loopback', 'router-id', 'default_gateway')) or branch.default_gateway
-
-                # Collect tunnel columns (up to 7 tunnels mapped to tunnel_0..6)
-                tunnel_cols = [c for c in df.columns if c.startswith('tunnel_ip') or 'tunnel' in c]
-                # also support original names from this CSV
-                preferred = [
-                    'tunnel ip dr-er116','tunnel ip dr-er126','tunnel ip dc-er316','tunnel ip dc-er416',
-                    'tunnel ip dr-er11','tunnel ip dr-er12','tunnel ip dc-er21','tunnel ip dc-er22'
-                ]
-
-                tunnels = []
-                for name in preferred:
-                    val = get_row_value(row, name)
-                    if val:
-                        tunnels.append(self.clean_value(val))
-
-                # if no preferred matches, try any column containing 'tunnel'
-                if not tunnels:
-                    for col in df.columns:
-                        if 'tunnel' in col:
-                            val = row.get(col)
-                            if pd.notna(val) and str(val).strip() != '':
-                                tunnels.append(self.clean_value(val))
-
-                # assign up to 7 tunnel fields
-                for i in range(7):
-                    attr = f'tunnel_{i}'
-                    val = tunnels[i] if i < len(tunnels) else None
-                    setattr(branch, attr, val)
-
-                branch.save()
-
-                # Update or create ATM by ATM IP if present
-                atm_ip = self.clean_value(get_row_value(row, 'ATM IP', 'atm_ip', 'atm ip'))
-                if atm_ip:
-                    # try find ATM by ip
-                    atm = ATM.objects.filter(ip_address=atm_ip).first()
-                    if atm:
-                        # link to branch if missing
-                        if atm.branch is None and branch:
-                            atm.branch = branch
-                            atm.save()
-                    else:
+                with transaction.atomic():
+                    # Resolve every site to a branch, creating the missing ones in one go
+                    touched = {}
+                    new_branches = []
+                    for row in records:
+                        site = self.column_value(row, site_col)
+                        if self.branches.resolve(site) is None:
+                            # fallback: create under Hawassa
+                            branch = Branch(name=site, district=hawassa)
+                            self.branches.add(branch)
+                            new_branches.append(branch)
+                    self.importer.create(Branch, new_branches, stats)
+
+                    # Existing ATMs for this batch's IPs, first by TID as .first() would pick
+                    ips = {self.column_value(row, atm_ip_col) for row in records} - {None}
+                    atm_by_ip = {}
+                    for atm in ATM.objects.filter(ip_address__in=ips).order_by('tid'):
+                        atm_by_ip.setdefault(atm.ip_address, atm)
+                    linked_atms = {}
+                    new_atms = []
+
+                    # Apply rows in file order so later rows win, exactly as sequential saves would
+                    for row in records:
+                        site = self.column_value(row, site_col)
+                        branch = self.branches.resolve(site)
+                        touched[branch.pk] = branch
+                        for field, value in self.row_values(row, resolved).items():
+                            setattr(branch, field, value or getattr(branch, field))
+                        # assign up to 7 tunnel fields
+                        tunnels = [self.column_value(row, col) for col in tunnel_cols]
+                        tunnels = [t for t in tunnels if t]
+                        for i in range(7):
+                            setattr(branch, f'tunnel_{i}', tunnels[i] if i < len(tunnels) else None)
+
+                        # Update or create ATM by ATM IP if present
+                        atm_ip = self.column_value(row, atm_ip_col)
+                        if not atm_ip:
+                            continue
+                        atm = atm_by_ip.get(atm_ip)
+                        if atm is not None:
+                            # link to branch if missing
+                            if atm.branch_id is None and atm.pk is not None:
+                                atm.branch = branch
+                                linked_atms[atm.pk] = atm
+                            continue
+
                         # create a minimal ATM record using available data
-                            tid_candidate = normalize_tid(get_row_value(row, 'Service No.', 'service_no'))
-                            tid = self.clean_value(tid_candidate) or f'AUTO-SN-{self.clean_value(get_row_value(row, 'SN', 'sn'))}'
+                        tid = row[SERVICE_TID] or f'AUTO-SN-{self.column_value(row, sn_col)}'
                         # ensure uniqueness for tid
-                        if ATM.objects.filter(tid=tid).exists():
+                        if tid in taken_tids:
                             # fallback to generated unique
-                            import uuid
                             tid = f'AUTO-{uuid.uuid4().hex[:8]}'
+                        taken_tids.add(tid)
+                        atm = ATM(tid=tid, branch=branch, atm_name=site, ip_address=atm_ip)
+                        atm_by_ip[atm_ip] = atm
+                        new_atms.append(atm)
 
-                        atm = ATM.objects.create(
-                            tid=tid,
-                            branch=branch,
-                            atm_name=site,
-                            ip_address=atm_ip
-                        )
-                        self.stdout.write(f'  Created ATM {atm.tid} for branch {branch.name} with IP {atm_ip}')
-
-                count += 1
-
-            self.stdout.write(f'Imported/merged {count} rows from ATMs-off-wan file')
+                    self.importer.update(Branch, list(touched.values()), branch_fields, stats)
+                    self.importer.update(ATM, list(linked_atms.values()), ['branch'], stats)
+                    self.importer.create(ATM, new_atms, stats)
+                    self.touch(Branch, touched)
+                    self.touch(ATM, linked_atms)
+                    if self.refresh_only and new_atms:
+                        self.touch(ATM, ATM.objects.filter(
+                            tid__in=[atm.tid for atm in new_atms],
+                        ).values_list('pk', flat=True))
+                    self.checkpoints.advance(checkpoint, len(raw_rows))
 
-        except Exception as e:
-            self.stdout.write(self.style.ERROR(f'Error importing ATMs-off-wan: {e}'))
\ No newline at end of file
+        self.stdout.write(f'Imported/merged {merged} rows from ATMs-off-wan file')
@@ -1,41 +1,83 @@
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from cbe.models import ATM
 from cbe.csv_utils import normalize_tid
+from cbe.bulk_import import BulkImporter, DEFAULT_BATCH_SIZE
+from cbe.search import reindex
 
 
 class Command(BaseCommand):
     help = 'Normalize existing ATM tid values to consistent string format'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+            help=f'ATMs per bulk UPDATE (default {DEFAULT_BATCH_SIZE})',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='List the tid changes without writing them',
+        )
+
     def handle(self, *args, **options):
         self.stdout.write('Starting TID normalization for ATMs...')
+        batch_size = options['batch_size']
+        dry_run = options['dry_run']
+        importer = BulkImporter(batch_size=batch_size)
+
+        # One query: every tid in the order the ATMs used to be saved one by one
+        rows = list(ATM.objects.order_by('tid', 'pk').values_list('pk', 'tid'))
+        taken = {tid for _, tid in rows}
+        total = len(rows)
         updated = 0
         conflicts = 0
 
-        for atm in ATM.objects.all():
-            original = atm.tid
-            new_tid = normalize_tid(original)
-            if new_tid is None:
-                continue
-
-            # If unchanged, skip
-            if str(original) == str(new_tid):
-                continue
-
-            # Ensure uniqueness: if new_tid already exists for a different ATM, append suffix
-            existing = ATM.objects.filter(tid=new_tid).exclude(pk=atm.pk).first()
-            if existing:
-                # create a unique tid
-                suffix = 1
-                candidate = f"{new_tid}-{suffix}"
-                while ATM.objects.filter(tid=candidate).exists():
-                    suffix += 1
+        with importer.stage('tid normalization') as stats, transaction.atomic():
+            pending = []
+            # tids released by rows in `pending`; taking one must wait until they are written
+            released = set()
+
+            def flush():
+                if pending and not dry_run:
+                    importer.update(ATM, pending, ['tid'], stats)
+                    reindex('atm', [atm.pk for atm in pending])
+                pending.clear()
+                released.clear()
+                self.stdout.write(f'  {stats.rows}/{total} ATMs checked, {updated} changed')
+
+            for pk, original in rows:
+                stats.rows += 1
+                new_tid = normalize_tid(original)
+                if new_tid is None or str(original) == str(new_tid):
+                    continue
+
+                # Ensure uniqueness: if new_tid is already taken by a different ATM, append suffix
+                if new_tid in taken:
+                    suffix = 1
                     candidate = f"{new_tid}-{suffix}"
-                atm.tid = candidate
-                conflicts += 1
-            else:
-                atm.tid = new_tid
+                    while candidate in taken:
+                        suffix += 1
+                        candidate = f"{new_tid}-{suffix}"
+                    new_tid = candidate
+                    conflicts += 1
 
-            atm.save()
-            updated += 1
+                if new_tid in released:
+                    flush()
+                taken.discard(original)
+                taken.add(new_tid)
+                released.add(original)
+                pending.append(ATM(pk=pk, tid=new_tid))
+                updated += 1
+                if dry_run:
+                    self.stdout.write(f'  {original} -> {new_tid}')
+                if len(pending) >= batch_size:
+                    flush()
+            flush()
 
-        self.stdout.write(self.style.SUCCESS(f'Normalized {updated} ATM tid values; {conflicts} conflicts resolved.'))
\ No newline at end of file
+        self.stdout.write(f'  {importer.stages[-1].summary()}')
+        if dry_run:
+            self.stdout.write(self.style.WARNING(
+                f'Dry run: {updated} ATM tid values would change; {conflicts} conflicts would be resolved.'
+            ))
+            return
+        self.stdout.write(self.style.SUCCESS(f'Normalized {updated} ATM tid values; {conflicts} conflicts resolved.'))
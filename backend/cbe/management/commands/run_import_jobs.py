@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from cbe.import_jobs import work
+
+
+class Command(BaseCommand):
+    help = 'Run the imports queued through /api/imports/, one at a time'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll', type=float, default=2.0,
+            help='Seconds between checks for queued jobs (default 2)',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no job is left in the queue',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Waiting for import jobs...' if not options['once'] else 'Running queued import jobs...')
+        work(poll=options['poll'], stop_when_idle=options['once'], report=self.report)
+
+    def report(self, job):
+        style = self.style.SUCCESS if job.status == 'succeeded' else self.style.ERROR
+        message = f'{job.pk} {job.source} ({job.filename}): {job.status}, {job.rows_done} rows, {job.errors} invalid'
+        if job.error:
+            message += f': {job.error}'
+        self.stdout.write(style(message))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Serve cbe_project.asgi with uvicorn (the /api/async/ read endpoints need an ASGI server)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8000)
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Worker processes; with more than one, set API_CACHE_DIR so they share cached responses',
+        )
+        parser.add_argument('--reload', action='store_true', help='Restart on code changes (development)')
+        parser.add_argument('--log-level', default='info')
+
+    def handle(self, *args, **options):
+        try:
+            import uvicorn
+        except ImportError:
+            raise CommandError('uvicorn is not installed: pip install uvicorn')
+        uvicorn.run(
+            'cbe_project.asgi:application',
+            host=options['host'],
+            port=options['port'],
+            workers=None if options['reload'] else options['workers'],
+            reload=options['reload'],
+            log_level=options['log_level'],
+            lifespan='off',
+        )
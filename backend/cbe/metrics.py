@@ -0,0 +1,228 @@
+"""Per-request cost: SQL queries, DB time, serializer time and response size.
+
+`RequestMetricsMiddleware` measures every request, sync or async, reports
+the numbers in a `Server-Timing` header (visible in the browser's network
+panel) and adds them to in-process totals that `/metrics` serves in the
+Prometheus text format to scrapers holding `METRICS_TOKEN` and to staff
+sessions; everyone else gets a 403. Routes are named by their URL name
+(`branch-list`, `atm-detail`, `stats`, ...). Queries are counted by `record_query`, which
+`cbe.signals` installs on every database connection, so the ones the async
+ORM runs on its worker threads count too.
+
+`settings.REQUEST_BUDGETS` caps `queries` / `db_ms` / `total_ms` per route
+('*' for the rest). Requests over budget are logged, or raise
+`BudgetExceeded` when `REQUEST_BUDGET_ACTION = 'raise'`, which fails the
+test that made them.
+"""
+import hmac
+import logging
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('cbe_request_metrics', default=None)
+
+
+class BudgetExceeded(AssertionError):
+    """A request went over its `REQUEST_BUDGETS` entry."""
+
+
+class RequestMetrics:
+    """Counters for one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.total_seconds = 0.0
+        self.response_bytes = None
+        self._serializer_depth = 0
+
+    def server_timing(self):
+        return ', '.join([
+            f'db;dur={self.db_seconds * 1000:.1f};desc="{self.queries} queries"',
+            f'ser;dur={self.serializer_seconds * 1000:.1f};desc="serializers"',
+            f'total;dur={self.total_seconds * 1000:.1f}',
+        ])
+
+    def over_budget(self, budget):
+        """The budget keys this request exceeded, with (actual, limit)."""
+        actual = {
+            'queries': self.queries,
+            'db_ms': self.db_seconds * 1000,
+            'total_ms': self.total_seconds * 1000,
+        }
+        return {key: (actual[key], limit) for key, limit in budget.items() if actual.get(key, 0) > limit}
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper adding each query to the current request's metrics, if any."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_seconds += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    """connection_created receiver; a reopened connection keeps its wrappers, so add it once."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def serializer_timer():
+    """Add the enclosed time to the request's serializer time; nested serializers count once."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    metrics._serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics._serializer_depth -= 1
+        if not metrics._serializer_depth:
+            metrics.serializer_seconds += time.perf_counter() - start
+
+
+class MetricsRegistry:
+    """Totals per (route, method, status) since the process started."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = defaultdict(lambda: defaultdict(float))
+
+    def observe(self, route, method, status, metrics, over_budget):
+        with self.lock:
+            series = self.series[(route, method, str(status))]
+            series['requests'] += 1
+            series['queries'] += metrics.queries
+            series['db_seconds'] += metrics.db_seconds
+            series['serializer_seconds'] += metrics.serializer_seconds
+            series['total_seconds'] += metrics.total_seconds
+            series['response_bytes'] += metrics.response_bytes or 0
+            series['over_budget'] += 1 if over_budget else 0
+
+    def render(self):
+        """Prometheus text exposition format."""
+        families = [
+            ('cbe_http_requests_total', 'counter', 'Requests served.', 'requests'),
+            ('cbe_db_queries_total', 'counter', 'SQL queries run.', 'queries'),
+            ('cbe_db_seconds_total', 'counter', 'Time spent in SQL queries.', 'db_seconds'),
+            ('cbe_serializer_seconds_total', 'counter', 'Time spent in DRF serializers.', 'serializer_seconds'),
+            ('cbe_request_seconds_total', 'counter', 'Time spent handling requests.', 'total_seconds'),
+            ('cbe_response_bytes_total', 'counter', 'Response body bytes (streamed bodies excluded).', 'response_bytes'),
+            ('cbe_request_over_budget_total', 'counter', 'Requests over their REQUEST_BUDGETS entry.', 'over_budget'),
+        ]
+        with self.lock:
+            snapshot = {key: dict(values) for key, values in self.series.items()}
+        lines = []
+        for name, kind, help_text, field in families:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (route, method, status), values in sorted(snapshot.items()):
+                labels = f'route="{_escape(route)}",method="{method}",status="{status}"'
+                lines.append(f'{name}{{{labels}}} {values.get(field, 0):g}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+def route_budget(route):
+    budgets = getattr(settings, 'REQUEST_BUDGETS', {})
+    return budgets.get(route, budgets.get('*', {}))
+
+
+class RequestMetricsMiddleware:
+    """Measure each request; see the module docstring."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # stay async under ASGI so async views are not pushed onto a thread
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, metrics, start, response)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, metrics, start, response)
+
+    def finish(self, request, metrics, start, response):
+        metrics.total_seconds = time.perf_counter() - start
+        if not response.streaming:
+            metrics.response_bytes = len(response.content)
+
+        route = route_name(request)
+        response['Server-Timing'] = metrics.server_timing()
+        over_budget = metrics.over_budget(route_budget(route))
+        REGISTRY.observe(route, request.method, response.status_code, metrics, over_budget)
+        if over_budget:
+            self.report(request, route, over_budget)
+        return response
+
+    def report(self, request, route, over_budget):
+        details = ', '.join(f'{key} {actual:.0f} > {limit}' for key, (actual, limit) in over_budget.items())
+        message = f'{request.method} {request.path} ({route}) over budget: {details}'
+        if getattr(settings, 'REQUEST_BUDGET_ACTION', 'log') == 'raise':
+            raise BudgetExceeded(message)
+        logger.warning(message)
+
+
+def metrics_view(request):
+    """`/metrics`, for `Authorization: Bearer <METRICS_TOKEN>` (when that setting is set) or a staff session."""
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    authorized = bool(token) and hmac.compare_digest(
+        request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode(),
+    )
+    if not authorized and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbe', '0003_remove_branch_account_number_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportRowHash',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(max_length=20)),
+                ('key', models.CharField(max_length=400)),
+                ('content_hash', models.CharField(max_length=40)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'import_row_hashes',
+                'unique_together': {('source', 'key')},
+            },
+        ),
+    ]
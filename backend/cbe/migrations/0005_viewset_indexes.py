@@ -0,0 +1,74 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:33
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbe', '0004_import_row_hashes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(fields=['deployment_status', 'tid'], name='atm_status_tid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(fields=['location_type', 'tid'], name='atm_location_tid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(fields=['atm_brand', 'tid'], name='atm_brand_tid_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(fields=['ip_address'], name='atm_ip_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(fields=['atm_name'], name='atm_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(django.db.models.functions.text.Upper('tid'), name='atm_tid_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='atm',
+            index=models.Index(django.db.models.functions.text.Upper('atm_name'), name='atm_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(fields=['connection_type', 'name'], name='branch_conn_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(fields=['district', 'name'], name='branch_district_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(fields=['service_number'], name='branch_service_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='branch_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='branch',
+            index=models.Index(django.db.models.functions.text.Upper('service_number'), name='branch_service_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactperson',
+            index=models.Index(fields=['role', 'full_name'], name='contact_role_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='contactperson',
+            index=models.Index(fields=['full_name'], name='contact_full_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wan_ip',
+            index=models.Index(fields=['branch', 'ip_address'], name='wanip_branch_ip_idx'),
+        ),
+    ]
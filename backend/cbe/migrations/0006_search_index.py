@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:00
+
+import re
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+# SQLite: an external-content FTS5 trigram table over search_entries (substring
+# matches, as icontains did), synced by triggers.
+# Django rebuilds SQLite tables on most ALTERs, which drops these triggers, so a
+# later migration that alters SearchEntry has to recreate them.
+SQLITE_FTS = [
+    """CREATE VIRTUAL TABLE search_entries_fts USING fts5(
+        title_terms, body, content='search_entries', content_rowid='id',
+        tokenize='trigram'
+    )""",
+    """CREATE TRIGGER search_entries_ai AFTER INSERT ON search_entries BEGIN
+        INSERT INTO search_entries_fts(rowid, title_terms, body) VALUES (new.id, new.title_terms, new.body);
+    END""",
+    """CREATE TRIGGER search_entries_ad AFTER DELETE ON search_entries BEGIN
+        INSERT INTO search_entries_fts(search_entries_fts, rowid, title_terms, body)
+        VALUES ('delete', old.id, old.title_terms, old.body);
+    END""",
+    """CREATE TRIGGER search_entries_au AFTER UPDATE ON search_entries BEGIN
+        INSERT INTO search_entries_fts(search_entries_fts, rowid, title_terms, body)
+        VALUES ('delete', old.id, old.title_terms, old.body);
+        INSERT INTO search_entries_fts(rowid, title_terms, body) VALUES (new.id, new.title_terms, new.body);
+    END""",
+]
+SQLITE_FTS_DROP = [
+    'DROP TRIGGER IF EXISTS search_entries_au',
+    'DROP TRIGGER IF EXISTS search_entries_ad',
+    'DROP TRIGGER IF EXISTS search_entries_ai',
+    'DROP TABLE IF EXISTS search_entries_fts',
+]
+
+# PostgreSQL: trigram GIN indexes serve the LIKE '%term%' matches
+POSTGRES_TRGM = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX search_entries_body_trgm ON search_entries USING gin (body gin_trgm_ops)',
+    'CREATE INDEX search_entries_title_trgm ON search_entries USING gin (title_terms gin_trgm_ops)',
+]
+POSTGRES_TRGM_DROP = [
+    'DROP INDEX IF EXISTS search_entries_title_trgm',
+    'DROP INDEX IF EXISTS search_entries_body_trgm',
+]
+
+
+def _statements(vendor, create):
+    if vendor == 'sqlite':
+        return SQLITE_FTS if create else SQLITE_FTS_DROP
+    if vendor == 'postgresql':
+        return POSTGRES_TRGM if create else POSTGRES_TRGM_DROP
+    return []
+
+
+def create_search_engine(apps, schema_editor):
+    """Best effort: without FTS5 / pg_trgm, cbe.search falls back to LIKE."""
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            for sql in _statements(schema_editor.connection.vendor, create=True):
+                schema_editor.execute(sql)
+    except DatabaseError:
+        pass
+
+
+def drop_search_engine(apps, schema_editor):
+    for sql in _statements(schema_editor.connection.vendor, create=False):
+        schema_editor.execute(sql)
+
+
+# A snapshot of cbe.search as of this migration, so later changes to that module
+# cannot change what migrating an old database produces: kind -> (model, title,
+# subtitle, searched fields).
+SEARCH_FIELDS = {
+    'branch': ('Branch', 'name', 'district__name', ('name', 'service_number', 'district__name', 'host_name')),
+    'atm': ('ATM', 'tid', 'atm_name', ('tid', 'atm_name', 'branch__name', 'ip_address', 'serial_number')),
+    'contact': ('ContactPerson', 'full_name', 'branch__name', (
+        'full_name', 'role', 'branch__name', 'phone_number', 'email',
+    )),
+    'wan_ip': ('WAN_IP', 'ip_address', 'branch__name', ('ip_address', 'branch__name', 'description')),
+}
+SEPARATORS = re.compile(r'[^\w.]+|_+')
+
+
+def normalize(value):
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    words = (word.strip('.') for word in SEPARATORS.split(text))
+    return ' '.join(word for word in words if word)
+
+
+def populate_search_index(apps, schema_editor):
+    SearchEntry = apps.get_model('cbe', 'SearchEntry')
+    connection = schema_editor.connection
+    for kind, (model_name, title_field, subtitle_field, fields) in SEARCH_FIELDS.items():
+        model = apps.get_model('cbe', model_name)
+        pk_field = model._meta.pk
+        entries = []
+        for pk, title, subtitle, *values in model.objects.values_list('pk', title_field, subtitle_field, *fields):
+            title = '' if title is None else str(title)
+            entries.append(SearchEntry(
+                kind=kind,
+                # the pk as the database stores it (UUIDs are hex on SQLite)
+                object_id=str(pk_field.get_db_prep_value(pk, connection)),
+                title=title[:200],
+                subtitle=('' if subtitle is None else str(subtitle))[:255],
+                title_terms=normalize(title)[:200],
+                body=' '.join(text for text in map(normalize, values) if text),
+            ))
+        SearchEntry.objects.bulk_create(entries, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbe', '0005_viewset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=40)),
+                ('title', models.CharField(max_length=200)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('title_terms', models.CharField(max_length=200)),
+                ('body', models.TextField()),
+            ],
+            options={
+                'db_table': 'search_entries',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(create_search_engine, drop_search_engine),
+        migrations.RunPython(populate_search_index, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:02
+
+import ipaddress
+import re
+
+from django.db import migrations, models
+
+# A snapshot of cbe.ip_index as of this migration, so later changes to that
+# module cannot change what migrating an old database produces.
+IP_FIELDS = {
+    'branch': ('Branch', (
+        'wan_address', 'lan_address', 'default_gateway', 'vsat_ip',
+        'tunnel_0', 'tunnel_1', 'tunnel_2', 'tunnel_3', 'tunnel_4', 'tunnel_5', 'tunnel_6',
+    )),
+    'atm': ('ATM', ('ip_address',)),
+    'wan_ip': ('WAN_IP', ('ip_address', 'gateway')),
+}
+IPV4 = re.compile(r'(?<![\d.])(\d{1,3}(?:\.\d{1,3}){3})(?:/(\d{1,2})(?![\d.]))?(?![\d.])')
+
+
+def parse_networks(value):
+    networks = []
+    for address, prefix in IPV4.findall(str(value or '')):
+        try:
+            networks.append(ipaddress.IPv4Interface(f'{address}/{prefix or 32}').network)
+        except ValueError:
+            continue
+    return networks
+
+
+def populate_ip_ranges(apps, schema_editor):
+    IPRange = apps.get_model('cbe', 'IPRange')
+    connection = schema_editor.connection
+    for kind, (model_name, fields) in IP_FIELDS.items():
+        model = apps.get_model('cbe', model_name)
+        pk_field = model._meta.pk
+        ranges = []
+        for pk, *values in model.objects.values_list('pk', *fields):
+            # object_id holds the pk as the database stores it (UUIDs are hex on SQLite)
+            object_id = str(pk_field.get_db_prep_value(pk, connection))
+            for field, value in zip(fields, values):
+                for network in parse_networks(value):
+                    ranges.append(IPRange(
+                        kind=kind, object_id=object_id, field=field, value=str(value)[:100],
+                        start=int(network.network_address), end=int(network.broadcast_address),
+                        prefix_length=network.prefixlen,
+                    ))
+        IPRange.objects.bulk_create(ranges, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbe', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IPRange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=20)),
+                ('object_id', models.CharField(max_length=40)),
+                ('field', models.CharField(max_length=30)),
+                ('value', models.CharField(max_length=100)),
+                ('start', models.BigIntegerField()),
+                ('end', models.BigIntegerField()),
+                ('prefix_length', models.PositiveSmallIntegerField()),
+            ],
+            options={
+                'db_table': 'ip_ranges',
+                'indexes': [models.Index(fields=['start', 'end'], name='iprange_start_end_idx'), models.Index(fields=['prefix_length'], name='iprange_prefix_idx'), models.Index(fields=['kind', 'object_id'], name='iprange_object_idx')],
+            },
+        ),
+        migrations.RunPython(populate_ip_ranges, migrations.RunPython.noop),
+    ]
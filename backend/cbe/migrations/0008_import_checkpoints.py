@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cbe', '0007_ip_ranges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stage', models.CharField(max_length=100, unique=True)),
+                ('file', models.CharField(blank=True, max_length=255)),
+                ('file_hash', models.CharField(blank=True, max_length=40)),
+                ('rows', models.PositiveIntegerField(default=0)),
+                ('chunks', models.PositiveIntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('options', models.JSONField(blank=True, default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'import_checkpoints',
+            },
+        ),
+    ]
@@ -1,4 +1,6 @@
+from django.conf import settings
 from django.db import models
+from django.db.models.functions import Upper
 import uuid
 
 class Region(models.Model):
@@ -6,7 +8,7 @@ class Region(models.Model):
     name = models.CharField(max_length=100, unique=True)
     code = models.CharField(max_length=10, blank=True, null=True)
     #created_at = models.DateTimeField(auto_now_add=True)
-    #updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'regions'
@@ -19,7 +21,7 @@ class District(models.Model):
     name = models.CharField(max_length=100, unique=True)
     region = models.ForeignKey(Region, on_delete=models.CASCADE, related_name='districts')
     #created_at = models.DateTimeField(auto_now_add=True)
-    #updated_at = models.DateTimeField(auto_now=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'districts'
@@ -66,6 +68,15 @@ class Branch(models.Model):
         db_table = 'branches'
         verbose_name_plural = 'branches'
         ordering = ['name']
+        # filter + default ordering of BranchViewSet, search and iexact lookups
+        # (Django compiles iexact to UPPER(col) = UPPER(%s) on PostgreSQL)
+        indexes = [
+            models.Index(fields=['connection_type', 'name'], name='branch_conn_name_idx'),
+            models.Index(fields=['district', 'name'], name='branch_district_name_idx'),
+            models.Index(fields=['service_number'], name='branch_service_idx'),
+            models.Index(Upper('name'), name='branch_name_upper_idx'),
+            models.Index(Upper('service_number'), name='branch_service_upper_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -90,6 +101,10 @@ class ContactPerson(models.Model):
         ordering = ['branch', 'full_name']
         # Prevent duplicate contacts for same branch
         unique_together = ['branch', 'full_name']
+        indexes = [
+            models.Index(fields=['role', 'full_name'], name='contact_role_name_idx'),
+            models.Index(fields=['full_name'], name='contact_full_name_idx'),
+        ]
     
     def __str__(self):
         return f"{self.full_name} - {self.branch.name}"
@@ -151,6 +166,17 @@ class ATM(models.Model):
         verbose_name = 'ATM'
         verbose_name_plural = 'ATMs'
         ordering = ['tid']
+        # ATMViewSet filters paired with its tid ordering, the off-WAN import's
+        # ip_address lookups, and case-insensitive tid / name lookups
+        indexes = [
+            models.Index(fields=['deployment_status', 'tid'], name='atm_status_tid_idx'),
+            models.Index(fields=['location_type', 'tid'], name='atm_location_tid_idx'),
+            models.Index(fields=['atm_brand', 'tid'], name='atm_brand_tid_idx'),
+            models.Index(fields=['ip_address'], name='atm_ip_idx'),
+            models.Index(fields=['atm_name'], name='atm_name_idx'),
+            models.Index(Upper('tid'), name='atm_tid_upper_idx'),
+            models.Index(Upper('atm_name'), name='atm_name_upper_idx'),
+        ]
     
     def __str__(self):
         return f"{self.tid} - {self.atm_name}"
@@ -180,6 +206,137 @@ class WAN_IP(models.Model):
         db_table = 'wan_ips'
         verbose_name_plural = 'WAN IPs'
         ordering = ['ip_address']
+        indexes = [
+            models.Index(fields=['branch', 'ip_address'], name='wanip_branch_ip_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.ip_address} - {self.branch.name}"
\ No newline at end of file
+        return f"{self.ip_address} - {self.branch.name}"
+
+
+class ImportRowHash(models.Model):
+    """Content hash of one imported source row, used by incremental imports."""
+    source = models.CharField(max_length=20)  # 'branch', 'contact', 'atm', 'off_wan'
+    key = models.CharField(max_length=400)  # branch name, TID or 'branch|full name'
+    content_hash = models.CharField(max_length=40)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'import_row_hashes'
+        unique_together = ['source', 'key']
+
+    def __str__(self):
+        return f"{self.source}:{self.key}"
+
+
+class SearchEntry(models.Model):
+    """Normalized search text for one branch, ATM, contact or WAN IP (see `cbe.search`)."""
+    kind = models.CharField(max_length=20)  # 'branch', 'atm', 'contact', 'wan_ip'
+    object_id = models.CharField(max_length=40)  # pk as stored by the database
+    title = models.CharField(max_length=200)
+    subtitle = models.CharField(max_length=255, blank=True)
+    # normalized (lowercase, accent-free, punctuation-free) title and full text
+    title_terms = models.CharField(max_length=200)
+    body = models.TextField()
+
+    class Meta:
+        db_table = 'search_entries'
+        unique_together = ['kind', 'object_id']
+
+    def __str__(self):
+        return f"{self.kind}:{self.title}"
+
+
+class IPRange(models.Model):
+    """One IPv4 address or network parsed from an IP-bearing field (see `cbe.ip_index`)."""
+    kind = models.CharField(max_length=20)  # 'branch', 'atm', 'wan_ip'
+    object_id = models.CharField(max_length=40)  # pk as stored by the database
+    field = models.CharField(max_length=30)  # e.g. 'lan_address', 'tunnel_3'
+    value = models.CharField(max_length=100)  # the address as written in the field
+    start = models.BigIntegerField()  # first and last address as integers
+    end = models.BigIntegerField()
+    prefix_length = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = 'ip_ranges'
+        indexes = [
+            models.Index(fields=['start', 'end'], name='iprange_start_end_idx'),
+            models.Index(fields=['prefix_length'], name='iprange_prefix_idx'),
+            models.Index(fields=['kind', 'object_id'], name='iprange_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.value} ({self.kind}.{self.field})"
+
+
+class ImportCheckpoint(models.Model):
+    """Progress of one stage of an interrupted `import_cbe_data` run (see `cbe.import_checkpoint`)."""
+    stage = models.CharField(max_length=100, unique=True)  # 'run', 'clean', 'atms', ...
+    file = models.CharField(max_length=255, blank=True)
+    file_hash = models.CharField(max_length=40, blank=True)  # SHA-1 of the whole source file
+    rows = models.PositiveIntegerField(default=0)  # source rows committed, i.e. the row index to resume at
+    chunks = models.PositiveIntegerField(default=0)  # chunks committed
+    completed = models.BooleanField(default=False)
+    options = models.JSONField(default=dict, blank=True)  # the run's batch size and mode, on 'run'
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'import_checkpoints'
+
+    def __str__(self):
+        return f"{self.stage}: {self.rows} rows"
+
+
+class ImportJob(models.Model):
+    """A CSV uploaded to `/api/imports/` and imported by a background worker (see `cbe.import_jobs`)."""
+    STATUSES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    SOURCES = [
+        ('branches', 'Branches'),
+        ('ospf_branches', 'Branches (WAN-IP and tunnel on OSPF)'),
+        ('contacts', 'Contact persons'),
+        ('atms', 'ATMs'),
+        ('atms_off_wan', 'ATMs - Off - WAN - IP'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    source = models.CharField(max_length=20, choices=SOURCES)  # the import_cbe_data --source it replaces
+    filename = models.CharField(max_length=255)  # as uploaded
+    path = models.CharField(max_length=500)  # the stored upload
+    incremental = models.BooleanField(default=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default='queued')
+    stage = models.CharField(max_length=100, blank=True)  # stage being imported, e.g. 'atms'
+    rows_done = models.PositiveIntegerField(default=0)  # source rows read, over all stages
+    errors = models.PositiveIntegerField(default=0)  # invalid rows so far
+    error = models.TextField(blank=True)  # why the job failed
+    log = models.TextField(blank=True)  # the command's output
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat while running
+
+    class Meta:
+        db_table = 'import_jobs'
+        ordering = ['-created_at']
+        indexes = [models.Index(fields=['status', 'created_at'], name='importjob_status_idx')]
+
+    def __str__(self):
+        return f"{self.source} import ({self.status})"
+
+
+class DataVersion(models.Model):
+    """Write counter of one model, moved by every write to it (see `cbe.versions`)."""
+    label = models.CharField(max_length=100, unique=True)  # model label, e.g. 'cbe.Branch'
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)  # when it last moved
+
+    class Meta:
+        db_table = 'data_versions'
+
+    def __str__(self):
+        return f"{self.label}: {self.version}"
@@ -0,0 +1,151 @@
+"""Keyset pagination for the large inventory lists (ATMs, branches, WAN IPs).
+
+`PageNumberPagination` runs a `COUNT(*)` and an `OFFSET` scan per page, so
+deep pages get slower as the table grows and shift while an import is
+running. `KeysetPagination` seeks from the last row's ordering key
+(`tid`, `name`, `ip_address`, or whatever `?ordering=` picks), which costs
+the same on every page.
+
+`EstimatedCountPaginator` spares the admin changelists that `COUNT(*)` on
+unfiltered big tables.
+"""
+from collections import OrderedDict
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import QuerySet
+from django.utils.functional import cached_property
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Cursor pagination on the view's ordering.
+
+    `?page_size=` picks the page size up to `max_page_size`. Responses
+    include the total `count` for compatibility; `?count=false` skips
+    that query.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    count_query_param = 'count'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.count = queryset.count() if self.include_count(request) else None
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        return self.set_page(list(page_queryset))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """`paginate_queryset` for async views, through `acount()` and `aiterator()`."""
+        self.count = await queryset.acount() if self.include_count(request) else None
+        page_queryset = self.page_queryset(queryset, request, view)
+        if page_queryset is None:
+            return None
+        # aiterator() only runs prefetch_related when given a chunk_size
+        return self.set_page([obj async for obj in page_queryset.aiterator(chunk_size=self.page_size + 1)])
+
+    # CursorPagination.paginate_queryset, split around the one query so
+    # the sync and async paths share the cursor handling
+
+    def page_queryset(self, queryset, request, view=None):
+        """The page's rows plus one (to tell whether a next page exists), or None if unpaginated."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        offset, reverse, current_position = self.cursor or (0, False, None)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if current_position is not None:
+            order = self.ordering[0]
+            # (cursor reversed) XOR (ordering reversed)
+            comparison = 'lt' if self.cursor.reverse != order.startswith('-') else 'gt'
+            queryset = queryset.filter(**{f'{order.lstrip("-")}__{comparison}': current_position})
+        return queryset[offset:offset + self.page_size + 1]
+
+    def set_page(self, results):
+        """Keep the page from `page_queryset`'s rows and work out the next/previous positions."""
+        offset, reverse, current_position = self.cursor or (0, False, None)
+        self.page = results[:self.page_size]
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        has_current = current_position is not None or offset > 0
+        if reverse:
+            # the rows were read in reverse, so put them back in order
+            self.page = list(reversed(self.page))
+            self.has_next, self.has_previous = has_current, has_following_position
+            self.next_position, self.previous_position = current_position, following_position
+        else:
+            self.has_next, self.has_previous = has_following_position, has_current
+            self.next_position, self.previous_position = following_position, current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+        return self.page
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() not in ('0', 'false', 'no')
+
+    def get_paginated_response(self, data):
+        payload = OrderedDict()
+        if self.count is not None:
+            payload['count'] = self.count
+        payload['next'] = self.get_next_link()
+        payload['previous'] = self.get_previous_link()
+        payload['results'] = data
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count'] = {'type': 'integer', 'example': 123}
+        return response_schema
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Admin paginator that takes the row count of an unfiltered table from
+    the planner's statistics instead of a `COUNT(*)` over every row.
+
+    Only PostgreSQL keeps a cheap estimate (`pg_class.reltuples`); tables
+    under `exact_below` rows, filtered changelists and other databases
+    still count exactly.
+    """
+    exact_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        estimate = self.estimated_count(queryset) if isinstance(queryset, QuerySet) else None
+        if estimate is None or estimate < self.exact_below:
+            return super().count
+        return estimate
+
+    def estimated_count(self, queryset):
+        if queryset.query.where or queryset.query.distinct:
+            return None
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [queryset.model._meta.db_table])
+            row = cursor.fetchone()
+        # -1 (never analyzed) or a missing table means no usable estimate
+        if row is None or row[0] < 0:
+            return None
+        return int(row[0])
@@ -0,0 +1,117 @@
+"""Cached list/detail responses with conditional GET for the read-heavy viewsets.
+
+Regions, districts and branches change a few times a day but every page
+mount lists them again. `CachedResponseMixin` keeps the serialized
+`response.data` in the `settings.API_CACHE_ALIAS` cache (local memory by
+default, any Django cache backend works) keyed by the viewset, the full
+query string and the caller's permission scope.
+
+Entries are validated against the write counters of the models in a
+viewset's `cache_models` (see `cbe.versions`), read with one small query,
+and those make the ETag. Writes move the counters in the database, so a
+write from any process makes stale entries and ETags stop matching without
+invalidating anything. `Last-Modified` is when a counter last moved.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.http import http_date, parse_etags, parse_http_date_safe, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+from .versions import data_versions, versions_tag
+
+RESPONSE_KEY = 'cbe:api:response:{}'
+
+
+def response_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'default')]
+
+
+class CachedResponseMixin:
+    """
+    Serve `list` / `retrieve` from the response cache, with ETag and
+    Last-Modified headers and 304s for conditional GETs.
+
+    `cache_models` lists every model whose writes change the responses,
+    the viewset's own model first.
+    """
+    cache_models = []
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(super().retrieve, request, *args, **kwargs)
+
+    def cache_scope(self, request):
+        """What the caller may see: the view's permission classes and the user's staff status."""
+        names = [permission.__name__ for permission in self.permission_classes]
+        return ','.join(names + ['staff' if request.user.is_staff else 'user'])
+
+    def cache_key(self, request):
+        raw = '|'.join([
+            type(self).__name__, self.action, request.get_host(), request.get_full_path(),
+            request.accepted_renderer.format, self.cache_scope(request),
+        ])
+        return RESPONSE_KEY.format(hashlib.md5(raw.encode()).hexdigest())
+
+    def last_modified(self, versions):
+        """When a counter of the cached models last moved, as a UNIX timestamp; None before any write."""
+        stamps = [latest for _, latest in versions if latest is not None]
+        return int(max(stamps).timestamp()) if stamps else None
+
+    def cached_response(self, handler, request, *args, **kwargs):
+        etag, versions, entry = self.cache_lookup(request)
+        if entry is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            entry = self.cache_store(request, etag, versions, response.data)
+        return self.entry_response(request, etag, entry)
+
+    def cache_lookup(self, request):
+        """(ETag, data versions, cache entry); the entry is None when the response has to be built.
+
+        A matching If-None-Match needs no entry: the 304 has no body.
+        """
+        versions = data_versions(self.cache_models)
+        key = self.cache_key(request)
+        etag = quote_etag(hashlib.md5(f'{key}|{versions_tag(versions)}'.encode()).hexdigest())
+        if self.etag_matches(request, etag):
+            return etag, versions, {'etag': etag, 'last_modified': self.last_modified(versions), 'data': None}
+        entry = response_cache().get(key)
+        if entry is not None and entry['etag'] != etag:
+            entry = None
+        return etag, versions, entry
+
+    def cache_store(self, request, etag, versions, data):
+        entry = {'etag': etag, 'last_modified': self.last_modified(versions), 'data': data}
+        response_cache().set(self.cache_key(request), entry, getattr(settings, 'API_CACHE_TIMEOUT', 600))
+        return entry
+
+    def etag_matches(self, request, etag):
+        if_none_match = request.headers.get('If-None-Match')
+        return bool(if_none_match) and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*')
+
+    def entry_response(self, request, etag, entry):
+        """The cached entry as a 200, or a 304 when the request's validators still match."""
+        if self.etag_matches(request, etag):
+            return self.not_modified(etag, entry['last_modified'])
+        if_modified_since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+        if (not request.headers.get('If-None-Match') and if_modified_since is not None
+                and entry['last_modified'] is not None and entry['last_modified'] <= if_modified_since):
+            return self.not_modified(etag, entry['last_modified'])
+        return self.with_validators(Response(entry['data']), etag, entry['last_modified'])
+
+    def not_modified(self, etag, last_modified):
+        return self.with_validators(Response(status=status.HTTP_304_NOT_MODIFIED), etag, last_modified)
+
+    def with_validators(self, response, etag, last_modified):
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        # clients may keep the body but must revalidate before reusing it
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,335 @@
+"""Search index behind `?search=` and `/api/search/`.
+
+DRF's `SearchFilter` ORs `icontains` clauses over joined columns
+(`branch__name`, `district__name`), a full scan of every joined table on
+each keystroke. Instead every branch, ATM, contact and WAN IP keeps one
+`SearchEntry` row holding its searchable text, normalized once on write
+(lowercase, accents and punctuation stripped), and queries go through the
+best engine the database offers:
+
+* SQLite: the `search_entries_fts` FTS5 trigram table (kept in sync by
+  triggers), matching substrings as `icontains` did, ranked by bm25 with
+  the title weighted up.
+* PostgreSQL with `pg_trgm`: substring matches served by trigram GIN
+  indexes, ranked by title similarity.
+* Otherwise: `LIKE` on the normalized body, one table and no joins.
+
+Entries are refreshed by the receivers in `cbe.signals`. Bulk writers run
+inside `suspend_indexing()` and then call `refresh_entries()` or
+`rebuild_index()` themselves.
+"""
+import re
+import threading
+import unicodedata
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.apps import apps as global_apps
+from django.db import connections, router
+from django.db.models import BigIntegerField, Case, IntegerField, UUIDField, When
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Cast
+from rest_framework import filters
+
+from .models import SearchEntry
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+REINDEX_BATCH_SIZE = 500
+
+SearchSpec = namedtuple('SearchSpec', ['model', 'title', 'subtitle', 'fields'])
+
+# What each kind shows and matches on; `fields` are values_list paths
+SEARCH_SPECS = {
+    'branch': SearchSpec('Branch', 'name', 'district__name', (
+        'name', 'service_number', 'district__name', 'host_name',
+    )),
+    'atm': SearchSpec('ATM', 'tid', 'atm_name', (
+        'tid', 'atm_name', 'branch__name', 'ip_address', 'serial_number',
+    )),
+    'contact': SearchSpec('ContactPerson', 'full_name', 'branch__name', (
+        'full_name', 'role', 'branch__name', 'phone_number', 'email',
+    )),
+    'wan_ip': SearchSpec('WAN_IP', 'ip_address', 'branch__name', (
+        'ip_address', 'branch__name', 'description',
+    )),
+}
+MODEL_KINDS = {spec.model: kind for kind, spec in SEARCH_SPECS.items()}
+
+# Kinds whose text quotes another model's name: {model: [(kind, lookup to that model)]}
+DEPENDENT_KINDS = {
+    'District': [('branch', 'district')],
+    'Branch': [('atm', 'branch'), ('contact', 'branch'), ('wan_ip', 'branch')],
+}
+
+# anything but letters, digits and dots ('10.1.2.3' stays one word)
+_SEPARATORS = re.compile(r'[^\w.]+|_+')
+
+_state = threading.local()
+
+
+def normalize(value):
+    """Lowercase, accent-free, single-spaced words ('Hawassa-Tabor Br.' -> 'hawassa tabor br')."""
+    if value is None:
+        return ''
+    text = unicodedata.normalize('NFKD', str(value))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    words = (word.strip('.') for word in _SEPARATORS.split(text))
+    return ' '.join(word for word in words if word)
+
+
+def query_terms(query):
+    """Normalized terms of `query`; an address fragment keeps its outer dots ('.20.')."""
+    text = unicodedata.normalize('NFKD', str(query or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    terms = []
+    for word in _SEPARATORS.split(text):
+        if not any(char.isdigit() for char in word):
+            word = word.strip('.')
+        if word.strip('.'):
+            terms.append(word)
+    return terms
+
+
+def _model(name, apps=None):
+    return (apps or global_apps).get_model('cbe', name)
+
+
+def stored_id(pk_field, pk, connection):
+    """`pk` the way the database stores it, which is what `object_id` holds (UUIDs are hex on SQLite)."""
+    return str(pk_field.get_db_prep_value(pk, connection))
+
+
+def build_entries(kind, queryset, entry_model=SearchEntry):
+    """Unsaved entries for every object in `queryset`, read with one `values_list` query."""
+    spec = SEARCH_SPECS[kind]
+    connection = connections[queryset.db]
+    pk_field = queryset.model._meta.pk
+    entries = []
+    for pk, title, subtitle, *values in queryset.values_list('pk', spec.title, spec.subtitle, *spec.fields):
+        title = '' if title is None else str(title)
+        entries.append(entry_model(
+            kind=kind,
+            object_id=stored_id(pk_field, pk, connection),
+            title=title[:200],
+            subtitle=('' if subtitle is None else str(subtitle))[:255],
+            title_terms=normalize(title)[:200],
+            body=' '.join(text for text in map(normalize, values) if text),
+        ))
+    return entries
+
+
+def reindex(kind, pks, batch_size=REINDEX_BATCH_SIZE):
+    """Rewrite the entries of the `kind` objects `pks`; pks that no longer exist lose theirs."""
+    model = _model(SEARCH_SPECS[kind].model)
+    connection = connections[router.db_for_write(SearchEntry)]
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        chunk = pks[start:start + batch_size]
+        ids = [stored_id(model._meta.pk, pk, connection) for pk in chunk]
+        SearchEntry.objects.filter(kind=kind, object_id__in=ids).delete()
+        SearchEntry.objects.bulk_create(build_entries(kind, model.objects.filter(pk__in=chunk)))
+
+
+def dependents(model, pks):
+    """{kind: pks} of the rows whose entries quote one of `pks` (e.g. a branch's ATMs)."""
+    found = {}
+    for kind, lookup in DEPENDENT_KINDS.get(model.__name__, []):
+        related = _model(SEARCH_SPECS[kind].model)
+        found[kind] = list(related.objects.filter(**{f'{lookup}__in': pks}).values_list('pk', flat=True))
+    return found
+
+
+def refresh_entries(model, pks, stale=None):
+    """Reindex `model` objects `pks` and the rows quoting them.
+
+    Pass `stale=dependents(model, pks)` collected before a delete, since
+    `SET_NULL` detaches the dependent rows before it returns.
+    """
+    pks = list(pks)
+    if not pks:
+        return
+    if model.__name__ in MODEL_KINDS:
+        reindex(MODEL_KINDS[model.__name__], pks)
+    for kind, related in (dependents(model, pks) if stale is None else stale).items():
+        reindex(kind, related)
+
+
+def rebuild_index(kinds=None, apps=None):
+    """Recreate every entry of `kinds` (all by default); `apps` is for data migrations."""
+    entry_model = _model('SearchEntry', apps)
+    for kind in kinds or SEARCH_SPECS:
+        model = _model(SEARCH_SPECS[kind].model, apps)
+        entry_model.objects.filter(kind=kind).delete()
+        entry_model.objects.bulk_create(
+            build_entries(kind, model.objects.all(), entry_model), batch_size=REINDEX_BATCH_SIZE,
+        )
+
+
+@contextmanager
+def suspend_indexing():
+    """Turn the save/delete receivers into no-ops for this thread; the caller reindexes afterwards."""
+    _state.suspended = getattr(_state, 'suspended', 0) + 1
+    try:
+        yield
+    finally:
+        _state.suspended -= 1
+
+
+def indexing_suspended():
+    return getattr(_state, 'suspended', 0) > 0
+
+
+def collect_dependents(sender, instance, **kwargs):
+    """pre_delete receiver: remember the rows quoting `instance` before SET_NULL detaches them."""
+    if not indexing_suspended():
+        instance._search_stale = dependents(sender, [instance.pk])
+
+
+def update_entries(sender, instance, created=False, **kwargs):
+    """post_save / post_delete receiver for the indexed models and the ones they quote."""
+    if indexing_suspended():
+        return
+    # a new row has nothing quoting it yet
+    stale = {} if created else getattr(instance, '_search_stale', None)
+    refresh_entries(sender, [instance.pk], stale)
+
+
+class SearchEngine:
+    """Portable engine: every term must occur in the normalized body."""
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    @classmethod
+    def available(cls, connection):
+        return True
+
+    def match(self, entries, terms):
+        for term in terms:
+            entries = entries.filter(body__contains=term)
+        return entries
+
+    def score(self, terms):
+        """Expression ordering matches best-first within a closeness tier, or None."""
+        return None
+
+    def rank(self, entries, terms):
+        """Exact title matches first, then title prefixes, then the engine's score."""
+        phrase = ' '.join(terms)
+        entries = entries.annotate(closeness=Case(
+            When(title_terms=phrase, then=0),
+            When(title_terms__startswith=phrase, then=1),
+            default=2,
+            output_field=IntegerField(),
+        ))
+        ordering = ['closeness']
+        score = self.score(terms)
+        if score is not None:
+            entries = entries.annotate(score=score)
+            ordering.append('score')
+        return entries.order_by(*ordering, 'title')
+
+
+class FTS5Engine(SearchEngine):
+    """SQLite FTS5 trigrams: substring matches ranked by bm25 (title 10x the body).
+
+    A trigram index needs three characters to look up, so shorter terms
+    are matched with LIKE on the body, inside the rows the others found.
+    """
+    table = 'search_entries_fts'
+
+    @classmethod
+    def available(cls, connection):
+        return connection.vendor == 'sqlite' and cls.table in connection.introspection.table_names()
+
+    def match_expression(self, terms):
+        # each term quoted: a substring to find, never FTS query syntax
+        return ' '.join('"{}"'.format(term.replace('"', '""')) for term in terms if len(term) >= 3)
+
+    def match(self, entries, terms):
+        expression = self.match_expression(terms)
+        if expression:
+            entries = entries.filter(id__in=RawSQL(
+                f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', [expression],
+            ))
+        return super().match(entries, [term for term in terms if len(term) < 3])
+
+    def score(self, terms):
+        if not self.match_expression(terms):
+            return None
+        # bm25 is lower for better matches
+        return RawSQL(
+            f'SELECT bm25({self.table}, 10.0, 1.0) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s AND rowid = search_entries.id',
+            [self.match_expression(terms)],
+        )
+
+
+class TrigramEngine(SearchEngine):
+    """PostgreSQL `pg_trgm`: the body LIKEs use the trigram GIN index, ranked by title similarity."""
+
+    @classmethod
+    def available(cls, connection):
+        if connection.vendor != 'postgresql':
+            return False
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            return cursor.fetchone() is not None
+
+    def score(self, terms):
+        # negated so that ascending order puts the most similar first
+        return RawSQL('-similarity(search_entries.title_terms, %s)', [' '.join(terms)])
+
+
+ENGINES = [FTS5Engine, TrigramEngine, SearchEngine]
+
+_engines = {}
+
+
+def get_engine(using=None):
+    """The first available engine for the database, detected once per database."""
+    connection = connections[using or router.db_for_read(SearchEntry)]
+    key = (connection.alias, str(connection.settings_dict['NAME']))
+    if key not in _engines:
+        engine = next(cls for cls in ENGINES if cls.available(connection))
+        _engines[key] = engine(connection)
+    return _engines[key]
+
+
+def search(query, kinds=None, limit=DEFAULT_LIMIT):
+    """Ranked `{type, id, title, subtitle}` matches for `query` across `kinds` (all by default)."""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    engine = get_engine()
+    entries = SearchEntry.objects.all()
+    if kinds:
+        entries = entries.filter(kind__in=kinds)
+    entries = engine.rank(engine.match(entries, terms), terms)[:limit]
+    results = []
+    for kind, object_id, title, subtitle in entries.values_list('kind', 'object_id', 'title', 'subtitle'):
+        pk_field = _model(SEARCH_SPECS[kind].model)._meta.pk
+        results.append({'type': kind, 'id': pk_field.to_python(object_id), 'title': title, 'subtitle': subtitle})
+    return results
+
+
+def search_queryset(queryset, kind, query):
+    """`queryset` narrowed to the `kind` objects whose entry matches every term of `query`."""
+    terms = query_terms(query)
+    if not terms:
+        return queryset
+    engine = get_engine(queryset.db)
+    entries = engine.match(SearchEntry.objects.using(queryset.db).filter(kind=kind), terms)
+    pk_type = UUIDField() if isinstance(queryset.model._meta.pk, UUIDField) else BigIntegerField()
+    return queryset.filter(pk__in=entries.values(target=Cast('object_id', pk_type)))
+
+
+class IndexedSearchFilter(filters.SearchFilter):
+    """`SearchFilter` answered from the search index on views that set `search_kind`."""
+
+    def filter_queryset(self, request, queryset, view):
+        kind = getattr(view, 'search_kind', None)
+        if kind is None:
+            return super().filter_queryset(request, queryset, view)
+        return search_queryset(queryset, kind, ' '.join(self.get_search_terms(request)))
@@ -1,13 +1,32 @@
 # cbe/serializers.py
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP
+from .metrics import serializer_timer
+from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP, ImportJob
 
-class RegionSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Count `to_representation` towards the request's serializer time (see `cbe.metrics`)."""
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+class SparseFieldsMixin:
+    """Let callers trim a serializer down to `fields` (e.g. from `?fields=id,name`).
+
+    Unknown names are ignored; nested serializers keep all their fields.
+    """
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+class RegionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Region
         fields = ['id', 'name', 'code']
 
-class DistrictSerializer(serializers.ModelSerializer):
+class DistrictSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     region = RegionSerializer(read_only=True)
     region_id = serializers.PrimaryKeyRelatedField(
         queryset=Region.objects.all(), 
@@ -19,7 +38,7 @@ class DistrictSerializer(serializers.ModelSerializer):
         model = District
         fields = ['id', 'name', 'region', 'region_id']
 
-class ContactPersonSerializer(serializers.ModelSerializer):
+class ContactPersonSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     
     class Meta:
@@ -31,7 +50,7 @@ class ContactPersonSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
 
-class BranchSerializer(serializers.ModelSerializer):
+class BranchSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     district_name = serializers.CharField(source='district.name', read_only=True)
     contacts = ContactPersonSerializer(many=True, read_only=True)
     district_id = serializers.PrimaryKeyRelatedField(
@@ -54,7 +73,14 @@ class BranchSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class ATMSerializer(serializers.ModelSerializer):
+class BranchListSerializer(BranchSerializer):
+    """Branch list rows without the nested contacts; see `?expand=contacts`."""
+    contacts = None
+
+    class Meta(BranchSerializer.Meta):
+        fields = [f for f in BranchSerializer.Meta.fields if f != 'contacts']
+
+class ATMSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     branch_id = serializers.PrimaryKeyRelatedField(
         queryset=Branch.objects.all(),
@@ -76,7 +102,7 @@ class ATMSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
-class WANIPSerializer(serializers.ModelSerializer):
+class WANIPSerializer(TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer):
     branch_name = serializers.CharField(source='branch.name', read_only=True)
     branch_id = serializers.PrimaryKeyRelatedField(
         queryset=Branch.objects.all(),
@@ -93,7 +119,7 @@ class WANIPSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at', 'branch']
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -115,3 +141,50 @@ class UserSerializer(serializers.ModelSerializer):
         if 'password' in validated_data:
             instance.set_password(validated_data.pop('password'))
         return super().update(instance, validated_data)
+
+class ImportJobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """An import job, validating the multipart upload of `file` and `source`.
+
+    `ImportJobViewSet.perform_create` queues the job from the validated data.
+    """
+    file = serializers.FileField(write_only=True)
+    # declared so an omitted form field means True, not False
+    incremental = serializers.BooleanField(default=True)
+    rows_per_sec = serializers.SerializerMethodField()
+    created_by = serializers.CharField(source='created_by.username', read_only=True, default=None)
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'source', 'file', 'filename', 'incremental', 'status', 'stage',
+            'rows_done', 'rows_per_sec', 'errors', 'error', 'log',
+            'created_by', 'created_at', 'started_at', 'finished_at', 'updated_at',
+        ]
+        read_only_fields = [
+            'id', 'filename', 'status', 'stage', 'rows_done', 'errors', 'error', 'log',
+            'created_at', 'started_at', 'finished_at', 'updated_at',
+        ]
+
+    def get_rows_per_sec(self, job):
+        if job.started_at is None:
+            return None
+        seconds = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+        return round(job.rows_done / seconds, 1) if seconds > 0 else None
+
+    def validate_incremental(self, incremental):
+        if not incremental:
+            raise serializers.ValidationError(
+                'An upload replaces one source and is always imported incrementally; '
+                'run import_cbe_data for a full import.'
+            )
+        return incremental
+
+    def validate_file(self, upload):
+        if not upload.name.lower().endswith('.csv'):
+            raise serializers.ValidationError('Upload a .csv file.')
+        return upload
+
+class ImportJobListSerializer(ImportJobSerializer):
+    """Import job rows without the command output."""
+    class Meta(ImportJobSerializer.Meta):
+        fields = [f for f in ImportJobSerializer.Meta.fields if f != 'log']
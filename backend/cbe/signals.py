@@ -0,0 +1,31 @@
+"""Signal receivers wired up in `CbeConfig.ready`.
+
+`bulk_create` / `bulk_update` do not send these signals, so bulk writers
+(e.g. `import_cbe_data`) refresh the search and IP indexes themselves, and
+`BulkImporter` moves the data versions.
+"""
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_delete
+
+from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP
+from .db import configure_sqlite
+from .ip_index import update_ip_ranges
+from .metrics import install_query_recorder
+from .search import collect_dependents, update_entries
+from .versions import record_write
+
+for model in (District, Branch, ContactPerson, ATM, WAN_IP):
+    post_save.connect(update_entries, sender=model, dispatch_uid=f'search-save-{model.__name__}')
+    pre_delete.connect(collect_dependents, sender=model, dispatch_uid=f'search-collect-{model.__name__}')
+    post_delete.connect(update_entries, sender=model, dispatch_uid=f'search-delete-{model.__name__}')
+
+for model in (Branch, ATM, WAN_IP):
+    post_save.connect(update_ip_ranges, sender=model, dispatch_uid=f'ip-save-{model.__name__}')
+    post_delete.connect(update_ip_ranges, sender=model, dispatch_uid=f'ip-delete-{model.__name__}')
+
+for model in (Region, District, Branch, ContactPerson, ATM, WAN_IP):
+    post_save.connect(record_write, sender=model, dispatch_uid=f'version-save-{model.__name__}')
+    post_delete.connect(record_write, sender=model, dispatch_uid=f'version-delete-{model.__name__}')
+
+connection_created.connect(configure_sqlite, dispatch_uid='db-configure-sqlite')
+connection_created.connect(install_query_recorder, dispatch_uid='metrics-query-recorder')
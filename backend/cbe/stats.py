@@ -0,0 +1,70 @@
+"""Dashboard aggregates behind `/api/stats/`.
+
+Each model is read with a single aggregate query: branches grouped by
+(connection_type, district) and ATMs grouped by (deployment_status,
+location_type, atm_brand), folded into per-column breakdowns in Python.
+The result is kept in the response cache under the tables' write
+counters (see `cbe.versions`), so a cache hit reads one small table and a
+write from any process or command moves the key for the next request.
+"""
+from django.conf import settings
+from django.db.models import Count
+
+from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP
+from .response_cache import response_cache
+from .versions import data_versions, versions_tag
+
+CACHE_KEY = 'cbe:stats:{}'
+STATS_MODELS = (Region, District, Branch, ContactPerson, ATM, WAN_IP)
+UNSET = 'unset'
+
+
+def _breakdowns(rows, columns):
+    """Fold grouped rows ({col: value, ..., 'count': n}) into {col: {value: total}}."""
+    result = {name: {} for name in columns.values()}
+    for row in rows:
+        for column, name in columns.items():
+            key = row[column] if row[column] is not None else UNSET
+            result[name][key] = result[name].get(key, 0) + row['count']
+    return result
+
+
+def compute_stats():
+    """Counts and group-by breakdowns straight from the database."""
+    branch_rows = list(
+        Branch.objects.order_by().values('connection_type', 'district__name').annotate(count=Count('pk'))
+    )
+    atm_rows = list(
+        ATM.objects.order_by().values('deployment_status', 'location_type', 'atm_brand')
+        .annotate(count=Count('pk'))
+    )
+    return {
+        'counts': {
+            'regions': Region.objects.count(),
+            'districts': District.objects.count(),
+            'branches': sum(row['count'] for row in branch_rows),
+            'contacts': ContactPerson.objects.count(),
+            'atms': sum(row['count'] for row in atm_rows),
+            'wan_ips': WAN_IP.objects.count(),
+        },
+        'branches': _breakdowns(branch_rows, {
+            'connection_type': 'by_connection_type',
+            'district__name': 'by_district',
+        }),
+        'atms': _breakdowns(atm_rows, {
+            'deployment_status': 'by_deployment_status',
+            'location_type': 'by_location_type',
+            'atm_brand': 'by_brand',
+        }),
+    }
+
+
+def get_stats():
+    """`compute_stats()`, cached until any of the counted tables changes or the timeout."""
+    cache = response_cache()
+    key = CACHE_KEY.format(versions_tag(data_versions(STATS_MODELS)))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_stats()
+        cache.set(key, stats, getattr(settings, 'STATS_CACHE_TIMEOUT', 300))
+    return stats
@@ -1,3 +1,550 @@
-from django.test import TestCase
+import ipaddress
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from . import import_jobs
+from .branch_resolver import BranchResolver
+from .bulk_api import BulkMixin
+from .bulk_import import BulkImporter, ImportStats
+from .columns import ATM_COLUMNS
+from .csv_utils import normalize_tid, normalize_tid_column
+from .ip_conflicts import Address, find_overlaps
+from .models import (
+    Region, District, Branch, ContactPerson, ATM, WAN_IP, ImportRowHash, SearchEntry, IPRange,
+    ImportCheckpoint, ImportJob,
+)
+from .versions import data_versions
+
+DATA_DIR = os.path.join(settings.BASE_DIR, 'data', 'csv')
+INVENTORY = (Region, District, Branch, ContactPerson, ATM, WAN_IP)
+
+
+def import_data(**options):
+    """Run `import_cbe_data` quietly and return its output."""
+    out = StringIO()
+    call_command('import_cbe_data', stdout=out, **options)
+    return out.getvalue()
+
+
+def counts():
+    return {model.__name__: model.objects.count() for model in INVENTORY}
+
+
+class SampleDataTestCase(TestCase):
+    """
+    Tests against the sample CSVs in `data/csv`, imported once per class.
+
+    The importer's audit trail goes to a scratch `IMPORT_AUDIT_DIR` rather
+    than `data/imported/`.
+    """
+    import_sample = True
+
+    @classmethod
+    def setUpClass(cls):
+        cls.audit_dir = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, cls.audit_dir, ignore_errors=True)
+        cls.enterClassContext(override_settings(IMPORT_AUDIT_DIR=cls.audit_dir))
+        super().setUpClass()
+
+    @classmethod
+    def setUpTestData(cls):
+        if cls.import_sample:
+            import_data()
+
+    def setUp(self):
+        for alias in settings.CACHES:
+            caches[alias].clear()
+        self.user = User.objects.create_user('staff', password='x', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class BulkImportTests(SampleDataTestCase):
+    """user-001: set-based import engine."""
+
+    def test_full_import_loads_the_sample_data(self):
+        self.assertEqual(counts(), {
+            'Region': 1, 'District': 3, 'Branch': 191, 'ContactPerson': 161, 'ATM': 152, 'WAN_IP': 0,
+        })
+
+    def test_full_import_again_creates_no_duplicates(self):
+        before = counts()
+        import_data()
+        self.assertEqual(counts(), before)
+
+    def test_bulk_writes_batch_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            import_data(batch_size=5000)
+        # one INSERT per batch and table rather than one per row
+        self.assertLess(len(queries), 200)
+
+
+class BranchResolverTests(TestCase):
+    """user-002: in-memory branch name lookup."""
+
+    def test_resolution_cascade(self):
+        district = District.objects.create(name='D', region=Region.objects.create(name='R'))
+        for name in ('Hawassa Main', 'Hawassa Tabor', 'Dilla'):
+            Branch.objects.create(name=name, district=district)
+        with self.assertNumQueries(1):
+            resolver = BranchResolver.load()
+        with self.assertNumQueries(0):
+            self.assertEqual(resolver.resolve('Dilla Branch').name, 'Dilla')
+            self.assertEqual(resolver.resolve('dilla').name, 'Dilla')
+            self.assertEqual(resolver.resolve('tabor').name, 'Hawassa Tabor')
+            self.assertEqual(resolver.resolve('Hawassa Somewhere').name, 'Hawassa Main')
+            self.assertIsNone(resolver.resolve('Shashemene'))
+
+
+class StreamingImportTests(SampleDataTestCase):
+    """user-003: batched CSV reading gives the same result at any batch size."""
+
+    def test_small_batches_match_the_default(self):
+        expected = counts()
+        import_data(batch_size=7)
+        self.assertEqual(counts(), expected)
+
+
+class TidNormalizationTests(TestCase):
+    """user-004: vectorized cleaning matches the per-value functions."""
+
+    def test_column_matches_scalar(self):
+        import pandas as pd
+        values = ['12345.0', ' 00123 ', '1.0011E+12', 'AHW00001', '', None, '"77,001"', '12.50']
+        expected = [normalize_tid(value) for value in values]
+        self.assertEqual(expected[:3], ['12345', '123', '1001100000000'])
+        column = normalize_tid_column(pd.Series(values, dtype=object))
+        self.assertEqual([None if pd.isna(value) else value for value in column], expected)
+
+
+class AuditLogTests(SampleDataTestCase):
+    """user-005: the import writes its audit trail through ImportAuditLog."""
+
+    def test_audit_files_written(self):
+        files = os.listdir(self.audit_dir)
+        self.assertTrue(any(name.endswith('.jsonl') for name in files))
+
+
+class ParallelImportTests(SampleDataTestCase):
+    """user-006: parsing in a process pool gives the same data."""
+
+    def test_parallel_matches_serial(self):
+        expected = counts()
+        tids = set(ATM.objects.values_list('tid', flat=True))
+        import_data(parallel=True, workers=2)
+        self.assertEqual(counts(), expected)
+        self.assertEqual(set(ATM.objects.values_list('tid', flat=True)), tids)
+
+
+class IncrementalImportTests(SampleDataTestCase):
+    """user-007: incremental imports only write rows whose content changed."""
+
+    def test_second_incremental_import_writes_nothing(self):
+        import_data(incremental=True)
+        versions = data_versions(INVENTORY)
+        hashes = list(ImportRowHash.objects.order_by('pk').values_list('source', 'key', 'content_hash', 'updated_at'))
+        entries = SearchEntry.objects.count()
+        ranges = list(IPRange.objects.order_by('pk').values_list('pk', flat=True))
+
+        import_data(incremental=True)
+
+        self.assertEqual(data_versions(INVENTORY), versions)
+        self.assertEqual(
+            list(ImportRowHash.objects.order_by('pk').values_list('source', 'key', 'content_hash', 'updated_at')),
+            hashes,
+        )
+        self.assertEqual(SearchEntry.objects.count(), entries)
+        self.assertEqual(list(IPRange.objects.order_by('pk').values_list('pk', flat=True)), ranges)
+
+    def test_dry_run_writes_nothing(self):
+        versions = data_versions(INVENTORY)
+        output = import_data(dry_run=True)
+        self.assertIn('Dry run: nothing was written', output)
+        self.assertEqual(data_versions(INVENTORY), versions)
+
+
+class NormalizeTidsTests(TestCase):
+    """user-008: normalize_tids rewrites messy TIDs in batches."""
+
+    def test_normalizes_and_dry_run_keeps(self):
+        atm = ATM.objects.create(tid='12345.0', atm_name='A')
+        call_command('normalize_tids', dry_run=True, stdout=StringIO())
+        atm.refresh_from_db()
+        self.assertEqual(atm.tid, '12345.0')
+        call_command('normalize_tids', stdout=StringIO())
+        atm.refresh_from_db()
+        self.assertEqual(atm.tid, '12345')
+
+
+class SparseFieldsetTests(SampleDataTestCase):
+    """user-009: `?fields=` trims list responses."""
+
+    def test_fields_param(self):
+        response = self.client.get('/api/branches/', {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+
+
+class StatsTests(SampleDataTestCase):
+    """user-010: cached dashboard aggregates follow the data."""
+
+    def test_counts_and_breakdowns(self):
+        data = self.client.get('/api/stats/').data
+        self.assertEqual(data['counts']['atms'], 152)
+        self.assertEqual(sum(data['atms']['by_brand'].values()), 152)
+        self.assertEqual(sum(data['branches']['by_district'].values()), 191)
+
+    def test_bulk_write_is_seen(self):
+        self.client.get('/api/stats/')
+        BulkImporter().create(ATM, [ATM(tid='NEW-1', atm_name='New one')], ImportStats('atms'))
+        self.assertEqual(self.client.get('/api/stats/').data['counts']['atms'], 153)
+
+    def test_cache_hit_reads_only_the_versions(self):
+        self.client.get('/api/stats/')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/stats/')
+        self.assertEqual([query['sql'] for query in queries if 'data_versions' not in query['sql']], [])
+
+
+class KeysetPaginationTests(SampleDataTestCase):
+    """user-011: cursor pages walk the whole list once."""
+
+    def test_pages_cover_every_row(self):
+        tids = []
+        url = '/api/atms/?page_size=40'
+        while url:
+            page = self.client.get(url).data
+            tids.extend(atm['tid'] for atm in page['results'])
+            url = page['next']
+        self.assertEqual(tids, list(ATM.objects.order_by('tid').values_list('tid', flat=True)))
+
+
+class ExportTests(SampleDataTestCase):
+    """user-012: streamed exports use the importer's column names."""
+
+    def test_csv_export(self):
+        response = self.client.get('/api/export/atms/', {'format': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        header = lines[0].split(',')
+        self.assertEqual(header[:3], ['TID', 'atm_name', 'branch'])
+        self.assertEqual(header[3:], [candidates[0] for candidates in ATM_COLUMNS.values()])
+        self.assertEqual(len(lines), 153)
+
+
+class BulkEndpointTests(SampleDataTestCase):
+    """user-013: bulk create/update/delete in one request."""
+
+    def test_bulk_upsert_and_delete(self):
+        existing = ATM.objects.order_by('tid').first()
+        response = self.client.post('/api/atms/bulk/', [
+            {'tid': 'NEW-1', 'atm_name': 'New one'},
+            {'tid': existing.tid, 'atm_name': 'Renamed'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data['created'], ['NEW-1'])
+        self.assertEqual(response.data['updated'], [existing.tid])
+        existing.refresh_from_db()
+        self.assertEqual(existing.atm_name, 'Renamed')
+
+        response = self.client.delete('/api/atms/bulk/', ['NEW-1', 'MISSING', 'GONE'], format='json')
+        self.assertEqual(response.data['deleted'], ['NEW-1'])
+        self.assertEqual([(error['index'], error['tid']) for error in response.data['errors']],
+                         [(2, 'GONE'), (1, 'MISSING')])
+
+    def test_concurrent_create_is_an_update(self):
+        lookups = BulkMixin.bulk_lookups
+
+        def insert_first(view, items, partial):
+            # another client creates the same TID after this request looked it up
+            ATM.objects.create(tid='RACE-1', atm_name='Other client')
+            return lookups(view, items, partial)
+
+        with mock.patch.object(BulkMixin, 'bulk_lookups', insert_first):
+            response = self.client.post('/api/atms/bulk/', [{'tid': 'RACE-1', 'atm_name': 'This one'}], format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data['created'], response.data['updated']), ([], ['RACE-1']))
+        self.assertEqual(ATM.objects.get(tid='RACE-1').atm_name, 'This one')
+
+    def test_invalid_item_writes_nothing(self):
+        before = ATM.objects.count()
+        response = self.client.post('/api/atms/bulk/', [{'tid': 'NEW-2', 'atm_name': 'ok'}, {'atm_name': 'no tid'}],
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(ATM.objects.count(), before)
+
+
+class IndexTests(TestCase):
+    """user-014: viewset filters are served by indexes."""
+
+    def test_status_filter_uses_index(self):
+        plan = ATM.objects.filter(deployment_status='DEPLOYED').order_by('tid').explain()
+        self.assertIn('atm_status_tid_idx', plan)
+
+
+class SearchTests(SampleDataTestCase):
+    """user-015: indexed search keeps substring semantics."""
+
+    def test_partial_tid_and_ip(self):
+        atm = ATM.objects.exclude(ip_address=None).order_by('tid').first()
+        results = self.client.get('/api/search/', {'q': atm.tid[2:7], 'type': 'atm'}).data['results']
+        self.assertIn(atm.tid, [result['title'] for result in results])
+
+        octets = '.'.join(atm.ip_address.split('.')[1:3])
+        results = self.client.get('/api/search/', {'q': octets, 'type': 'atm', 'limit': 100}).data['results']
+        expected = ATM.objects.filter(ip_address__contains=octets).count()
+        self.assertEqual(len(results), min(expected, 100))
+
+    def test_index_follows_writes(self):
+        atm = ATM.objects.order_by('tid').first()
+        atm.atm_name = 'Zebracorn Test'
+        atm.save()
+        results = self.client.get('/api/search/', {'q': 'zebracorn'}).data['results']
+        self.assertEqual([result['title'] for result in results], [atm.tid])
+
+
+class IPLookupTests(SampleDataTestCase):
+    """user-016: integer range index behind /api/ip-lookup/."""
+
+    def test_lookup_by_ip(self):
+        atm = ATM.objects.exclude(ip_address=None).order_by('tid').first()
+        results = self.client.get('/api/ip-lookup/', {'ip': atm.ip_address}).data['results']
+        self.assertIn(atm.tid, [result.get('name') or result.get('title') for result in results])
+
+    def test_bad_query(self):
+        self.assertEqual(self.client.get('/api/ip-lookup/', {'ip': 'nope'}).status_code, 400)
+
+
+class IPConflictTests(TestCase):
+    """user-017: the overlap sweep reports each cross-site overlap once."""
+
+    def address(self, cidr, site):
+        network = ipaddress.IPv4Network(cidr, strict=False)
+        return Address(
+            int(network.network_address), int(network.broadcast_address), network.prefixlen,
+            'branch', site, site, site, 'wan_address', cidr,
+        )
+
+    def test_overlaps(self):
+        addresses = [
+            self.address('10.0.0.0/16', 'a'),
+            self.address('10.0.1.0/24', 'a'),  # same site: not a conflict
+            self.address('10.0.1.5/32', 'b'),  # inside both of a's subnets
+            self.address('10.1.0.0/24', 'c'),  # disjoint
+        ]
+        overlaps = find_overlaps(addresses)
+        self.assertEqual(len(overlaps), 2)
+
+    def test_endpoint(self):
+        user = User.objects.create_user('staff', password='x', is_staff=True)
+        client = APIClient()
+        client.force_authenticate(user)
+        data = client.get('/api/ip-conflicts/').data
+        self.assertEqual(set(data), {'duplicates', 'overlaps', 'gateway_mismatches', 'summary'})
+
+
+class ResponseCacheTests(SampleDataTestCase):
+    """user-018: ETags revalidate to 304 until the data changes."""
+
+    def test_304_until_write(self):
+        response = self.client.get('/api/branches/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get('/api/branches/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        branch = Branch.objects.order_by('name').first()
+        branch.connection_type = 'VSAT'
+        branch.save()
+        response = self.client.get('/api/branches/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_bulk_write_invalidates(self):
+        etag = self.client.get('/api/districts/')['ETag']
+        region = Region.objects.get()
+        region.name = 'South'
+        # bulk writes send no signals
+        BulkImporter().update(Region, [region], ['name'], ImportStats('regions'))
+        response = self.client.get('/api/districts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['region']['name'], 'South')
+
+    def test_revalidation_reads_only_the_versions(self):
+        etag = self.client.get('/api/branches/')['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/branches/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual([query['sql'] for query in queries if 'data_versions' not in query['sql']], [])
+
+    def test_only_read_mostly_lists_are_cached(self):
+        self.assertNotIn('ETag', self.client.get('/api/atms/'))
+
+
+class MetricsTests(SampleDataTestCase):
+    """user-020: request metrics, /metrics access and budgets."""
+    import_sample = False
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/regions/')
+        self.assertIn('db;', response['Server-Timing'])
+
+    def test_metrics_denied_by_default(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        client = APIClient()
+        client.force_login(self.user)
+        self.assertEqual(client.get('/metrics').status_code, 200)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+            self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(REQUEST_BUDGETS={'region-list': {'queries': 0}}, REQUEST_BUDGET_ACTION='raise')
+    def test_budget_raises(self):
+        with self.assertRaises(AssertionError):
+            self.client.get('/api/regions/')
+
+
+class AdminTests(SampleDataTestCase):
+    """user-021: changelists annotate their counts instead of a query per row."""
+
+    def test_branch_changelist_queries(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/admin/cbe/branch/')
+        self.assertEqual(response.status_code, 200)
+        self.assertLess(len(queries), 15)
+
+
+class AsyncEndpointTests(SampleDataTestCase):
+    """user-022: async reads answer like the viewsets."""
+
+    def test_async_list_matches(self):
+        sync = self.client.get('/api/branches/', {'fields': 'id,name'}).json()
+        response = self.client.get('/api/async/branches/', {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], sync['results'])
+
+    def test_uncached_viewsets(self):
+        atm = ATM.objects.order_by('tid').first()
+        sync = self.client.get('/api/atms/').json()
+        response = self.client.get('/api/async/atms/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], sync['results'])
+        self.assertEqual(self.client.get(f'/api/async/atms/{atm.pk}/').json(),
+                         self.client.get(f'/api/atms/{atm.pk}/').json())
+        self.assertEqual(self.client.get('/api/async/wan-ips/').status_code, 200)
+
+
+class DatabaseSetupTests(TestCase):
+    """user-023: SQLite connections get the configured pragmas."""
+
+    def test_busy_timeout(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+
+
+class ResumeTests(SampleDataTestCase):
+    """user-024: chunked imports resume after a crash."""
+    import_sample = False
+
+    def test_resume_after_crash(self):
+        import_data()
+        expected = counts()
+
+        def crash(stats, calls=[]):
+            calls.append(stats)
+            if len(calls) == 5:
+                raise RuntimeError('crash')
+
+        with self.assertRaises(RuntimeError):
+            import_data(batch_size=20, progress=crash)
+        self.assertTrue(ImportCheckpoint.objects.exists())
+
+        output = import_data(resume=True)
+        self.assertIn('already committed', output)
+        self.assertEqual(counts(), expected)
+        self.assertFalse(ImportCheckpoint.objects.exists())
+
+    def test_nothing_to_resume(self):
+        with self.assertRaises(CommandError):
+            import_data(resume=True)
+
+
+@override_settings(IMPORT_JOBS_IN_PROCESS=False, IMPORT_JOB_TIMEOUT=3600)
+class ImportJobTests(SampleDataTestCase):
+    """user-025: uploads are queued and imported in the background."""
+
+    def setUp(self):
+        super().setUp()
+        self.upload_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.upload_dir, ignore_errors=True)
+        settings_patch = override_settings(IMPORT_UPLOAD_DIR=self.upload_dir)
+        settings_patch.enable()
+        self.addCleanup(settings_patch.disable)
+
+    def upload(self, source='atms', **extra):
+        with open(os.path.join(DATA_DIR, 'atm_all.csv'), 'rb') as f:
+            data = f.read()
+        return self.client.post('/api/imports/', {
+            'file': SimpleUploadedFile('atms.csv', data), 'source': source, **extra,
+        }, format='multipart')
+
+    def test_upload_is_queued_then_imported(self):
+        # forget the ATM source's row hashes so a deleted ATM counts as new
+        hashes = ImportRowHash.objects.filter(source='atm')
+        ATM.objects.filter(tid=hashes.order_by('key').first().key).delete()
+        hashes.delete()
+        contacts = ContactPerson.objects.count()
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'queued')
+
+        job = import_jobs.run(import_jobs.claim())
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertEqual(ATM.objects.count(), 152)
+        # only the uploaded source was imported
+        self.assertEqual(ContactPerson.objects.count(), contacts)
+        self.assertNotIn('contacts:', job.log)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_import_ignores_the_working_directory(self):
+        self.upload()
+        cwd = os.getcwd()
+        os.chdir(self.upload_dir)
+        self.addCleanup(os.chdir, cwd)
+        job = import_jobs.run(import_jobs.claim())
+        self.assertEqual(job.status, 'succeeded', job.error)
+        # the off-WAN file merged in is read from IMPORT_DATA_DIR, the audit trail goes to IMPORT_AUDIT_DIR
+        self.assertIn('atms off-wan (merge): 34 rows', job.log)
+        self.assertEqual(os.listdir(self.upload_dir), [])
+
+    def test_rejected_uploads(self):
+        self.assertEqual(self.upload(incremental='false').status_code, 400)
+        self.assertEqual(self.upload(source='nope').status_code, 400)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('user', password='x'))
+        self.assertEqual(client.get('/api/imports/').status_code, 403)
+
+    def test_stale_job_fails(self):
+        self.upload()
+        job = import_jobs.claim()
+        ImportJob.objects.filter(pk=job.pk).update(updated_at=timezone.now() - timezone.timedelta(hours=2))
+        self.assertEqual(import_jobs.fail_stale(), 1)
+        self.assertEqual(ImportJob.objects.get(pk=job.pk).status, 'failed')
+        self.assertFalse(os.path.exists(job.path))
@@ -1,9 +1,11 @@
 # cbe/urls.py
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
+from .async_views import read_urls
 from .views import (
     RegionViewSet, DistrictViewSet, BranchViewSet,
-    ContactPersonViewSet, ATMViewSet, WANIPViewSet, UserViewSet
+    ContactPersonViewSet, ATMViewSet, WANIPViewSet, UserViewSet, StatsView, SearchView,
+    IPLookupView, IPConflictsView, ImportJobViewSet,
 )
 
 router = DefaultRouter()
@@ -14,7 +16,21 @@ router.register(r'contacts', ContactPersonViewSet)
 router.register(r'atms', ATMViewSet)
 router.register(r'wan-ips', WANIPViewSet)
 router.register(r'users', UserViewSet)
+router.register(r'imports', ImportJobViewSet)
 
 urlpatterns = [
+    path('stats/', StatsView.as_view(), name='stats'),
+    path('search/', SearchView.as_view(), name='search'),
+    path('ip-lookup/', IPLookupView.as_view(), name='ip-lookup'),
+    path('ip-conflicts/', IPConflictsView.as_view(), name='ip-conflicts'),
+    path('export/atms/', ATMViewSet.export_view(), name='export-atms'),
+    path('export/branches/', BranchViewSet.export_view(), name='export-branches'),
+    path('export/contacts/', ContactPersonViewSet.export_view(), name='export-contacts'),
+    path('export/wan-ips/', WANIPViewSet.export_view(), name='export-wan-ips'),
+    path('async/', include([
+        *read_urls('branches', BranchViewSet, 'branch'),
+        *read_urls('atms', ATMViewSet, 'atm'),
+        *read_urls('wan-ips', WANIPViewSet, 'wan_ip'),
+    ])),
     path('', include(router.urls)),
 ]
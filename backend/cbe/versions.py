@@ -0,0 +1,79 @@
+"""Per-model write counters behind the response and stats caches.
+
+Each cached model has a row in `DataVersion` that every write to the model
+moves, inside the transaction making the write, so any process sees the new
+version exactly when it can see the new data. Reading the versions is one
+lookup on a table of a few rows, however large the counted tables grow.
+
+The `cbe.signals` receivers move the counters on `save()` and `delete()`
+(`QuerySet.delete()` sends the signals too while receivers are connected).
+`bulk_create`, `bulk_update` and `QuerySet.update()` send none:
+`BulkImporter` calls `bump_versions` itself and any other code writing
+that way has to as well. Code deleting or saving many rows in one
+transaction wraps it in `batch_versions()` so each counter moves once.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+_state = threading.local()
+
+
+def bump_versions(*models):
+    """Move the counters of `models`; call it in the transaction that writes them."""
+    pending = getattr(_state, 'pending', None)
+    if pending is not None:
+        pending.update(models)
+        return
+    labels = sorted({model._meta.label for model in models})
+    if not labels:
+        return
+    rows = DataVersion.objects.filter(label__in=labels)
+    if rows.update(version=F('version') + 1, updated_at=timezone.now()) < len(labels):
+        # first write to a model: add its row, then count the write on every row
+        DataVersion.objects.bulk_create([DataVersion(label=label) for label in labels], ignore_conflicts=True)
+        rows.update(version=F('version') + 1, updated_at=timezone.now())
+
+
+@contextmanager
+def batch_versions():
+    """Collect the counters moved in this thread and move each once on exit.
+
+    Enter it inside the transaction making the writes so the counters still
+    move before it commits; nothing moves when the block raises.
+    """
+    if getattr(_state, 'pending', None) is not None:
+        yield  # the outer block moves them
+        return
+    _state.pending = set()
+    try:
+        yield
+        models = _state.pending
+    finally:
+        _state.pending = None
+    bump_versions(*models)
+
+
+def data_versions(models):
+    """(version, when it last moved) per model, in order; (0, None) for a model never written."""
+    labels = [model._meta.label for model in models]
+    rows = {
+        label: (version, updated_at)
+        for label, version, updated_at in DataVersion.objects.filter(label__in=labels)
+        .values_list('label', 'version', 'updated_at')
+    }
+    return [rows.get(label, (0, None)) for label in labels]
+
+
+def versions_tag(versions):
+    """`data_versions` as a short string, for cache keys and ETags."""
+    return '.'.join(str(version) for version, _ in versions)
+
+
+def record_write(sender, **kwargs):
+    """`post_save` / `post_delete` receiver moving the sender's counter."""
+    bump_versions(sender)
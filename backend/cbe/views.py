@@ -1,15 +1,62 @@
 # cbe/views.py
-from rest_framework import viewsets, filters, permissions
+from rest_framework import mixins, viewsets, filters, permissions, status
 from rest_framework.decorators import action
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from django.contrib.auth.models import User
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP
+from .models import Region, District, Branch, ContactPerson, ATM, WAN_IP, ImportJob
+from .bulk_api import BulkMixin
+from .export import (
+    ExportMixin, ATM_EXPORT_COLUMNS, BRANCH_EXPORT_COLUMNS,
+    CONTACT_EXPORT_COLUMNS, WAN_IP_EXPORT_COLUMNS,
+)
+from .import_jobs import submit
+from .ip_conflicts import find_conflicts
+from .ip_index import DEFAULT_LIMIT as IP_LOOKUP_LIMIT, MAX_LIMIT as IP_LOOKUP_MAX, parse_query, lookup
+from .pagination import KeysetPagination
+from .response_cache import CachedResponseMixin
+from .search import IndexedSearchFilter, SEARCH_SPECS, DEFAULT_LIMIT, MAX_LIMIT, search
+from .stats import get_stats
 from .serializers import (
-    RegionSerializer, DistrictSerializer, BranchSerializer,
-    ContactPersonSerializer, ATMSerializer, WANIPSerializer, UserSerializer
+    RegionSerializer, DistrictSerializer, BranchSerializer, BranchListSerializer,
+    ContactPersonSerializer, ATMSerializer, WANIPSerializer, UserSerializer,
+    ImportJobSerializer, ImportJobListSerializer,
 )
 
+class SparseFieldsetMixin:
+    """
+    Honour `?fields=id,name` (only those keys per object) and
+    `?expand=<relation>` (include a nested relation listed in
+    `expandable_fields`) on GET requests.
+    """
+    expandable_fields = []
+
+    def query_list(self, param):
+        if self.request is None:
+            return []
+        value = self.request.query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
+    @property
+    def expanded(self):
+        return [name for name in self.query_list('expand') if name in self.expandable_fields]
+
+    def includes(self, relation):
+        """Whether the response will contain `relation`, so it is worth prefetching."""
+        if relation in self.expanded:
+            return True
+        fields = self.query_list('fields')
+        return self.action != 'list' and (not fields or relation in fields)
+
+    def get_serializer(self, *args, **kwargs):
+        if self.request is not None and self.request.method == 'GET':
+            fields = self.query_list('fields')
+            if fields:
+                kwargs.setdefault('fields', fields + self.expanded)
+        return super().get_serializer(*args, **kwargs)
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
@@ -28,73 +75,195 @@ class UserViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response(serializer.errors, status=400)
 
-class RegionViewSet(viewsets.ModelViewSet):
+class RegionViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing regions.
     """
     queryset = Region.objects.all()
     serializer_class = RegionSerializer
+    cache_models = [Region]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'code']
     ordering_fields = ['name']
     ordering = ['name']
 
-class DistrictViewSet(viewsets.ModelViewSet):
+class DistrictViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing districts.
     """
     queryset = District.objects.select_related('region').all()
     serializer_class = DistrictSerializer
+    cache_models = [District, Region]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['region']
     search_fields = ['name', 'region__name']
     ordering_fields = ['name']
     ordering = ['name']
 
-class BranchViewSet(viewsets.ModelViewSet):
+class BranchViewSet(CachedResponseMixin, BulkMixin, ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing branches.
+
+    The list omits the nested contacts unless `?expand=contacts` is given.
     """
-    queryset = Branch.objects.select_related('district').prefetch_related('contacts').all()
+    queryset = Branch.objects.select_related('district').all()
     serializer_class = BranchSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    cache_models = [Branch, District, ContactPerson]
+    export_columns = BRANCH_EXPORT_COLUMNS
+    export_name = 'branches'
+    bulk_key = 'name'
+    pagination_class = KeysetPagination
+    expandable_fields = ['contacts']
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['district', 'connection_type']
+    search_kind = 'branch'
     search_fields = ['name', 'service_number', 'district__name']
     ordering_fields = ['name', 'created_at']
     ordering = ['name']
 
-class ContactPersonViewSet(viewsets.ModelViewSet):
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.includes('contacts'):
+            queryset = queryset.prefetch_related('contacts')
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list' and 'contacts' not in self.expanded:
+            return BranchListSerializer
+        return super().get_serializer_class()
+
+class ContactPersonViewSet(ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing contact persons.
     """
     queryset = ContactPerson.objects.select_related('branch').all()
     serializer_class = ContactPersonSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    export_columns = CONTACT_EXPORT_COLUMNS
+    export_name = 'contacts'
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['branch', 'role']
+    search_kind = 'contact'
     search_fields = ['full_name', 'role', 'branch__name']
     ordering_fields = ['full_name', 'created_at']
     ordering = ['full_name']
 
-class ATMViewSet(viewsets.ModelViewSet):
+class ATMViewSet(BulkMixin, ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing ATMs.
     """
     queryset = ATM.objects.select_related('branch').all()
     serializer_class = ATMSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    export_columns = ATM_EXPORT_COLUMNS
+    export_name = 'atms'
+    bulk_key = 'tid'
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['branch', 'deployment_status', 'location_type', 'atm_brand']
+    search_kind = 'atm'
     search_fields = ['tid', 'atm_name', 'branch__name']
     ordering_fields = ['tid', 'atm_name', 'created_at']
     ordering = ['tid']
 
-class WANIPViewSet(viewsets.ModelViewSet):
+class WANIPViewSet(ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing WAN IP addresses.
     """
     queryset = WAN_IP.objects.select_related('branch').all()
     serializer_class = WANIPSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    export_columns = WAN_IP_EXPORT_COLUMNS
+    export_name = 'wan-ips'
+    pagination_class = KeysetPagination
+    filter_backends = [DjangoFilterBackend, IndexedSearchFilter, filters.OrderingFilter]
     filterset_fields = ['branch']
+    search_kind = 'wan_ip'
     search_fields = ['ip_address', 'branch__name']
     ordering_fields = ['ip_address', 'created_at']
-    ordering = ['ip_address']
\ No newline at end of file
+    ordering = ['ip_address']
+
+class StatsView(APIView):
+    """
+    Dashboard counts and breakdowns (branches per connection type and
+    district; ATMs per deployment status, location type and brand).
+    """
+    def get(self, request):
+        return Response(get_stats())
+
+class SearchView(APIView):
+    """
+    Ranked type-ahead across branches, ATMs, contacts and WAN IPs:
+    `?q=<text>`, optionally `&type=branch,atm` and `&limit=<n>` (at most 100).
+    """
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kinds = [kind for kind in request.query_params.get('type', '').split(',') if kind in SEARCH_SPECS]
+        try:
+            limit = min(max(int(request.query_params.get('limit', DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            limit = DEFAULT_LIMIT
+        return Response({'query': query, 'results': search(query, kinds, limit)})
+
+class IPLookupView(APIView):
+    """
+    Everything addressed inside a network, or whose subnet contains it:
+    `?cidr=10.20.0.0/16` or `?ip=10.20.1.5`, optionally `&limit=<n>` (at most 5000).
+    Covers branch WAN/LAN/gateway/VSAT/tunnel addresses, ATM IPs and WAN IPs.
+    """
+    def get(self, request):
+        try:
+            network = parse_query(request.query_params.get('ip'), request.query_params.get('cidr'))
+        except ValueError as exc:
+            return Response({'detail': str(exc)}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get('limit', IP_LOOKUP_LIMIT)), 1), IP_LOOKUP_MAX)
+        except ValueError:
+            limit = IP_LOOKUP_LIMIT
+        results = lookup(network, limit)
+        return Response({'network': str(network), 'truncated': len(results) == limit, 'results': results})
+
+class IPConflictsView(APIView):
+    """
+    Duplicate addresses, overlapping subnets and gateway mismatches across
+    every IP field, as `check_ip_conflicts --json` prints them.
+    `?gateway_prefix=<n>` overrides the subnet assumed for bare WAN addresses.
+    """
+    def get(self, request):
+        try:
+            prefix = int(request.query_params.get('gateway_prefix', 0)) or None
+        except ValueError:
+            prefix = None
+        if prefix is not None and not 0 < prefix <= 32:
+            return Response({'detail': 'gateway_prefix must be between 1 and 32.'}, status=400)
+        return Response(find_conflicts(prefix))
+
+class ImportJobViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                       viewsets.GenericViewSet):
+    """
+    Imports run in the background (see `cbe.import_jobs`). POST a multipart
+    form with `file` (a CSV) and `source` (branches, ospf_branches,
+    contacts, atms or atms_off_wan); the upload replaces that source only,
+    incrementally. The answer is 202 with the queued job. Poll
+    `/api/imports/<id>/` for its status, stage, rows done, rows/sec and
+    invalid rows. Admins only, since an import rewrites the tables.
+    """
+    queryset = ImportJob.objects.select_related('created_by').all()
+    serializer_class = ImportJobSerializer
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['status', 'source']
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ImportJobListSerializer
+        return super().get_serializer_class()
+
+    def perform_create(self, serializer):
+        data = serializer.validated_data
+        serializer.instance = submit(
+            data['file'], data['source'], incremental=data['incremental'], created_by=self.request.user,
+        )
+
+    def create(self, request, *args, **kwargs):
+        response = super().create(request, *args, **kwargs)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return response
@@ -13,6 +13,7 @@ import os
 from pathlib import Path
 from datetime import timedelta
 from dotenv import load_dotenv
+from corsheaders.defaults import default_headers
 
 load_dotenv()
 
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'cbe.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -81,11 +83,57 @@ WSGI_APPLICATION = 'cbe_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. DB_ENGINE=postgresql for production (pip install 'psycopg[binary,pool]'):
+# each process then keeps a psycopg connection pool (DB_POOL=False to use DB_CONN_MAX_AGE
+# persistent connections instead; the two cannot be combined). Reused connections are
+# health-checked before each request.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE in ('postgresql', 'postgres'):
+    DB_POOL = os.environ.get('DB_POOL', 'True') == 'True'
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'cbe'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': 0 if DB_POOL else int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'pool': {
+                    'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.environ.get('DB_POOL_MAX_SIZE', 10)),
+                    # seconds a request waits for a free connection
+                    'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+                },
+            } if DB_POOL else {},
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            # keep at 0 under ASGI, where each request runs on its own thread
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                # take the write lock at BEGIN; a deferred transaction that writes later
+                # fails with "database is locked" at once instead of waiting busy_timeout
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
     }
+
+# Applied to every new SQLite connection by cbe.db.configure_sqlite. WAL lets API reads
+# run while an import holds the write lock; writers wait up to busy_timeout ms for it.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 20000)),
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
 }
 
 
@@ -132,6 +180,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True
+# Let the frontend read ETags and revalidate its cached responses with If-None-Match
+CORS_EXPOSE_HEADERS = ['ETag']
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match')
 # CORS_ALLOWED_ORIGINS = [
 #     'http://localhost:5173',
 #     'http://127.0.0.1:5173',
@@ -157,3 +208,60 @@ SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
+
+# Response cache for the region, district and branch endpoints (cbe.response_cache). Entries
+# are checked against the data versions (cbe.versions), so any backend is safe; local memory is per
+# process, so with several workers set API_CACHE_DIR (or point 'api' at a shared
+# backend) to build each response once.
+API_CACHE_DIR = os.environ.get('API_CACHE_DIR')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': (
+            'django.core.cache.backends.filebased.FileBasedCache' if API_CACHE_DIR
+            else 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': API_CACHE_DIR or 'cbe-api',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+API_CACHE_ALIAS = 'api'
+# Seconds a cached response is kept
+API_CACHE_TIMEOUT = 600
+
+# Seconds /api/stats/ keeps a cached result; any write to the counted tables replaces it sooner
+STATS_CACHE_TIMEOUT = 300
+
+# Subnet assumed for WAN addresses written without a prefix when checking gateways
+IP_GATEWAY_PREFIX = 29
+
+# Per-route request budgets checked by cbe.metrics.RequestMetricsMiddleware, keyed by
+# URL name ('*' for any other route): queries, db_ms and/or total_ms. Overruns are
+# logged, or raise BudgetExceeded with REQUEST_BUDGET_ACTION = 'raise' (e.g. in tests).
+REQUEST_BUDGETS = {
+    '*': {'queries': 20},
+    'region-list': {'queries': 4},
+    'district-list': {'queries': 4},
+    'branch-list': {'queries': 6},
+    'contactperson-list': {'queries': 5},
+    'atm-list': {'queries': 6},
+    'wan_ip-list': {'queries': 5},
+    'stats': {'queries': 8},
+    'search': {'queries': 3},
+}
+REQUEST_BUDGET_ACTION = os.environ.get('REQUEST_BUDGET_ACTION', 'log')
+# /metrics answers 'Authorization: Bearer <METRICS_TOKEN>' (when set) and staff sessions only
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Background imports queued through /api/imports/ (cbe.import_jobs): where uploads are kept,
+# whether the web process runs them in a thread (else run `manage.py run_import_jobs`), and
+# the seconds without a heartbeat (sent every tenth of it) after which a running job counts as lost
+IMPORT_UPLOAD_DIR = os.environ.get('IMPORT_UPLOAD_DIR', BASE_DIR / 'data' / 'uploads')
+IMPORT_JOBS_IN_PROCESS = os.environ.get('IMPORT_JOBS_IN_PROCESS', 'True') == 'True'
+IMPORT_JOB_TIMEOUT = int(os.environ.get('IMPORT_JOB_TIMEOUT', 900))
+# Where import_cbe_data reads the source CSVs not given with --source, and writes its
+# JSONL audit trail; absolute so imports run the same from any working directory
+IMPORT_DATA_DIR = os.environ.get('IMPORT_DATA_DIR', BASE_DIR / 'data' / 'csv')
+IMPORT_AUDIT_DIR = os.environ.get('IMPORT_AUDIT_DIR', BASE_DIR / 'data' / 'imported')
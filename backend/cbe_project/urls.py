@@ -1,6 +1,7 @@
 # cbe_project/urls.py
 from django.contrib import admin
 from django.urls import path, include
+from cbe.metrics import metrics_view
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
@@ -11,4 +12,5 @@ urlpatterns = [
     path('api/', include('cbe.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('metrics', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -8,11 +8,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
 django.setup()
 
 from cbe.models import Region, District, Branch, ContactPerson, ATM, WAN_IP
-
-def clean_value(value):
-    if pd.isna(value) or value in ['', 'null', 'None', ' ', 'nan', 'NaT']:
-        return None
-    return str(value).strip()
+from cbe.csv_utils import clean_value, primary_ip
+from cbe.branch_resolver import BranchResolver, clean_branch_name
 
 def run_import():
     print("="*50)
@@ -43,7 +40,6 @@ def run_import():
                         'wan_address': clean_value(row.get('WAN Address')),
                         'lan_address': clean_value(row.get('LAN Address')),
                         'default_gateway': clean_value(row.get('Default Gateway')),
-                        'account_number': clean_value(row.get('Account No')),
                     }
                 )
                 count += 1
@@ -75,7 +71,6 @@ def run_import():
                             'default_gateway': clean_value(row.get('WAN Default Gateway')) or branch.default_gateway if not created else clean_value(row.get('WAN Default Gateway')),
                             'connection_type': clean_value(row.get('Connection Type')) or branch.connection_type if not created else clean_value(row.get('Connection Type')),
                             'service_number': clean_value(row.get('Service No.')) or branch.service_number if not created else clean_value(row.get('Service No.')),
-                            'account_number': clean_value(row.get('Account Number')) or branch.account_number if not created else clean_value(row.get('Account Number')),
                             # Tunnel IPs
                             'tunnel_0': clean_value(row.get('Tunnel 0')),
                             'tunnel_1': clean_value(row.get('Tunnel 1')),
@@ -93,17 +88,15 @@ def run_import():
                     wan_ip_raw = clean_value(row.get('WAN IP'))
                     if wan_ip_raw:
                         # Handle multiple IPs like "10.1.1.1/10.2.2.2" or "10.1.1.1 (10.2.2.2)"
-                        # Take the first one for simplicity, or split?
-                        # Since unique=True, we should be careful.
-                        ip_parts = wan_ip_raw.replace('(', '/').replace(')', '').split('/')
-                        primary_ip = ip_parts[0].strip()
+                        # Take the first one; ip_address is unique so we should be careful.
+                        wan_ip = primary_ip(wan_ip_raw)
                         
                         # Basic very simple validation check
-                        if primary_ip and len(primary_ip.split('.')) == 4:
+                        if wan_ip and len(wan_ip.split('.')) == 4:
                             try:
                                 WAN_IP.objects.get_or_create(
                                     branch=branch,
-                                    ip_address=primary_ip,
+                                    ip_address=wan_ip,
                                     defaults={
                                         'subnet_mask': '', 
                                         'gateway': clean_value(row.get('WAN Default Gateway')),
@@ -112,7 +105,7 @@ def run_import():
                                 )
                                 count_wan_ips += 1
                             except Exception as e:
-                                print(f"      Warning: Failed to save WAN_IP '{primary_ip}' for {clean_name}: {e}")
+                                print(f"      Warning: Failed to save WAN_IP '{wan_ip}' for {clean_name}: {e}")
                         else:
                              print(f"      Warning: Skipped invalid WAN_IP '{wan_ip_raw}' for {clean_name}")
 
@@ -125,6 +118,9 @@ def run_import():
     except Exception as e:
         print(f"   ERROR reading File 2: {e}")
 
+    # Branches are in place now; load them once for the name lookups below
+    branches = BranchResolver.load()
+
     # 4. Import Contacts
     print("\n4. Importing Contacts from 'contact_person.csv'...")
     try:
@@ -142,9 +138,8 @@ def run_import():
             branch_name = clean_value(row.get('Branch Name'))
             
             if contact_name and branch_name:
-                clean_branch_name = branch_name.replace(' Branch', '').strip()
-                try:
-                    branch = Branch.objects.get(name=clean_branch_name)
+                branch = branches.exact(clean_branch_name(branch_name))
+                if branch is not None:
                     ContactPerson.objects.update_or_create(
                         branch=branch,
                         full_name=contact_name,
@@ -155,9 +150,6 @@ def run_import():
                         }
                     )
                     count_contacts += 1
-                except Branch.DoesNotExist:
-                    # print(f"   Skipping contact {contact_name}: Branch '{clean_branch_name}' not found.")
-                    pass
 
         print(f"   Processed {count_contacts} contacts.")
 
@@ -177,8 +169,7 @@ def run_import():
                 branch_name = clean_value(row.get('branch'))
                 branch = None
                 if branch_name:
-                    clean_branch_name = branch_name.replace(' Branch', '').strip()
-                    branch = Branch.objects.filter(name=clean_branch_name).first()
+                    branch = branches.exact(clean_branch_name(branch_name))
                 
                 atm_name = clean_value(row.get('atm_name')) or f"ATM {tid}"
                 
@@ -215,19 +206,19 @@ def run_import():
             site_name = clean_value(row.get('Site Name'))
             if site_name:
                 # Try to map Site Name to Branch Name if not found
-                branch = Branch.objects.filter(name=site_name).first()
+                branch = branches.exact(site_name)
                 if not branch:
                     branch, _ = Branch.objects.get_or_create(
                         name=site_name, 
                         defaults={'district': district}
                     )
+                    branches.add(branch)
                 
                 # It seems this file describes Branches with ATMs or just ATMs.
                 # It has WAN IP, Service No, etc. updating Branch info
                 if branch:
                     branch.wan_address = clean_value(row.get('WAN IP')) or branch.wan_address
                     branch.service_number = clean_value(row.get('Service No.')) or branch.service_number
-                    branch.account_number = clean_value(row.get('Account Number')) or branch.account_number
                     branch.save()
                 
                 # Check for ATM IP
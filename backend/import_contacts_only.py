@@ -7,13 +7,9 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
 django.setup()
 
 from cbe.models import Branch, ContactPerson
-from cbe.csv_utils import read_csv_safe, get_row_value
-from cbe.csv_utils import persist_import_row
-
-def clean_value(value):
-    if pd.isna(value) or value in ['', 'null', 'None', ' ', 'nan']:
-        return None
-    return str(value).strip()
+from cbe.csv_utils import read_csv_safe, get_row_value, clean_value
+from cbe.csv_utils import ImportAuditLog
+from cbe.branch_resolver import BranchResolver, clean_branch_name
 
 def import_contacts():
     print("Importing contacts only...")
@@ -32,17 +28,21 @@ def import_contacts():
     elif 'contact_person_name' in df.columns:
         df = df[df['contact_person_name'].notna() & (df['contact_person_name'] != '')]
     
+    branches = BranchResolver.load()
     count = 0
-    for _, row in df.iterrows():
-        branch_name = clean_value(get_row_value(row, 'Branch Name', 'branch_name', 'branch'))
-        contact_name = clean_value(get_row_value(row, 'Contact Person', 'contact_person', 'contact_person_name'))
-        
-        if branch_name and contact_name:
-            # Clean branch name (remove "Branch" suffix)
-            clean_branch_name = branch_name.replace(' Branch', '').strip()
-            
-            try:
-                branch = Branch.objects.get(name=clean_branch_name)
+    with ImportAuditLog() as audit:
+        for _, row in df.iterrows():
+            branch_name = clean_value(get_row_value(row, 'Branch Name', 'branch_name', 'branch'))
+            contact_name = clean_value(get_row_value(row, 'Contact Person', 'contact_person', 'contact_person_name'))
+
+            if branch_name and contact_name:
+                # Clean branch name (remove "Branch" suffix)
+                clean_name = clean_branch_name(branch_name)
+                branch = branches.exact(clean_name)
+                if branch is None:
+                    print(f'Branch not found: {clean_name}')
+                    continue
+
                 ContactPerson.objects.create(
                     branch=branch,
                     full_name=contact_name,
@@ -50,15 +50,11 @@ def import_contacts():
                     phone_number=clean_value(get_row_value(row, 'Phone Number', 'phone_number'))
                 )
                 count += 1
-                print(f'Added contact: {contact_name} for {clean_branch_name}')
-                    try:
-                        # persist raw contact row
-                        persist_import_row(file_path, row.to_dict(), model='ContactPerson')
-                    except Exception:
-                        pass
-            except Branch.DoesNotExist:
-                print(f'Branch not found: {clean_branch_name}')
-    
+                print(f'Added contact: {contact_name} for {clean_name}')
+                # persist raw contact row
+                audit.write(file_path, row.to_dict(), model='ContactPerson')
+
+    print(audit.summary())
     print(f'Imported {count} contact persons')
 
 if __name__ == '__main__':
@@ -6,11 +6,8 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cbe_project.settings')
 django.setup()
 
 from cbe.models import Region, District, Branch, ContactPerson, ATM
-
-def clean_value(value):
-    if pd.isna(value) or value in ['', 'null', 'None', ' ', 'nan']:
-        return None
-    return str(value).strip()
+from cbe.csv_utils import clean_value
+from cbe.branch_resolver import BranchResolver, clean_branch_name
 
 # Create Region and District
 print("Setting up region and district...")
@@ -57,15 +54,15 @@ except:
 # Filter out empty rows
 df_contacts = df_contacts[df_contacts['Contact Person'].notna() & (df_contacts['Contact Person'] != '')]
 
+branches = BranchResolver.load()
 count_contacts = 0
 for _, row in df_contacts.iterrows():
     branch_name = row.get('Branch Name')
     contact_name = row.get('Contact Person')
     
     if pd.notna(branch_name) and pd.notna(contact_name):
-        clean_branch = str(branch_name).replace(' Branch', '').strip()
-        try:
-            branch = Branch.objects.get(name=clean_branch)
+        branch = branches.exact(clean_branch_name(branch_name))
+        if branch is not None:
             contact, created = ContactPerson.objects.get_or_create(
                 branch=branch,
                 full_name=str(contact_name).strip(),
@@ -77,8 +74,6 @@ for _, row in df_contacts.iterrows():
             count_contacts += 1
             if count_contacts <= 10:
                 print(f"{'Created' if created else 'Found'}: {contact_name} for {branch.name}")
-        except Branch.DoesNotExist:
-            pass
 
 print(f"\nImported {count_contacts} contacts")
 
@@ -1,8 +1,68 @@
 // API client for backend communication
 const API_BASE_URL = 'http://127.0.0.1:8000/api';
 
+// Client-side response cache. GET responses are kept with their ETag and
+// revalidated with If-None-Match, so an unchanged list comes back as an empty
+// 304 instead of being downloaded again. Identical GETs already in flight share
+// one request. Writes invalidate the resource they touched and the resources
+// that embed it (e.g. ATMs show branch_name).
+const responseCache = new Map(); // endpoint -> { etag, data }
+const inFlight = new Map(); // endpoint -> Promise
+const cacheListeners = new Set();
+
+const DEPENDENT_RESOURCES = {
+    '/regions/': ['/districts/'],
+    '/districts/': ['/branches/'],
+    '/branches/': ['/atms/', '/contacts/', '/wan-ips/'],
+    '/contacts/': ['/branches/'],
+};
+// Resources whose writes also change the dashboard aggregates
+const COUNTED_RESOURCES = ['/regions/', '/districts/', '/branches/', '/contacts/', '/atms/', '/wan-ips/'];
+
+// '/branches/12/?fields=id' -> '/branches/'
+function resourceOf(endpoint) {
+    const segment = endpoint.split('?')[0].split('/').filter(Boolean)[0];
+    return segment ? `/${segment}/` : endpoint;
+}
+
+function invalidate(...prefixes) {
+    for (const map of [responseCache, inFlight]) {
+        for (const key of [...map.keys()]) {
+            if (prefixes.some((prefix) => key.startsWith(prefix))) {
+                map.delete(key);
+            }
+        }
+    }
+    cacheListeners.forEach((listener) => listener(prefixes));
+}
+
+function invalidateAfterWrite(endpoint) {
+    const resource = resourceOf(endpoint);
+    const prefixes = [resource, ...(DEPENDENT_RESOURCES[resource] || [])];
+    if (COUNTED_RESOURCES.includes(resource)) {
+        prefixes.push('/stats/');
+    }
+    invalidate(...prefixes);
+}
+
+export const apiCache = {
+    // Drop cached responses for endpoints starting with any of the prefixes
+    invalidate,
+    // Drop everything, e.g. when the user changes
+    clear: () => {
+        responseCache.clear();
+        inFlight.clear();
+        cacheListeners.forEach((listener) => listener(null));
+    },
+    // listener(prefixes) runs after each invalidation (null for clear); returns an unsubscribe function
+    subscribe: (listener) => {
+        cacheListeners.add(listener);
+        return () => cacheListeners.delete(listener);
+    },
+};
+
 // Helper function for API calls
-async function apiCall(endpoint, options = {}) {
+async function send(endpoint, options = {}) {
     const url = `${API_BASE_URL}${endpoint}`;
     const token = localStorage.getItem('access_token');
 
@@ -21,13 +81,14 @@ async function apiCall(endpoint, options = {}) {
         },
     };
 
-    const response = await fetch(url, { ...defaultOptions, ...options });
+    const response = await fetch(url, { ...defaultOptions, ...options, headers: defaultOptions.headers });
 
-    if (!response.ok) {
+    if (!response.ok && response.status !== 304) {
         if (response.status === 401) {
             // Token expired or invalid
             localStorage.removeItem('access_token');
             localStorage.removeItem('refresh_token');
+            apiCache.clear();
             // Optional: Redirect to login or dispatch event
             // window.location.href = '/login'; 
         }
@@ -35,6 +96,10 @@ async function apiCall(endpoint, options = {}) {
         throw new Error(error.detail || `HTTP error! status: ${response.status}`);
     }
 
+    return response;
+}
+
+function readBody(response) {
     // Handle empty responses (like DELETE which returns 204 No Content)
     const contentType = response.headers.get('content-type');
     if (response.status === 204 || !contentType || contentType.indexOf('application/json') === -1) {
@@ -44,6 +109,65 @@ async function apiCall(endpoint, options = {}) {
     return response.json();
 }
 
+// Headers without If-None-Match / If-Modified-Since, for a request that must return a body
+function unconditional(headers = {}) {
+    const validators = ['if-none-match', 'if-modified-since'];
+    return Object.fromEntries(
+        Object.entries(headers).filter(([name]) => !validators.includes(name.toLowerCase())),
+    );
+}
+
+function cachedGet(endpoint, options) {
+    if (inFlight.has(endpoint)) {
+        return inFlight.get(endpoint);
+    }
+    const cached = responseCache.get(endpoint);
+    const headers = cached ? { 'If-None-Match': cached.etag, ...options.headers } : options.headers;
+
+    const promise = send(endpoint, { ...options, headers })
+        .then(async (response) => {
+            if (response.status === 304) {
+                if (cached) {
+                    return cached.data;
+                }
+                // a 304 has no body and there is none kept to reuse (the validator came from
+                // the caller or the browser), so ask again without one
+                const retry = { ...options, headers: unconditional(options.headers), cache: 'no-store' };
+                response = await send(endpoint, retry);
+            }
+            const data = await readBody(response);
+            const etag = response.headers.get('ETag');
+            // an invalidation while in flight means this body may already be stale
+            if (etag && inFlight.get(endpoint) === promise) {
+                responseCache.set(endpoint, { etag, data });
+            }
+            return data;
+        })
+        .finally(() => {
+            if (inFlight.get(endpoint) === promise) {
+                inFlight.delete(endpoint);
+            }
+        });
+    inFlight.set(endpoint, promise);
+    return promise;
+}
+
+async function apiCall(endpoint, options = {}) {
+    const method = (options.method || 'GET').toUpperCase();
+    if (method === 'GET') {
+        return cachedGet(endpoint, options);
+    }
+    const data = await readBody(await send(endpoint, options));
+    invalidateAfterWrite(endpoint);
+    return data;
+}
+
+// Append query params, e.g. { fields: 'id,name', expand: 'contacts' }
+function withQuery(endpoint, params) {
+    const query = new URLSearchParams(params || {}).toString();
+    return query ? `${endpoint}?${query}` : endpoint;
+}
+
 // Generic API object for AuthContext and others
 export const api = {
     get: (endpoint) => apiCall(endpoint),
@@ -73,8 +197,8 @@ export const districtAPI = {
 
 // Branch API
 export const branchAPI = {
-    getAll: () => apiCall('/branches/'),
-    get: (id) => apiCall(`/branches/${id}/`),
+    getAll: (params) => apiCall(withQuery('/branches/', params)),
+    get: (id, params) => apiCall(withQuery(`/branches/${id}/`, params)),
     create: (data) => apiCall('/branches/', { method: 'POST', body: JSON.stringify(data) }),
     update: (id, data) => apiCall(`/branches/${id}/`, { method: 'PUT', body: JSON.stringify(data) }),
     delete: (id) => apiCall(`/branches/${id}/`, { method: 'DELETE' }),
@@ -106,3 +230,8 @@ export const wanIPAPI = {
     update: (id, data) => apiCall(`/wan-ips/${id}/`, { method: 'PUT', body: JSON.stringify(data) }),
     delete: (id) => apiCall(`/wan-ips/${id}/`, { method: 'DELETE' }),
 };
+
+// Dashboard aggregates (counts and breakdowns), computed server-side
+export const statsAPI = {
+    get: () => apiCall('/stats/'),
+};
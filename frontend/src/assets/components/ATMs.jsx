@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import { atmAPI } from "../../api";
+import { atmAPI, branchAPI } from "../../api";
 import DetailModal from "./DetailModal";
 
 // Reusable Input Component
@@ -104,8 +104,7 @@ const ATMs = () => {
 
   const fetchBranches = async () => {
     try {
-      const { branchAPI } = await import("../../api");
-      const data = await branchAPI.getAll();
+      const data = await branchAPI.getAll({ fields: 'id,name' });
       setBranches(data.results || data);
     } catch (err) {
       console.error("Error fetching branches:", err);
@@ -8,7 +8,7 @@ import Login from "./Login";
 import Contacts from "./Contacts";
 import Users from "./Users";
 import Profile from "./Profile";
-import { branchAPI, atmAPI, contactAPI, regionAPI } from "../../api";
+import { statsAPI } from "../../api";
 import { AuthProvider, useAuth } from "../../context/AuthContext";
 
 // Reusable Tab Button Component
@@ -61,18 +61,12 @@ const Dashboard = () => {
 
   const fetchStats = async () => {
     try {
-      const [branches, atms, contacts, regions] = await Promise.all([
-        branchAPI.getAll().catch(() => ({ results: [] })),
-        atmAPI.getAll().catch(() => ({ results: [] })),
-        contactAPI.getAll().catch(() => ({ results: [] })),
-        regionAPI.getAll().catch(() => ({ results: [] })),
-      ]);
-
+      const { counts } = await statsAPI.get();
       setStats({
-        branches: (branches.results || branches).length,
-        atms: (atms.results || atms).length,
-        contacts: (contacts.results || contacts).length,
-        regions: (regions.results || regions).length,
+        branches: counts.branches,
+        atms: counts.atms,
+        contacts: counts.contacts,
+        regions: counts.regions,
       });
     } catch (err) {
       console.error("Error fetching stats:", err);
@@ -1,4 +1,5 @@
 import React, { useState, useEffect } from "react";
+import { districtAPI } from "../../api";
 
 const connectionTypes = [
   { value: "FIBER", label: "Fiber" },
@@ -31,7 +32,6 @@ const BranchForm = ({ mode = "add", initialData = {}, onSubmit, onCancel }) => {
   useEffect(() => {
     const fetchDistricts = async () => {
       try {
-        const { districtAPI } = await import("../../api");
         const data = await districtAPI.getAll();
         setDistricts(data.results || data);
       } catch (err) {
@@ -1,4 +1,5 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
+import { statsAPI } from '../../api';
 
 const connectionTypes = [
   { value: 'FIBER', label: 'Fiber', color: 'green-600' },
@@ -9,8 +10,21 @@ const connectionTypes = [
   { value: 'other', label: 'Other', color: 'gray-600' },
 ];
 
+// Counts come from /api/stats/ so they cover every branch, not just the loaded page;
+// refetched whenever the branch list changes, falling back to counting `branches`.
 const BranchStats = ({ branches = [] }) => {
-  const totalBranches = branches.length;
+  const [stats, setStats] = useState(null);
+
+  useEffect(() => {
+    statsAPI.get()
+      .then((data) => setStats(data))
+      .catch((err) => console.error("Error fetching branch stats:", err));
+  }, [branches]);
+
+  const totalBranches = stats ? stats.counts.branches : branches.length;
+  const countFor = (value) => stats
+    ? stats.branches.by_connection_type[value] || 0
+    : branches.filter(b => b.connection_type === value).length;
 
   return (
     <div className="mt-6 grid grid-cols-1 md:grid-cols-4 gap-4">
@@ -20,7 +34,7 @@ const BranchStats = ({ branches = [] }) => {
       </div>
 
       {connectionTypes.map((type) => {
-        const count = branches.filter(b => b.connection_type === type.value).length;
+        const count = countFor(type.value);
         return (
           <div key={type.value} className="bg-white p-4 rounded-lg shadow">
             <p className="text-gray-500 text-sm">{type.label} Connections</p>
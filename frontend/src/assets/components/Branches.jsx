@@ -56,6 +56,16 @@ const Branches = () => {
 
   const handleEditBranch = (branch) => setEditingBranch(branch);
 
+  // The list comes without contacts; load the full branch for the detail view
+  const handleViewBranch = async (branch) => {
+    setSelectedBranch(branch);
+    try {
+      setSelectedBranch(await branchAPI.get(branch.id));
+    } catch (err) {
+      console.error("Error fetching branch details:", err);
+    }
+  };
+
   const handleSaveEdit = async (updatedBranch) => {
     try {
       const updated = await branchAPI.update(updatedBranch.id, updatedBranch);
@@ -174,7 +184,7 @@ const Branches = () => {
           branches={filteredBranches}
           onEdit={handleEditBranch}
           onDelete={handleDeleteBranch}
-          onView={(branch) => setSelectedBranch(branch)}
+          onView={handleViewBranch}
         />
       )}
     </>
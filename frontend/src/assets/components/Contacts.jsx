@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { contactAPI } from '../../api';
+import { contactAPI, branchAPI } from '../../api';
 import DetailModal from './DetailModal';
 
 const Contacts = () => {
@@ -28,8 +28,7 @@ const Contacts = () => {
 
   const fetchBranches = async () => {
     try {
-      const { branchAPI } = await import("../../api");
-      const data = await branchAPI.getAll();
+      const data = await branchAPI.getAll({ fields: 'id,name' });
       setBranches(data.results || data);
     } catch (err) {
       console.error("Error fetching branches:", err);
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from 'react';
-import { wanIPAPI } from '../../api';
+import { wanIPAPI, branchAPI } from '../../api';
 import DetailModal from './DetailModal';
 
 const WanIP = () => {
@@ -25,8 +25,7 @@ const WanIP = () => {
 
   const fetchBranches = async () => {
     try {
-      const { branchAPI } = await import("../../api");
-      const data = await branchAPI.getAll();
+      const data = await branchAPI.getAll({ fields: 'id,name' });
       setBranches(data.results || data);
     } catch (err) {
       console.error("Error fetching branches:", err);
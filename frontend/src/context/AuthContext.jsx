@@ -1,5 +1,5 @@
 import React, { createContext, useState, useEffect, useContext } from 'react';
-import { api } from '../api';
+import { api, apiCache } from '../api';
 
 const AuthContext = createContext(null);
 
@@ -45,6 +45,8 @@ export const AuthProvider = ({ children }) => {
 
             localStorage.setItem('access_token', response.access);
             localStorage.setItem('refresh_token', response.refresh);
+            // responses cached for the previous user must not be reused
+            apiCache.clear();
 
             // Step 2: Fetch profile
             // api.get returns the data directly, do NOT use .data
@@ -64,6 +66,7 @@ export const AuthProvider = ({ children }) => {
         console.log('[Auth] Logging out');
         localStorage.removeItem('access_token');
         localStorage.removeItem('refresh_token');
+        apiCache.clear();
         setUser(null);
     };
 